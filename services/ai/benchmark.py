@@ -0,0 +1,401 @@
+"""
+Offline benchmark suite for the AI service hot paths.
+
+Measures embedding generation across batch sizes and text lengths,
+relevance ranking across corpus sizes, the prompt builders and end-to-end
+HTTP latency and throughput through an in-process ASGI client. Results are
+written as JSON so runs from different commits can be compared:
+
+    python benchmark.py --model ./models/all-MiniLM-L6-v2 --output before.json
+    python benchmark.py --model ./models/all-MiniLM-L6-v2 --compare before.json
+
+The Hugging Face hub is put in offline mode unless --online is given, so the
+model must be a local checkpoint or already be in the local cache.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+VOCABULARY = (
+    "idea project feature api database model user service deploy search "
+    "embedding prompt vector react python docker cache latency queue token "
+    "release bug fix test design refactor monorepo sync login dashboard"
+).split()
+
+EMBEDDING_BATCH_SIZES = [1, 8, 32, 128]
+TEXT_LENGTHS = {"short": 8, "medium": 64, "long": 256}
+CORPUS_SIZES = [10, 100, 1000]
+HTTP_CONCURRENCY = [1, 8]
+
+
+def make_texts(count: int, words: int, seed: int) -> List[str]:
+    """
+    Build deterministic pseudo-random texts
+
+    Args:
+        count: Number of texts
+        words: Words per text
+        seed: Random seed, so every run embeds the same texts
+
+    Returns:
+        List of texts
+    """
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(VOCABULARY, k=words)) for _ in range(count)]
+
+
+def summarize(timings: List[float], items: int = 1) -> Dict[str, float]:
+    """
+    Summarize timings of repeated runs
+
+    Args:
+        timings: Seconds per run
+        items: Items processed per run, for the throughput figure
+
+    Returns:
+        Dictionary of latency percentiles in milliseconds and throughput
+    """
+    ordered = sorted(timings)
+
+    def percentile(fraction: float) -> float:
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    mean = statistics.fmean(ordered)
+    return {
+        "runs": len(ordered),
+        "mean_ms": mean * 1000,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "min_ms": ordered[0] * 1000,
+        "items_per_second": items / mean if mean > 0 else 0.0,
+    }
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None,
+    warmup: int = 1,
+) -> List[float]:
+    """
+    Time repeated calls of a function
+
+    Args:
+        fn: Function to time
+        repeat: Number of timed calls
+        setup: Untimed function run before every call
+        warmup: Untimed calls made first
+
+    Returns:
+        Seconds per timed call
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_embeddings(model: str, repeat: int) -> List[Dict[str, Any]]:
+    from embedding import generate_embeddings
+    from src.services.embedding_cache import embedding_cache
+
+    results = []
+    for length_name, words in TEXT_LENGTHS.items():
+        for batch_size in EMBEDDING_BATCH_SIZES:
+            texts = make_texts(batch_size, words, seed=batch_size * 1000 + words)
+            # Clear the cache so every run measures the model, not a lookup
+            timings = measure(
+                lambda: generate_embeddings(texts, model),
+                repeat,
+                setup=embedding_cache.clear,
+            )
+            results.append(
+                {
+                    "name": "generate_embeddings",
+                    "params": {"batch_size": batch_size, "length": length_name},
+                    "stats": summarize(timings, batch_size),
+                }
+            )
+    return results
+
+
+def bench_relevance(model: str, repeat: int) -> List[Dict[str, Any]]:
+    from embedding import rank_by_relevance
+    from src.services.embedding_cache import embedding_cache
+
+    query = make_texts(1, 12, seed=1)[0]
+    results = []
+    for corpus_size in CORPUS_SIZES:
+        documents = make_texts(corpus_size, 48, seed=corpus_size)
+        for cached in (False, True):
+            timings = measure(
+                lambda: rank_by_relevance(query, documents, model, top_k=10),
+                repeat,
+                setup=None if cached else embedding_cache.clear,
+            )
+            results.append(
+                {
+                    "name": "rank_by_relevance",
+                    "params": {"corpus_size": corpus_size, "cached": cached},
+                    "stats": summarize(timings, corpus_size),
+                }
+            )
+    return results
+
+
+def bench_prompts(repeat: int) -> List[Dict[str, Any]]:
+    from prompt import (
+        generate_prompt,
+        generate_technical_prompt,
+        generate_brainstorming_prompt,
+    )
+
+    context = " ".join(make_texts(40, 20, seed=7))
+    builders = {
+        "generate_prompt": lambda: generate_prompt(
+            context, "Working on the sync service", "How do I batch uploads?"
+        ),
+        "generate_technical_prompt": lambda: generate_technical_prompt(
+            context,
+            "def sync(): pass\n" * 20,
+            "TimeoutError: sync took too long",
+            "Make sync incremental",
+        ),
+        "generate_brainstorming_prompt": lambda: generate_brainstorming_prompt(
+            context, "Offline mode\nShared workspaces", "Collaboration"
+        ),
+    }
+    # Prompt builders are fast, so time loops of calls rather than single calls
+    loops = 1000
+    results = []
+    for name, build in builders.items():
+
+        def run_loop(build=build):
+            for _ in range(loops):
+                build()
+
+        timings = measure(run_loop, repeat)
+        results.append(
+            {
+                "name": name,
+                "params": {"calls_per_run": loops},
+                "stats": summarize(timings, loops),
+            }
+        )
+    return results
+
+
+async def _http_load(
+    client: Any,
+    path: str,
+    make_body: Callable[[int], Dict[str, Any]],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            start = time.perf_counter()
+            response = await client.post(path, json=make_body(index))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    stats = summarize(latencies)
+    stats["items_per_second"] = requests / elapsed if elapsed > 0 else 0.0
+    stats["errors"] = errors
+    return stats
+
+
+def bench_http(model: str, requests: int) -> List[Dict[str, Any]]:
+    import httpx
+    from main import app
+
+    documents = make_texts(50, 48, seed=11)
+    endpoints = {
+        # Unique texts per request so the embedding cache does not hide model cost
+        "/embeddings": lambda i: {
+            "texts": [f"{text} {i}" for text in make_texts(8, 32, seed=i)],
+            "model": model,
+        },
+        "/relevance": lambda i: {
+            "query": f"sync service latency {i}",
+            "documents": documents,
+            "model": model,
+            "top_k": 10,
+        },
+        "/prompts/general": lambda i: {
+            "project_context": documents[i % len(documents)],
+            "question": "What should we build next?",
+        },
+    }
+
+    async def run() -> List[Dict[str, Any]]:
+        transport = httpx.ASGITransport(app=app)
+        results = []
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            for path, make_body in endpoints.items():
+                await _http_load(client, path, make_body, 2, 1)
+                for concurrency in HTTP_CONCURRENCY:
+                    stats = await _http_load(
+                        client, path, make_body, requests, concurrency
+                    )
+                    results.append(
+                        {
+                            "name": f"http {path}",
+                            "params": {"concurrency": concurrency},
+                            "stats": stats,
+                        }
+                    )
+        return results
+
+    return asyncio.run(run())
+
+
+def environment(model: str) -> Dict[str, Any]:
+    """
+    Describe the machine and code the benchmark ran on
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "model": model,
+        "inference_backend": os.getenv("INFERENCE_BACKEND", "torch"),
+        "inference_threads": os.getenv("INFERENCE_THREADS"),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """
+    Print the change in mean latency against a previous run
+
+    Args:
+        results: Results of this run
+        baseline_path: JSON file written by an earlier run
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(result: Dict[str, Any]) -> str:
+        return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+    previous = {key(result): result["stats"] for result in baseline["results"]}
+    print(
+        f"Compared with {baseline_path} ({baseline['environment'].get('commit')})",
+        file=sys.stderr,
+    )
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        after = result["stats"]
+        change = (after["mean_ms"] / before["mean_ms"] - 1) * 100
+        print(
+            f"{key(result):<70} {before['mean_ms']:>10.2f} ms -> "
+            f"{after['mean_ms']:>10.2f} ms ({change:+.1f}%)",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--model",
+        default=os.getenv("MODEL_NAME", "all-MiniLM-L6-v2"),
+        help="Model name or local checkpoint path",
+    )
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per case")
+    parser.add_argument(
+        "--http-requests", type=int, default=50, help="Requests per HTTP case"
+    )
+    parser.add_argument(
+        "--suites",
+        default="embeddings,relevance,prompts,http",
+        help="Comma-separated suites to run",
+    )
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare with a previous results file")
+    parser.add_argument(
+        "--online", action="store_true", help="Allow model downloads from the hub"
+    )
+    args = parser.parse_args()
+
+    if not args.online:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    # Keep the in-memory-only cache; a persistent tier would carry state between runs
+    os.environ.pop("EMBEDDING_CACHE_PATH", None)
+    logging.basicConfig(level=logging.WARNING)
+
+    from src.services.model_registry import model_registry
+
+    model_registry.pin(args.model)
+
+    suites = {name.strip() for name in args.suites.split(",")}
+    results: List[Dict[str, Any]] = []
+    if "embeddings" in suites:
+        results += bench_embeddings(args.model, args.repeat)
+    if "relevance" in suites:
+        results += bench_relevance(args.model, args.repeat)
+    if "prompts" in suites:
+        results += bench_prompts(args.repeat)
+    if "http" in suites:
+        results += bench_http(args.model, args.http_requests)
+
+    report = {"environment": environment(args.model), "results": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
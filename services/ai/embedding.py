@@ -2,41 +2,64 @@ import os
 import logging
 from typing import List, Dict, Any, Optional, Union
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from src.services.embedding_service import encode_texts as encode_with_service
+from src.services.embedding_service import get_model as get_service_model
+from src.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from src.services.metrics import request_texts, stage_seconds
+from src.services.model_registry import model_registry
 
 # Configure logging
 logger = logging.getLogger("ai-service")
 
-# Dictionary to store loaded models for reuse
-MODELS = {}
+# Default model; always allowed and never evicted from the model registry
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+model_registry.pin(DEFAULT_MODEL)
 
 
-def get_model(model_name: str = "all-MiniLM-L6-v2") -> SentenceTransformer:
+def get_model(model_name: str = DEFAULT_MODEL) -> Any:
     """
     Load and cache a sentence transformer model.
 
+    The embedding service's model is shared with the service; other models
+    are held by the shared model registry, which enforces the model
+    allowlist and memory budget and makes concurrent callers share one load.
+    A model that fails to load is an error rather than being replaced by the
+    default model, matching encode_texts(), since vectors from a different
+    model are not comparable.
+
     Args:
         model_name: Name of the model to load (default: all-MiniLM-L6-v2)
 
     Returns:
         Loaded SentenceTransformer model
+
+    Raises:
+        ModelNotAllowedError: If the model is not on the allowlist
     """
-    if model_name not in MODELS:
-        logger.info(f"Loading model: {model_name}")
-        try:
-            MODELS[model_name] = SentenceTransformer(model_name)
-            logger.info(f"Model {model_name} loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading model {model_name}: {str(e)}")
-            # Fallback to a default model if the requested one fails
-            if model_name != "all-MiniLM-L6-v2":
-                logger.info("Falling back to default model: all-MiniLM-L6-v2")
-                return get_model("all-MiniLM-L6-v2")
-            else:
-                raise
+    try:
+        return get_service_model(model_name)
+    except Exception as e:
+        logger.error(f"Error loading model {model_name}: {str(e)}")
+        raise
+
 
-    return MODELS[model_name]
+def encode_texts(texts: List[str], model_name: str = "all-MiniLM-L6-v2") -> np.ndarray:
+    """
+    Encode a list of texts into a 2D numpy array of embeddings.
+
+    Uses the embedding service's engine: the service's model (under either
+    name) is encoded by the service, including its configured reduction, and
+    other models share its embedding cache and length bucketing, so the
+    model is only run for texts it has not seen before.
+
+    Args:
+        texts: List of text strings to embed
+        model_name: Name of the model to use (default: all-MiniLM-L6-v2)
+
+    Returns:
+        Array of shape (len(texts), dimension)
+    """
+    return encode_with_service(texts, model_name)
 
 
 def generate_embeddings(
@@ -55,19 +78,104 @@ def generate_embeddings(
     if not texts:
         return []
 
+    request_texts.observe(len(texts), kind="embeddings")
     try:
-        model = get_model(model_name)
-        embeddings = model.encode(texts)
-        return (
-            embeddings.tolist()
-        )  # Convert numpy arrays to lists for JSON serialization
+        embeddings = encode_texts(texts, model_name)
+        with stage_seconds.time(stage="serialization"):
+            # Convert numpy arrays to lists for JSON serialization
+            return embeddings.tolist()
     except Exception as e:
         logger.error(f"Error generating embeddings: {str(e)}")
         raise
 
 
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize embedding rows so that a dot product equals cosine similarity.
+
+    Args:
+        embeddings: 1D or 2D array of embeddings
+
+    Returns:
+        float32 array of the same shape with unit-length rows (zero rows stay zero)
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def top_k_indices(
+    scores: np.ndarray, top_k: Optional[int] = None, min_score: Optional[float] = None
+) -> np.ndarray:
+    """
+    Select the indices of the highest scores in descending order.
+
+    Uses argpartition so only the selected hits are sorted.
+
+    Args:
+        scores: 1D array of scores
+        top_k: Optional maximum number of indices to return
+        min_score: Optional minimum score for an index to be returned
+
+    Returns:
+        Array of indices sorted by descending score
+    """
+    candidates = np.arange(scores.shape[0])
+    if min_score is not None:
+        candidates = np.flatnonzero(scores >= min_score)
+
+    if top_k is not None and top_k < candidates.shape[0]:
+        if top_k <= 0:
+            return candidates[:0]
+        partition = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = candidates[partition]
+
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def hybrid_hits(
+    query: str,
+    documents: List[str],
+    similarities: np.ndarray,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+) -> List[tuple]:
+    """
+    Fuse dense and BM25 rankings of documents with reciprocal rank fusion.
+
+    Args:
+        query: Query string
+        documents: List of document strings
+        similarities: Cosine similarity of each document to the query
+        top_k: Optional maximum number of results to return
+        min_score: Optional minimum similarity for a dense hit; lexical hits
+            are kept regardless, so exact term matches are not lost
+
+    Returns:
+        List of (document index, fused score) tuples, best first
+    """
+    limit = top_k if top_k is not None else len(documents)
+    candidates = max(limit, int(os.getenv("HYBRID_CANDIDATES", "50")))
+    dense = top_k_indices(similarities, candidates, min_score)
+
+    lexical = BM25Index()
+    lexical.add([str(i) for i in range(len(documents))], documents)
+
+    fused = reciprocal_rank_fusion(
+        [
+            [(str(i), float(similarities[i])) for i in dense],
+            lexical.search(query, candidates),
+        ],
+        int(os.getenv("HYBRID_RRF_K", "60")),
+        limit,
+    )
+    return [(int(doc_id), score) for doc_id, score in fused]
+
+
 def compute_similarity(
-    query_embedding: List[float], document_embeddings: List[List[float]]
+    query_embedding: Union[List[float], np.ndarray],
+    document_embeddings: Union[List[List[float]], np.ndarray],
 ) -> List[float]:
     """
     Compute cosine similarity between a query embedding and a list of document embeddings.
@@ -79,50 +187,79 @@ def compute_similarity(
     Returns:
         List of similarity scores (0-1) for each document
     """
-    if not document_embeddings:
+    if len(document_embeddings) == 0:
         return []
 
-    query_array = np.array(query_embedding).reshape(1, -1)
-    docs_array = np.array(document_embeddings)
+    query_array = normalize_embeddings(query_embedding).reshape(-1)
+    docs_array = normalize_embeddings(document_embeddings)
 
-    # Compute cosine similarity
-    similarities = cosine_similarity(query_array, docs_array)[0].tolist()
-    return similarities
+    # Cosine similarity of unit vectors is a plain dot product
+    return (docs_array @ query_array).tolist()
 
 
 def rank_by_relevance(
-    query: str, documents: List[str], model_name: str = "all-MiniLM-L6-v2"
+    query: str,
+    documents: List[str],
+    model_name: str = "all-MiniLM-L6-v2",
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+    hybrid: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Rank documents by relevance to a query.
 
+    Embeddings stay float32 arrays throughout and are normalized, so scoring
+    is a single matrix-vector product and only the returned hits are turned
+    into Python objects.
+
     Args:
         query: Query string
         documents: List of document strings
         model_name: Name of the model to use
+        top_k: Optional maximum number of results to return
+        min_score: Optional minimum similarity for a document to be returned
+        hybrid: Also rank documents with BM25 and fuse both rankings, so
+            exact matches on names and codes rank high
 
     Returns:
         List of dictionaries with document index, content, and similarity score,
-        sorted by descending similarity
+        sorted by descending similarity (by fused score, also returned as
+        "score", in hybrid mode)
     """
     if not documents:
         return []
 
-    # Generate embeddings
-    model = get_model(model_name)
-    query_embedding = model.encode(query).tolist()
-    doc_embeddings = model.encode(documents).tolist()
+    request_texts.observe(len(documents), kind="relevance")
 
-    # Compute similarities
-    similarities = compute_similarity(query_embedding, doc_embeddings)
-
-    # Create result with documents and scores
-    results = [
-        {"index": i, "content": doc, "similarity": score}
-        for i, (doc, score) in enumerate(zip(documents, similarities))
-    ]
+    # Generate embeddings for the query and documents in one pass
+    embeddings = encode_texts([query] + documents, model_name)
 
-    # Sort by similarity score (descending)
-    results.sort(key=lambda x: x["similarity"], reverse=True)
+    # Compute similarities
+    with stage_seconds.time(stage="similarity"):
+        embeddings = normalize_embeddings(embeddings)
+        similarities = embeddings[1:] @ embeddings[0]
+        if hybrid:
+            fused = hybrid_hits(query, documents, similarities, top_k, min_score)
+        else:
+            hits = top_k_indices(similarities, top_k, min_score)
 
-    return results
+    # Create results only for the selected hits
+    with stage_seconds.time(stage="serialization"):
+        if hybrid:
+            return [
+                {
+                    "index": i,
+                    "content": documents[i],
+                    "similarity": float(similarities[i]),
+                    "score": score,
+                }
+                for i, score in fused
+            ]
+        return [
+            {
+                "index": int(i),
+                "content": documents[i],
+                "similarity": float(similarities[i]),
+            }
+            for i in hits
+        ]
@@ -0,0 +1,24 @@
+import os
+
+# Pre-fork server: the master loads model weights once and forks workers
+# that share them, then each worker sizes its own inference thread pools.
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+# Vector collections, the relevance table and jobs are per worker; one
+# worker elected by src.services.state_owner persists them
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+
+def when_ready(server):
+    from src.services.prefork import preload_before_fork
+
+    preload_before_fork(server.app.app_uri)
+
+
+def post_fork(server, worker):
+    from src.services.prefork import set_inference_threads, worker_threads
+
+    set_inference_threads(worker_threads(server.cfg.workers))
@@ -1,17 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 import logging
 from dotenv import load_dotenv
 
 # Import local modules
-from embedding import generate_embeddings, rank_by_relevance
-from prompt import (
-    generate_prompt,
-    generate_technical_prompt,
-    generate_brainstorming_prompt,
+from embedding import DEFAULT_MODEL, get_model, rank_by_relevance
+from prompt import build_prompt
+from src.routes.embeddings import embedding_batcher
+from src.routes.embeddings import router as embeddings_router
+from src.routes.jobs import router as jobs_router
+from src.routes.prompts import router as prompts_router
+from src.routes.relevance import router as relevance_router
+from src.routes.search import router as search_router
+from src.services.embedding_cache import embedding_cache
+from src.services.embedding_codec import negotiate_format, render_embeddings
+from src.services.inference_executor import (
+    inference_executor,
+    InferenceOverloadedError,
 )
+from src.services.job_queue import job_queue
+from src.services.length_buckets import length_bucketer
+from src.services.metrics import METRICS_CONTENT_TYPE, metrics
+from src.services.model_registry import ModelNotAllowedError, model_registry
+from src.services.model_warmup import model_warmup, preload_model_names, warm_up
+from src.services.prompt_budget import default_max_tokens
+from src.services.prompt_service import prompt_service
+from src.services.relevance_table import relevance_table
+from src.services.request_coalescer import RequestCoalescer, request_key
+from src.services.state_owner import state_owner
+from src.services.vector_index import vector_index
 
 # Load environment variables
 load_dotenv()
@@ -23,7 +43,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ai-service")
 
-# Create FastAPI app
+# Create FastAPI app. This is the only app: src.main re-exports it, so the
+# routes below (/embeddings, /relevance, /prompts/general, ...) and the
+# router endpoints (/embeddings/generate, /prompts/generate, ...) are served
+# together over one embedding engine.
 app = FastAPI(
     title="Idea Hub AI Service",
     description="AI Service for the Idea Hub application",
@@ -31,6 +54,17 @@ app = FastAPI(
 )
 
 
+app.include_router(embeddings_router, prefix="/embeddings", tags=["embeddings"])
+app.include_router(prompts_router, prefix="/prompts", tags=["prompts"])
+# In-process vector collections and top-k search
+app.include_router(search_router, tags=["search"])
+app.include_router(relevance_router, tags=["relevance"])
+app.include_router(jobs_router, tags=["jobs"])
+
+# Identical relevance requests in flight share one ranking
+relevance_coalescer = RequestCoalescer("relevance")
+
+
 # Define data models
 class EmbeddingRequest(BaseModel):
     texts: List[str]
@@ -46,6 +80,9 @@ class RelevanceRequest(BaseModel):
     query: str
     documents: List[str]
     model: Optional[str] = "all-MiniLM-L6-v2"
+    top_k: Optional[int] = None
+    min_score: Optional[float] = None
+    hybrid: bool = False
 
 
 class RelevanceResponse(BaseModel):
@@ -57,10 +94,14 @@ class PromptRequest(BaseModel):
     project_context: str
     development_context: Optional[str] = None
     question: Optional[str] = None
+    max_tokens: Optional[int] = None
 
 
 class PromptResponse(BaseModel):
     prompt: str
+    token_count: Optional[int] = None
+    truncated: bool = False
+    fields: Dict[str, Dict[str, int]] = {}
 
 
 class TechnicalPromptRequest(BaseModel):
@@ -68,30 +109,57 @@ class TechnicalPromptRequest(BaseModel):
     code_snippets: Optional[str] = None
     error_message: Optional[str] = None
     specific_task: Optional[str] = None
+    max_tokens: Optional[int] = None
 
 
 class BrainstormPromptRequest(BaseModel):
     project_context: str
     current_ideas: Optional[str] = None
     focus_area: Optional[str] = None
+    max_tokens: Optional[int] = None
 
 
 # Routes
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to Idea Hub AI Service"}
+    return {
+        "message": "Welcome to Idea Hub AI Service",
+        "status": "operational",
+        "version": app.version,
+    }
 
 
 @app.post("/embeddings", response_model=EmbeddingResponse)
-async def create_embeddings(request: EmbeddingRequest):
+async def create_embeddings(
+    request: EmbeddingRequest,
+    wire_format: Optional[str] = Query(None, alias="format"),
+    dtype: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Generate embeddings. The response defaults to JSON lists of floats;
+    pass format=base64 or format=binary (or Accept: application/octet-stream)
+    with an optional dtype of float32, float16 or int8 for compact output.
+    """
+    # An explicit "model": null means the default model
+    model = request.model or DEFAULT_MODEL
+    try:
+        wire_format, dtype = negotiate_format(accept, wire_format, dtype)
+        model_registry.check_allowed(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         logger.info(
-            f"Generating embeddings for {len(request.texts)} texts using {request.model}"
+            f"Generating embeddings for {len(request.texts)} texts using {model}"
         )
 
-        embeddings = generate_embeddings(request.texts, request.model)
+        embeddings = await embedding_batcher.submit(request.texts, model)
 
-        return EmbeddingResponse(embeddings=embeddings, model=request.model)
+        return render_embeddings(embeddings, wire_format, dtype, extra={"model": model})
+    except InferenceOverloadedError as e:
+        logger.warning(f"Embedding request rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating embeddings: {str(e)}")
         raise HTTPException(
@@ -101,14 +169,34 @@ async def create_embeddings(request: EmbeddingRequest):
 
 @app.post("/relevance", response_model=RelevanceResponse)
 async def compute_relevance(request: RelevanceRequest):
+    model = request.model or DEFAULT_MODEL
+    try:
+        model_registry.check_allowed(model)
+    except ModelNotAllowedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         logger.info(
             f"Computing relevance for query against {len(request.documents)} documents"
         )
 
-        results = rank_by_relevance(request.query, request.documents, request.model)
+        arguments = (
+            request.query,
+            request.documents,
+            model,
+            request.top_k,
+            request.min_score,
+            request.hybrid,
+        )
+        results = await relevance_coalescer.run(
+            request_key(*arguments),
+            lambda: inference_executor.run(rank_by_relevance, *arguments),
+        )
 
-        return RelevanceResponse(results=results, model=request.model)
+        return RelevanceResponse(results=results, model=model)
+    except InferenceOverloadedError as e:
+        logger.warning(f"Relevance request rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error computing relevance: {str(e)}")
         raise HTTPException(
@@ -118,16 +206,26 @@ async def compute_relevance(request: RelevanceRequest):
 
 @app.post("/prompts/general", response_model=PromptResponse)
 async def create_general_prompt(request: PromptRequest):
+    """
+    Generate a general prompt. Set max_tokens (or PROMPT_MAX_TOKENS) to cut the
+    context down to the chunks most relevant to the question
+    """
     try:
         logger.info("Generating general prompt")
 
-        prompt = generate_prompt(
-            project_context=request.project_context,
-            development_context=request.development_context,
-            question=request.question,
+        result = await inference_executor.run(
+            build_prompt,
+            "general",
+            request.model_dump(exclude={"max_tokens"}),
+            default_max_tokens(request.max_tokens),
         )
 
-        return PromptResponse(prompt=prompt)
+        return PromptResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Prompt request rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating prompt: {str(e)}")
         raise HTTPException(
@@ -140,14 +238,19 @@ async def create_technical_prompt(request: TechnicalPromptRequest):
     try:
         logger.info("Generating technical prompt")
 
-        prompt = generate_technical_prompt(
-            project_context=request.project_context,
-            code_snippets=request.code_snippets,
-            error_message=request.error_message,
-            specific_task=request.specific_task,
+        result = await inference_executor.run(
+            build_prompt,
+            "technical",
+            request.model_dump(exclude={"max_tokens"}),
+            default_max_tokens(request.max_tokens),
         )
 
-        return PromptResponse(prompt=prompt)
+        return PromptResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Prompt request rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating technical prompt: {str(e)}")
         raise HTTPException(
@@ -160,13 +263,19 @@ async def create_brainstorm_prompt(request: BrainstormPromptRequest):
     try:
         logger.info("Generating brainstorming prompt")
 
-        prompt = generate_brainstorming_prompt(
-            project_context=request.project_context,
-            current_ideas=request.current_ideas,
-            focus_area=request.focus_area,
+        result = await inference_executor.run(
+            build_prompt,
+            "brainstorm",
+            request.model_dump(exclude={"max_tokens"}),
+            default_max_tokens(request.max_tokens),
         )
 
-        return PromptResponse(prompt=prompt)
+        return PromptResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Prompt request rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating brainstorming prompt: {str(e)}")
         raise HTTPException(
@@ -174,10 +283,93 @@ async def create_brainstorm_prompt(request: BrainstormPromptRequest):
         )
 
 
+# Error handlers
+@app.exception_handler(Exception)
+async def generic_exception_handler(request, exc):
+    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
+    return JSONResponse({"detail": "Internal server error"}, status_code=500)
+
+
 # Health check endpoint
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "inference": inference_executor.stats(),
+        "batching": embedding_batcher.stats(),
+        "relevance_coalescing": relevance_coalescer.stats(),
+        "cache": embedding_cache.stats(),
+        "bucketing": length_bucketer.stats(),
+        "models": model_registry.stats(),
+        "state": state_owner.stats(),
+    }
+
+
+# Liveness probe: the process is up and serving requests
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+
+# Readiness probe: preloaded models are resident and warmed up
+@app.get("/health/ready")
+def readiness():
+    return JSONResponse(
+        model_warmup.status(), status_code=200 if model_warmup.is_ready() else 503
+    )
+
+
+# Prometheus metrics
+@app.get("/metrics")
+def get_metrics():
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# Pre-fork model loading
+def preload_weights():
+    """
+    Load the preloaded models without running them
+
+    Called by the pre-fork server before workers are forked, so the weights
+    are shared between workers.
+    """
+    for name in preload_model_names("all-MiniLM-L6-v2"):
+        model_registry.pin(name)
+        get_model(name)
+
+
+# Startup event
+@app.on_event("startup")
+async def startup_event():
+    logger.info("Starting up AI service...")
+    # One worker owns the persisted state; the others serve a read copy of
+    # the snapshots and never write them back
+    state_owner.acquire()
+    vector_index.load()
+    relevance_table.load()
+    job_queue.start(resume=state_owner.is_owner)
+    prompt_service.registry.start()
+    preload = preload_model_names("all-MiniLM-L6-v2")
+    for name in preload:
+        # Preloaded models are always allowed and stay resident
+        model_registry.pin(name)
+    model_warmup.start(
+        {name: (lambda name=name: warm_up(get_model(name))) for name in preload}
+    )
+
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Shutting down AI service...")
+    await model_warmup.stop()
+    await job_queue.stop()
+    await prompt_service.registry.stop()
+    if state_owner.is_owner:
+        vector_index.save()
+        relevance_table.save()
+        state_owner.release()
+    inference_executor.shutdown()
 
 
 # Run the application
@@ -1,5 +1,9 @@
 import logging
 from typing import Dict, Any, Optional
+from embedding import DEFAULT_MODEL, encode_texts
+from src.services.embedding_service import get_tokenizer
+from src.services.prompt_budget import get_prompt_budgeter
+from src.services.prompt_templates import CompiledTemplate
 
 # Configure logging
 logger = logging.getLogger("ai-service")
@@ -19,6 +23,22 @@ Based on the above context, please provide a detailed and helpful response.
 """
 
 
+# Compiled once at import instead of parsed by str.format on every call
+BASE_PROMPT = CompiledTemplate("base_prompt", BASE_PROMPT_TEMPLATE)
+
+TECHNICAL_FOOTER = """
+Please provide a clear, technical solution to the problem. Include code examples where appropriate.
+"""
+
+BRAINSTORMING_FOOTER = """
+Please generate innovative, practical ideas for this project. For each idea, provide:
+1. A concise name/title
+2. A brief description of the concept
+3. Key benefits or advantages
+4. Potential implementation challenges
+"""
+
+
 def generate_prompt(
     project_context: str,
     development_context: Optional[str] = None,
@@ -35,31 +55,18 @@ def generate_prompt(
     Returns:
         A formatted prompt string
     """
-    # Format the development context section if provided
-    dev_context_section = ""
-    if development_context:
-        dev_context_section = f"""
-DEVELOPMENT CONTEXT:
-{development_context}
-"""
-
-    # Format the question section if provided
-    question_section = ""
-    if question:
-        question_section = f"""
-QUESTION:
-{question}
-"""
-
-    # Fill in the template
-    prompt = BASE_PROMPT_TEMPLATE.format(
-        project_context=project_context,
-        development_context=dev_context_section,
-        question=question_section,
+    return BASE_PROMPT.render(
+        {
+            "project_context": project_context,
+            "development_context": (
+                f"\nDEVELOPMENT CONTEXT:\n{development_context}\n"
+                if development_context
+                else ""
+            ),
+            "question": f"\nQUESTION:\n{question}\n" if question else "",
+        }
     )
 
-    return prompt
-
 
 def generate_technical_prompt(
     project_context: str,
@@ -79,40 +86,19 @@ def generate_technical_prompt(
     Returns:
         A formatted prompt string
     """
-    prompt = f"""
-You are an expert software developer helping with a technical problem. Here's the context:
-
-PROJECT CONTEXT:
-{project_context}
-"""
-
+    # Collect the sections and join once rather than growing a string
+    parts = [
+        "\nYou are an expert software developer helping with a technical problem. "
+        f"Here's the context:\n\nPROJECT CONTEXT:\n{project_context}\n"
+    ]
     if code_snippets:
-        prompt += f"""
-RELEVANT CODE:
-```
-{code_snippets}
-```
-"""
-
+        parts.append(f"\nRELEVANT CODE:\n```\n{code_snippets}\n```\n")
     if error_message:
-        prompt += f"""
-ERROR MESSAGE:
-```
-{error_message}
-```
-"""
-
+        parts.append(f"\nERROR MESSAGE:\n```\n{error_message}\n```\n")
     if specific_task:
-        prompt += f"""
-TASK:
-{specific_task}
-"""
-
-    prompt += """
-Please provide a clear, technical solution to the problem. Include code examples where appropriate.
-"""
-
-    return prompt
+        parts.append(f"\nTASK:\n{specific_task}\n")
+    parts.append(TECHNICAL_FOOTER)
+    return "".join(parts)
 
 
 def generate_brainstorming_prompt(
@@ -131,31 +117,73 @@ def generate_brainstorming_prompt(
     Returns:
         A formatted prompt string
     """
-    prompt = f"""
-You are a creative consultant helping brainstorm ideas for a software project. Here's the context:
-
-PROJECT CONTEXT:
-{project_context}
-"""
-
+    parts = [
+        "\nYou are a creative consultant helping brainstorm ideas for a software "
+        f"project. Here's the context:\n\nPROJECT CONTEXT:\n{project_context}\n"
+    ]
     if current_ideas:
-        prompt += f"""
-IDEAS ALREADY CONSIDERED:
-{current_ideas}
-"""
-
+        parts.append(f"\nIDEAS ALREADY CONSIDERED:\n{current_ideas}\n")
     if focus_area:
-        prompt += f"""
-FOCUS AREA:
-{focus_area}
-"""
+        parts.append(f"\nFOCUS AREA:\n{focus_area}\n")
+    parts.append(BRAINSTORMING_FOOTER)
+    return "".join(parts)
+
+
+# Builder of each prompt kind, the arguments holding context that may be cut
+# to a token budget, and the arguments the context is ranked against
+PROMPT_KINDS = {
+    "general": (
+        generate_prompt,
+        ("project_context", "development_context"),
+        ("question",),
+    ),
+    "technical": (
+        generate_technical_prompt,
+        ("project_context", "code_snippets"),
+        ("specific_task", "error_message"),
+    ),
+    "brainstorm": (
+        generate_brainstorming_prompt,
+        ("project_context", "current_ideas"),
+        ("focus_area",),
+    ),
+}
+
+
+def build_prompt(
+    kind: str,
+    arguments: Dict[str, Any],
+    max_tokens: Optional[int] = None,
+    model_name: str = DEFAULT_MODEL,
+) -> Dict[str, Any]:
+    """
+    Generate a prompt of the given kind within a token budget.
 
-    prompt += """
-Please generate innovative, practical ideas for this project. For each idea, provide:
-1. A concise name/title
-2. A brief description of the concept
-3. Key benefits or advantages
-4. Potential implementation challenges
-"""
+    When the prompt is over budget, its context arguments are split into
+    chunks, ranked against the question (or task or focus area) with the
+    embedding model, and the most relevant chunks that fit are kept. Tokens
+    are counted only when there is a budget, with PROMPT_TOKENIZER if set,
+    otherwise with the embedding model's tokenizer; without a budget the
+    prompt is only rendered and its token_count is None.
+
+    Args:
+        kind: "general", "technical" or "brainstorm"
+        arguments: Keyword arguments of the prompt builder
+        max_tokens: Token budget for the prompt (None for no limit)
+        model_name: Embedding model used to count tokens and rank context
 
-    return prompt
+    Returns:
+        Dictionary with "prompt", "token_count", "truncated" and "fields"
+    """
+    if kind not in PROMPT_KINDS:
+        raise ValueError(f"Unknown prompt kind '{kind}'")
+    builder, context_fields, query_fields = PROMPT_KINDS[kind]
+    budgeter = get_prompt_budgeter(model_name, lambda: get_tokenizer(model_name))
+    query = "\n".join(arguments[name] for name in query_fields if arguments.get(name))
+    return budgeter.fit(
+        lambda values: builder(**{**arguments, **values}),
+        {name: arguments.get(name) for name in context_fields},
+        max_tokens,
+        query,
+        lambda texts: encode_texts(texts, model_name),
+    )
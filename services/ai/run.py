@@ -1,5 +1,6 @@
 import uvicorn
 import os
+import sys
 import dotenv
 
 # Load environment variables
@@ -10,10 +11,16 @@ if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
     reload = os.getenv("DEBUG", "false").lower() == "true"
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    if workers > 1 and not reload:
+        # Pre-fork server (see gunicorn.conf.py): model weights are loaded
+        # once and shared between the worker processes
+        os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "main:app"])
 
     # Run the FastAPI app
     uvicorn.run(
-        "src.main:app",
+        "main:app",
         host=host,
         port=port,
         reload=reload,
@@ -1,8 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Query, Request
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import os
 import logging
-from src.services.embedding_service import embedding_service
+import numpy as np
+from fastapi.responses import JSONResponse
+from src.services.embedding_service import (
+    embedding_service,
+    encode_texts,
+    embed_documents,
+    calibrate_embeddings,
+    check_inference_backends,
+    compute_similarity_matrix,
+)
+from src.services.batch_scheduler import MicroBatcher
+from src.services.embedding_cache import embedding_cache
+from src.services.embedding_codec import negotiate_format, render_embeddings
+from src.services.embedding_stream import (
+    DuplexStreamingResponse,
+    NDJSON_MEDIA_TYPE,
+    stream_embeddings,
+)
+from src.services.inference_executor import (
+    inference_executor,
+    InferenceOverloadedError,
+)
+from src.services.inference_backends import selected_backend
+from src.services.length_buckets import length_bucketer
+from src.services.model_registry import ModelNotAllowedError, model_registry
+from src.services.vector_index import vector_index
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -10,6 +36,9 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter()
 
+# Coalesces concurrent embedding requests into shared forward passes
+embedding_batcher = MicroBatcher(encode_texts)
+
 
 # Define request and response models
 class EmbeddingRequest(BaseModel):
@@ -29,21 +58,163 @@ class SimilarityResponse(BaseModel):
     similarity: float
 
 
+class DocumentEmbeddingRequest(BaseModel):
+    documents: List[str]
+    pooling: str = "mean"
+    max_tokens: Optional[int] = None
+    overlap_tokens: Optional[int] = None
+    include_chunks: bool = False
+
+
+class DocumentChunk(BaseModel):
+    text: str
+    embedding: List[float]
+
+
+class DocumentEmbeddingResponse(BaseModel):
+    embeddings: Optional[List[List[float]]] = None
+    chunks: Optional[List[List[DocumentChunk]]] = None
+
+
+class EmbeddingSet(BaseModel):
+    vectors: Optional[List[List[float]]] = None
+    texts: Optional[List[str]] = None
+    collection: Optional[str] = None
+    ids: Optional[List[str]] = None
+
+
+class SimilarityMatrixRequest(BaseModel):
+    left: EmbeddingSet
+    right: EmbeddingSet
+    top_k: Optional[int] = None
+
+
+class SimilarityMatch(BaseModel):
+    index: int
+    id: Optional[str] = None
+    score: float
+
+
+class BackendCheckRequest(BaseModel):
+    backends: Optional[List[str]] = None
+    texts: Optional[List[str]] = None
+
+
+class CalibrationRequest(BaseModel):
+    texts: List[str]
+    top_k: int = 10
+    queries: int = 100
+
+
+class SimilarityMatrixResponse(BaseModel):
+    shape: List[int]
+    left_ids: Optional[List[str]] = None
+    right_ids: Optional[List[str]] = None
+    matrix: Optional[List[List[float]]] = None
+    matches: Optional[List[List[SimilarityMatch]]] = None
+
+
 # Generate embeddings endpoint
 @router.post("/generate", response_model=EmbeddingResponse)
-async def generate_embeddings(request: EmbeddingRequest):
+async def generate_embeddings(
+    request: EmbeddingRequest,
+    wire_format: Optional[str] = Query(None, alias="format"),
+    dtype: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
     """
     Generate embeddings for a list of texts
+
+    The response defaults to JSON lists of floats. Use format=base64 or
+    format=binary (or Accept: application/octet-stream) with an optional
+    dtype of float32, float16 or int8 for compact output.
     """
+    try:
+        wire_format, dtype = negotiate_format(accept, wire_format, dtype)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         logger.info(f"Generating embeddings for {len(request.texts)} texts")
-        embeddings = embedding_service.generate_embeddings(request.texts)
-        return {"embeddings": embeddings}
+        embeddings = await embedding_batcher.submit(
+            request.texts, embedding_service.model_name
+        )
+        return render_embeddings(embeddings, wire_format, dtype)
+    except InferenceOverloadedError as e:
+        logger.warning(f"Embedding request rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Stream embeddings endpoint
+@router.post("/stream")
+async def stream_embeddings_ndjson(request: Request, model: Optional[str] = None):
+    """
+    Stream embeddings for a newline-delimited JSON body of {"id", "text"}
+    records, returning {"id", "embedding"} lines as each batch is encoded.
+    The model defaults to the service's model; others must be allowlisted.
+    """
+    model = model or embedding_service.model_name
+    try:
+        model_registry.check_allowed(model)
+    except ModelNotAllowedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Streaming embeddings using {model}")
+    return DuplexStreamingResponse(
+        stream_embeddings(request.stream(), encode_texts, model),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+# Long document embeddings endpoint
+@router.post("/documents", response_model=DocumentEmbeddingResponse)
+async def generate_document_embeddings(request: DocumentEmbeddingRequest):
+    """
+    Embed long documents by splitting them into token-budgeted, overlapping,
+    Markdown-aware chunks and pooling the chunk vectors (mean or max) into
+    one vector per document. With pooling "none" or include_chunks, the
+    chunk texts and vectors are returned per document.
+    """
+    try:
+        logger.info(
+            f"Generating {request.pooling}-pooled embeddings for "
+            f"{len(request.documents)} documents"
+        )
+        result = await inference_executor.run(
+            embed_documents,
+            request.documents,
+            request.pooling,
+            request.max_tokens,
+            request.overlap_tokens,
+        )
+
+        body: Dict[str, Any] = {}
+        if result["embeddings"] is not None:
+            body["embeddings"] = result["embeddings"].tolist()
+        if request.include_chunks or result["embeddings"] is None:
+            chunks = [[] for _ in request.documents]
+            for text, owner, embedding in zip(
+                result["chunks"],
+                result["owners"],
+                result["chunk_embeddings"].tolist(),
+            ):
+                chunks[owner].append({"text": text, "embedding": embedding})
+            body["chunks"] = chunks
+        return JSONResponse(body)
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Document embedding request rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating document embeddings: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # Compute similarity endpoint
 @router.post("/similarity", response_model=SimilarityResponse)
 async def compute_similarity(request: SimilarityRequest):
@@ -59,3 +230,161 @@ async def compute_similarity(request: SimilarityRequest):
     except Exception as e:
         logger.error(f"Error computing similarity: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# Batching statistics endpoint
+@router.get("/stats")
+async def get_stats():
+    """
+    Get micro-batching, cache, length bucketing and model registry
+    statistics for the embedding endpoints
+    """
+    return {
+        "backend": selected_backend(),
+        "batching": embedding_batcher.stats(),
+        "cache": embedding_cache.stats(),
+        "bucketing": length_bucketer.stats(),
+        "models": model_registry.stats(),
+        "reduction": {
+            "type": embedding_service.reduction,
+            "dimension": embedding_service.target_dimension,
+            "calibrated": embedding_service.quantizer() is not None,
+        },
+    }
+
+
+async def _resolve_embedding_set(
+    embedding_set: EmbeddingSet,
+) -> Tuple[np.ndarray, Optional[List[str]]]:
+    """
+    Turn an embedding set given as vectors, texts or stored ids into an array
+    """
+    if embedding_set.collection is not None:
+        collection = vector_index.get_collection(embedding_set.collection)
+        ids, vectors = collection.get(embedding_set.ids)
+        return vectors, ids
+    if embedding_set.vectors is not None:
+        return np.asarray(embedding_set.vectors, dtype=np.float32), embedding_set.ids
+    if embedding_set.texts is not None:
+        vectors = await inference_executor.run(
+            encode_texts, embedding_set.texts, embedding_service.model_name
+        )
+        return vectors, embedding_set.ids
+    raise ValueError("Each set needs 'vectors', 'texts' or a 'collection'")
+
+
+# Compute similarity matrix endpoint
+@router.post("/similarity/matrix", response_model=SimilarityMatrixResponse)
+async def compute_similarity_matrix_endpoint(request: SimilarityMatrixRequest):
+    """
+    Compute cosine similarities between two sets of embeddings in one call
+
+    Each set may be given as vectors, as texts to embed, or as ids stored in
+    a vector collection (all of the collection when ids are omitted). Returns
+    the full similarity matrix, or the top_k matches per left row.
+    """
+    try:
+        left, left_ids = await _resolve_embedding_set(request.left)
+        right, right_ids = await _resolve_embedding_set(request.right)
+        shape = [len(left), len(right)]
+        logger.info(f"Computing {shape[0]}x{shape[1]} similarity matrix")
+
+        max_cells = int(os.getenv("SIMILARITY_MAX_CELLS", "4000000"))
+        if request.top_k is None and shape[0] * shape[1] > max_cells:
+            raise ValueError(
+                f"Matrix of {shape[0]}x{shape[1]} exceeds {max_cells} cells, "
+                "use top_k instead"
+            )
+        if shape[0] == 0 or shape[1] == 0:
+            dimension = left.shape[-1] if shape[0] else right.shape[-1]
+            left = left.reshape(shape[0], dimension)
+            right = right.reshape(shape[1], dimension)
+
+        result = await inference_executor.run(
+            compute_similarity_matrix, left, right, request.top_k
+        )
+
+        body: Dict[str, Any] = {
+            "shape": shape,
+            "left_ids": left_ids,
+            "right_ids": right_ids,
+        }
+        if request.top_k is None:
+            body["matrix"] = result.tolist()
+        else:
+            indices, scores = result
+            body["matches"] = [
+                [
+                    {
+                        "index": j,
+                        "id": right_ids[j] if right_ids is not None else None,
+                        "score": score,
+                    }
+                    for j, score in zip(row_indices, row_scores)
+                ]
+                for row_indices, row_scores in zip(indices.tolist(), scores.tolist())
+            ]
+        # Skip response_model validation of potentially large matrices
+        return JSONResponse(body)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Similarity matrix request rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error computing similarity matrix: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Backend accuracy check endpoint
+@router.post("/backends/check")
+async def check_backends(request: BackendCheckRequest):
+    """
+    Compare the quantized and ONNX inference backends against fp32
+
+    Encodes a reference set with the embedding model under each backend and
+    reports cosine agreement with the fp32 embeddings and throughput, so a
+    backend can be validated before selecting it with INFERENCE_BACKEND.
+    The backend encoders are held by the model registry, within its memory
+    budget, and the check runs on the bulk lane behind live requests.
+    """
+    try:
+        return await inference_executor.run_bulk(
+            check_inference_backends, request.backends, request.texts
+        )
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error checking backends: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Calibration endpoint
+@router.post("/calibrate")
+async def calibrate(request: CalibrationRequest):
+    """
+    Fit the configured dimensionality reduction (EMBEDDING_REDUCTION) and
+    the int8/binary quantizer on representative texts and store them for
+    the model
+
+    Reports the recall at top_k of reduced, int8 and binary search against
+    exact search over the raw embeddings, with the bytes stored per vector.
+    Collections created from texts afterwards use the calibrated quantizer.
+    """
+    try:
+        return await inference_executor.run(
+            calibrate_embeddings, request.texts, request.top_k, request.queries
+        )
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Calibration rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error calibrating embeddings: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
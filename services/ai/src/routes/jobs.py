@@ -0,0 +1,183 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+import json
+import asyncio
+import logging
+from src.services.embedding_codec import (
+    BINARY_FORMAT,
+    negotiate_format,
+    render_embeddings,
+)
+from src.services.embedding_stream import NDJSON_MEDIA_TYPE
+from src.services.job_queue import (
+    TERMINAL_STATES,
+    JobQueueFullError,
+    job_queue,
+    read_corpus,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter()
+
+# Longest wait between progress events while a job makes no progress
+EVENT_HEARTBEAT_SECONDS = 15.0
+
+
+# Define request and response models
+class JobRequest(BaseModel):
+    kind: str = "embeddings"
+    texts: Optional[List[str]] = None
+    ids: Optional[List[str]] = None
+    corpus_path: Optional[str] = None
+    collection: Optional[str] = None
+    chunk_size: Optional[int] = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    model: str
+    collection: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    texts: int
+    chunk_size: int
+    chunks: int
+    completed_chunks: int
+    progress: float
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+
+class JobListResponse(BaseModel):
+    jobs: List[JobResponse]
+    queue: Dict[str, Any]
+
+
+# Submit job endpoint
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queue a background embeddings or reindex job from texts or from a file
+    in JOB_CORPUS_DIR. Embeddings jobs keep their vectors for download in
+    chunks; reindex jobs rebuild a vector collection and swap it in when
+    done.
+    """
+    if (request.texts is None) == (request.corpus_path is None):
+        raise HTTPException(
+            status_code=400, detail="Provide exactly one of 'texts' or 'corpus_path'"
+        )
+
+    try:
+        ids, texts = request.ids, request.texts
+        if request.corpus_path is not None:
+            path = job_queue.resolve_corpus(request.corpus_path)
+            corpus_ids, texts = await asyncio.to_thread(read_corpus, path)
+            ids = ids or corpus_ids
+        job = job_queue.submit(
+            request.kind, texts, ids, request.collection, request.chunk_size
+        )
+        return job.progress()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        logger.warning(f"Job rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# List jobs endpoint
+@router.get("/jobs", response_model=JobListResponse)
+async def list_jobs():
+    """
+    Get the progress of every known job and the queue statistics
+    """
+    return {
+        "jobs": [job.progress() for job in job_queue.jobs.values()],
+        "queue": job_queue.stats(),
+    }
+
+
+# Job status endpoint
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Get the status and progress of a job
+    """
+    try:
+        return job_queue.get(job_id).progress()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+# Job progress stream endpoint
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream job progress as NDJSON, one line per finished chunk, until the
+    job completes, fails or is cancelled
+    """
+    try:
+        job = job_queue.get(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+    async def events():
+        while True:
+            yield json.dumps(job.progress()) + "\n"
+            if job.status in TERMINAL_STATES:
+                return
+            await job.wait_for_update(EVENT_HEARTBEAT_SECONDS)
+
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE)
+
+
+# Job results endpoint
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    chunk: int = 0,
+    wire_format: Optional[str] = Query(None, alias="format"),
+    dtype: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Get the embeddings of one finished chunk of an embeddings job, in the
+    same formats as /embeddings
+    """
+    try:
+        wire_format, dtype = negotiate_format(accept, wire_format, dtype)
+        job, embeddings = await asyncio.to_thread(job_queue.results, job_id, chunk)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start, end = job.chunk_bounds(chunk)
+    extra: Dict[str, Any] = {"job": job.id, "chunk": chunk, "chunks": job.chunks}
+    if wire_format != BINARY_FORMAT:
+        extra["ids"] = job.ids[start:end]
+    return render_embeddings(embeddings, wire_format, dtype, extra)
+
+
+# Cancel job endpoint
+@router.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a job; a running job stops after its current chunk
+    """
+    try:
+        return job_queue.cancel(job_id).progress()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
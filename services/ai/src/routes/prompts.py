@@ -1,8 +1,18 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import os
+import json
+import asyncio
 import logging
-from src.services.prompt_service import prompt_service
+from src.services.inference_executor import (
+    inference_executor,
+    InferenceOverloadedError,
+)
+from src.services.prompt_budget import default_max_tokens
+from src.services.embedding_stream import NDJSON_MEDIA_TYPE
+from src.services.prompt_service import build_prompt, build_prompts, prompt_service
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,44 +25,193 @@ router = APIRouter()
 class PromptRequest(BaseModel):
     template_name: str
     context: Dict[str, Any]
+    max_tokens: Optional[int] = None
+    query: Optional[str] = None
 
 
 class PromptResponse(BaseModel):
     prompt: str
+    token_count: Optional[int] = None
+    truncated: bool = False
+    fields: Dict[str, Dict[str, int]] = {}
+
+
+class BatchPromptItem(BaseModel):
+    template_name: str
+    context: Dict[str, Any] = {}
+    max_tokens: Optional[int] = None
+    query: Optional[str] = None
+
+
+class BatchPromptRequest(BaseModel):
+    items: List[BatchPromptItem]
+    context: Dict[str, Any] = {}
+    max_tokens: Optional[int] = None
+    stream: bool = False
+
+
+class BatchPromptResult(BaseModel):
+    index: int
+    template_name: str
+    prompt: Optional[str] = None
+    token_count: Optional[int] = None
+    truncated: bool = False
+    fields: Dict[str, Dict[str, int]] = {}
+    error: Optional[str] = None
+
+
+class BatchPromptResponse(BaseModel):
+    results: List[BatchPromptResult]
+    succeeded: int
+    failed: int
+
+
+class TemplateInfo(BaseModel):
+    name: str
+    fields: List[str]
+    origin: str
 
 
 class TemplatesResponse(BaseModel):
     templates: List[str]
+    details: List[TemplateInfo]
+    last_reload: Optional[Dict[str, Any]] = None
 
 
 # Generate prompt endpoint
 @router.post("/generate", response_model=PromptResponse)
 async def generate_prompt(request: PromptRequest):
     """
-    Generate a prompt using a template and context data
+    Generate a prompt using a template and context data. With max_tokens
+    (or PROMPT_MAX_TOKENS) the documentation, code snippets and related
+    developments are cut down to the chunks most relevant to the query.
     """
     try:
         logger.info(f"Generating prompt with template '{request.template_name}'")
-        prompt = prompt_service.generate_prompt(request.template_name, request.context)
-        return {"prompt": prompt}
+        return await inference_executor.run(
+            build_prompt,
+            request.template_name,
+            request.context,
+            default_max_tokens(request.max_tokens),
+            request.query,
+        )
     except ValueError as e:
         logger.error(f"Value error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Prompt request rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating prompt: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _batch_result(index: int, template_name: str, outcome: Any) -> Dict[str, Any]:
+    if isinstance(outcome, Exception):
+        if not isinstance(outcome, ValueError):
+            logger.error(f"Error generating prompt {index}: {outcome}")
+        return {"index": index, "template_name": template_name, "error": str(outcome)}
+    return {"index": index, "template_name": template_name, **outcome}
+
+
+# Batch prompt generation endpoint
+@router.post("/batch", response_model=BatchPromptResponse)
+async def generate_prompts_batch(request: BatchPromptRequest):
+    """
+    Generate many prompts in one request, e.g. one per matched project and
+    development. Each item names a template and its context; the shared
+    context is merged under every item's context. Results and errors are
+    returned per item, in order. With stream set, results are sent as NDJSON
+    lines as each slice of items is rendered.
+    """
+    max_items = int(os.getenv("PROMPT_BATCH_MAX_ITEMS", "1000"))
+    if len(request.items) > max_items:
+        raise HTTPException(
+            status_code=400, detail=f"At most {max_items} items per batch"
+        )
+    try:
+        max_tokens = default_max_tokens(request.max_tokens)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items: List[Tuple[str, Dict[str, Any], Optional[int], Optional[str]]] = [
+        (
+            item.template_name,
+            {**request.context, **item.context},
+            item.max_tokens if item.max_tokens is not None else max_tokens,
+            item.query,
+        )
+        for item in request.items
+    ]
+    slice_size = int(os.getenv("PROMPT_BATCH_SLICE", "64"))
+    logger.info(f"Generating {len(items)} prompts")
+
+    async def render_slices():
+        for start in range(0, len(items), slice_size):
+            batch = items[start : start + slice_size]
+            outcomes = await inference_executor.run(build_prompts, batch)
+            yield [
+                _batch_result(start + offset, batch[offset][0], outcome)
+                for offset, outcome in enumerate(outcomes)
+            ]
+
+    if request.stream:
+
+        async def lines():
+            try:
+                async for results in render_slices():
+                    yield "".join(json.dumps(result) + "\n" for result in results)
+            except Exception as e:
+                # The response has started; report the failure in-band
+                logger.error(f"Error generating prompt batch: {e}")
+                yield json.dumps({"error": str(e)}) + "\n"
+
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        results = [result async for batch in render_slices() for result in batch]
+    except InferenceOverloadedError as e:
+        logger.warning(f"Prompt batch rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating prompt batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    failed = sum(1 for result in results if "error" in result)
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+    }
+
+
 # Get available templates endpoint
 @router.get("/templates", response_model=TemplatesResponse)
 async def get_templates():
     """
-    Get a list of available template names
+    Get the available templates with their required fields, from the
+    in-memory template registry
     """
     try:
         logger.info("Getting available templates")
-        templates = prompt_service.get_available_templates()
-        return {"templates": templates}
+        return {
+            "templates": prompt_service.get_available_templates(),
+            "details": prompt_service.describe_templates(),
+            "last_reload": prompt_service.registry.last_reload,
+        }
     except Exception as e:
         logger.error(f"Error getting templates: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# Reload templates endpoint
+@router.post("/templates/reload", response_model=TemplatesResponse)
+async def reload_templates():
+    """
+    Reload the template directory now instead of waiting for the watcher.
+    If any template fails to compile, the previous templates stay in use.
+    """
+    report = await asyncio.to_thread(prompt_service.registry.reload)
+    if report["status"] != "reloaded":
+        raise HTTPException(status_code=400, detail=report["errors"])
+    return await get_templates()
@@ -0,0 +1,159 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import numpy as np
+from src.services.embedding_service import embedding_service, encode_texts
+from src.services.inference_executor import (
+    inference_executor,
+    InferenceOverloadedError,
+)
+from src.services.relevance_table import relevance_table
+from src.services.state_owner import state_owner
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter()
+
+
+# Define request and response models
+class RelevanceUpsertRequest(BaseModel):
+    ids: List[str]
+    vectors: Optional[List[List[float]]] = None
+    texts: Optional[List[str]] = None
+
+
+class RelevanceDeleteRequest(BaseModel):
+    ids: List[str]
+
+
+class RelevanceUpdateResponse(BaseModel):
+    side: str
+    updated: int
+    table: Dict[str, Any]
+
+
+class RelevanceMatch(BaseModel):
+    id: str
+    score: float
+
+
+class RelevanceMatchesResponse(BaseModel):
+    side: str
+    id: str
+    matches: List[RelevanceMatch]
+
+
+# Upsert developments or projects endpoint
+@router.post("/relevance/{side}/upsert", response_model=RelevanceUpdateResponse)
+async def upsert_items(side: str, request: RelevanceUpsertRequest):
+    """
+    Add or update developments or projects in the relevance table.
+    Only the changed items' scores are recomputed. Provide either
+    precomputed vectors or texts to embed.
+    """
+    if (request.vectors is None) == (request.texts is None):
+        raise HTTPException(
+            status_code=400, detail="Provide exactly one of 'vectors' or 'texts'"
+        )
+    items = request.vectors if request.vectors is not None else request.texts
+    if len(items) != len(request.ids):
+        raise HTTPException(status_code=400, detail="Expected one item per id")
+
+    try:
+        logger.info(f"Upserting {len(request.ids)} {side} into the relevance table")
+        if request.texts is not None:
+            vectors = await inference_executor.run(
+                encode_texts, request.texts, embedding_service.model_name
+            )
+        else:
+            vectors = np.asarray(request.vectors, dtype=np.float32)
+        # The table lives in this process, so table updates run on a thread
+        # rather than the inference pool, which is kept for encoding
+        await asyncio.to_thread(relevance_table.upsert, side, request.ids, vectors)
+        return {
+            "side": side,
+            "updated": len(request.ids),
+            "table": relevance_table.stats(),
+        }
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Relevance upsert rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating relevance table: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Delete developments or projects endpoint
+@router.post("/relevance/{side}/delete", response_model=RelevanceUpdateResponse)
+async def delete_items(side: str, request: RelevanceDeleteRequest):
+    """
+    Remove developments or projects from the relevance table
+    """
+    try:
+        logger.info(f"Deleting {len(request.ids)} {side} from the relevance table")
+        deleted = await asyncio.to_thread(relevance_table.delete, side, request.ids)
+        return {"side": side, "updated": deleted, "table": relevance_table.stats()}
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Current matches endpoint
+@router.get(
+    "/relevance/{side}/{item_id}/matches", response_model=RelevanceMatchesResponse
+)
+async def get_matches(side: str, item_id: str, top_k: int = 10):
+    """
+    Get the current top-k matches of a development (projects) or of a
+    project (developments) from the relevance table
+    """
+    try:
+        matches = relevance_table.matches(side, item_id, top_k)
+        return {
+            "side": side,
+            "id": item_id,
+            "matches": [
+                {"id": match_id, "score": score} for match_id, score in matches
+            ],
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Table statistics endpoint
+@router.get("/relevance/table")
+async def get_table_stats():
+    """
+    Get the size of the relevance table
+    """
+    return relevance_table.stats()
+
+
+# Snapshot endpoint
+@router.post("/relevance/snapshot")
+async def snapshot_table():
+    """
+    Write the relevance table to its snapshot file
+    """
+    if not relevance_table.path:
+        raise HTTPException(status_code=400, detail="RELEVANCE_TABLE_PATH is not set")
+    if not state_owner.is_owner:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Snapshots are written by worker {state_owner.owner_pid()}",
+        )
+    try:
+        await asyncio.to_thread(relevance_table.save)
+        return relevance_table.stats()
+    except Exception as e:
+        logger.error(f"Error saving relevance table: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,234 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import numpy as np
+from src.services.embedding_service import embedding_service, encode_texts
+from src.services.inference_executor import (
+    inference_executor,
+    InferenceOverloadedError,
+)
+from src.services.state_owner import state_owner
+from src.services.vector_index import vector_index
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter()
+
+
+# Define request and response models
+class UpsertRequest(BaseModel):
+    ids: List[str]
+    vectors: Optional[List[List[float]]] = None
+    texts: Optional[List[str]] = None
+
+
+class UpsertResponse(BaseModel):
+    collection: str
+    upserted: int
+    size: int
+
+
+class DeleteRequest(BaseModel):
+    ids: List[str]
+
+
+class DeleteResponse(BaseModel):
+    collection: str
+    deleted: int
+    size: int
+
+
+class SearchRequest(BaseModel):
+    collection: str
+    query: Optional[str] = None
+    vector: Optional[List[float]] = None
+    top_k: int = 10
+    mode: str = "dense"
+
+
+class SearchHit(BaseModel):
+    id: str
+    score: float
+
+
+class SearchResponse(BaseModel):
+    collection: str
+    results: List[SearchHit]
+
+
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+
+
+class CollectionsResponse(BaseModel):
+    collections: List[Dict[str, Any]]
+
+
+async def _encode(texts: List[str]) -> np.ndarray:
+    return await inference_executor.run(
+        encode_texts, texts, embedding_service.model_name
+    )
+
+
+# Upsert vectors endpoint
+@router.post("/collections/{name}/upsert", response_model=UpsertResponse)
+async def upsert_vectors(name: str, request: UpsertRequest):
+    """
+    Insert or replace vectors by id, creating the collection if needed.
+    Provide either precomputed vectors or texts to embed.
+    """
+    if (request.vectors is None) == (request.texts is None):
+        raise HTTPException(
+            status_code=400, detail="Provide exactly one of 'vectors' or 'texts'"
+        )
+    items = request.vectors if request.vectors is not None else request.texts
+    if len(items) != len(request.ids):
+        raise HTTPException(status_code=400, detail="Expected one item per id")
+
+    try:
+        logger.info(f"Upserting {len(request.ids)} vectors into '{name}'")
+        if request.texts is not None:
+            vectors = await _encode(request.texts)
+        else:
+            vectors = np.asarray(request.vectors, dtype=np.float32)
+        # Collections of the served model's embeddings use its calibration
+        quantizer = embedding_service.quantizer() if request.texts else None
+        # Off the event loop, since an upsert may (re)train the IVF index.
+        # Not on the inference pool: in process mode the write would land
+        # in a worker process's copy of the index.
+        await asyncio.to_thread(
+            vector_index.upsert, name, request.ids, vectors, request.texts, quantizer
+        )
+        size = len(vector_index.get_collection(name))
+        return {"collection": name, "upserted": len(request.ids), "size": size}
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Upsert rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error upserting vectors: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Delete vectors endpoint
+@router.post("/collections/{name}/delete", response_model=DeleteResponse)
+async def delete_vectors(name: str, request: DeleteRequest):
+    """
+    Delete vectors by id
+    """
+    try:
+        logger.info(f"Deleting {len(request.ids)} vectors from '{name}'")
+        deleted = await asyncio.to_thread(vector_index.delete, name, request.ids)
+        size = len(vector_index.get_collection(name))
+        return {"collection": name, "deleted": deleted, "size": size}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# List collections endpoint
+@router.get("/collections", response_model=CollectionsResponse)
+async def list_collections():
+    """
+    Get statistics for every vector collection
+    """
+    return {"collections": vector_index.stats()}
+
+
+# Snapshot endpoint
+@router.post("/collections/snapshot", response_model=CollectionsResponse)
+async def snapshot_collections():
+    """
+    Write all collections to the snapshot directory
+    """
+    if not vector_index.path:
+        raise HTTPException(status_code=400, detail="VECTOR_INDEX_PATH is not set")
+    if not state_owner.is_owner:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Snapshots are written by worker {state_owner.owner_pid()}",
+        )
+    try:
+        await asyncio.to_thread(vector_index.save)
+        return {"collections": vector_index.stats()}
+    except Exception as e:
+        logger.error(f"Error saving vector snapshot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Top-k search endpoint
+@router.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest):
+    """
+    Find the top-k most similar vectors in a collection for a query text
+    or query vector. Mode "lexical" ranks documents upserted with texts by
+    BM25 and "hybrid" fuses both rankings; both need a query text.
+    """
+    if request.mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown mode '{request.mode}', expected one of {SEARCH_MODES}",
+        )
+    if request.mode == "dense":
+        if (request.query is None) == (request.vector is None):
+            raise HTTPException(
+                status_code=400, detail="Provide exactly one of 'query' or 'vector'"
+            )
+    elif request.query is None:
+        raise HTTPException(
+            status_code=400, detail=f"Mode '{request.mode}' requires 'query'"
+        )
+
+    try:
+        logger.info(
+            f"Searching '{request.collection}' for top {request.top_k} "
+            f"({request.mode})"
+        )
+        # Index lookups run on a thread against this process's index, like
+        # upserts; only query encoding goes through the inference pool
+        if request.mode == "lexical":
+            hits = await asyncio.to_thread(
+                vector_index.search_lexical,
+                request.collection,
+                request.query,
+                request.top_k,
+            )
+        else:
+            if request.vector is not None:
+                query = np.asarray(request.vector, dtype=np.float32)
+            else:
+                query = (await _encode([request.query]))[0]
+            if request.mode == "hybrid":
+                hits = await asyncio.to_thread(
+                    vector_index.search_hybrid,
+                    request.collection,
+                    query,
+                    request.query,
+                    request.top_k,
+                )
+            else:
+                hits = await asyncio.to_thread(
+                    vector_index.search, request.collection, query, request.top_k
+                )
+        return {
+            "collection": request.collection,
+            "results": [{"id": hit_id, "score": score} for hit_id, score in hits],
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceOverloadedError as e:
+        logger.warning(f"Search rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching vectors: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
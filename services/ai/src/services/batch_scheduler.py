@@ -0,0 +1,177 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from src.services.inference_executor import InferenceExecutor, inference_executor
+from src.services.metrics import request_texts, stage_seconds
+from src.services.request_coalescer import RequestCoalescer, request_key
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    """
+    Texts collected for one model while the batch window is open
+    """
+
+    def __init__(self):
+        self.items: List[Tuple[List[str], asyncio.Future]] = []
+        self.enqueued: List[float] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """
+    Coalesces texts from concurrent requests into a single forward pass.
+
+    Each call to submit() joins the open batch for its model. The batch is
+    flushed when it reaches max_batch_size texts or when max_wait_ms has
+    elapsed since its first request, whichever comes first. The combined
+    batch runs once on the inference executor and every caller receives
+    the rows belonging to its own texts. A request with the same model and
+    texts as one still in flight awaits that request's result instead of
+    joining a batch.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str], str], np.ndarray],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        executor: Optional[InferenceExecutor] = None,
+    ):
+        """
+        Initialize the batcher
+
+        Args:
+            encode_fn: Blocking function taking (texts, model_name) and
+                returning a 2D numpy array with one row per text
+            max_batch_size: Flush as soon as this many texts are pending
+            max_wait_ms: Longest time a request waits for others to join
+            executor: Inference executor used to run the batches
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64")
+        )
+        self.max_wait_ms = (
+            max_wait_ms
+            if max_wait_ms is not None
+            else float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+        )
+        self.executor = executor or inference_executor
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._coalescer = RequestCoalescer("embeddings")
+
+    async def submit(self, texts: List[str], model_name: str) -> np.ndarray:
+        """
+        Queue texts for the next batch of the given model and await their embeddings
+
+        Args:
+            texts: List of texts to embed
+            model_name: Model the texts should be encoded with
+
+        Returns:
+            2D numpy array of embeddings in the same order as texts
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        request_texts.observe(len(texts), kind="embeddings")
+        return await self._coalescer.run(
+            request_key(model_name, texts), lambda: self._submit(texts, model_name)
+        )
+
+    async def _submit(self, texts: List[str], model_name: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.get(model_name)
+        if batch is None:
+            batch = self._pending[model_name] = _PendingBatch()
+        batch.items.append((list(texts), future))
+        batch.enqueued.append(time.perf_counter())
+        batch.size += len(texts)
+
+        if batch.size >= self.max_batch_size or self.max_wait_ms <= 0:
+            self._flush(model_name)
+        elif batch.timer is None:
+            batch.timer = loop.call_later(
+                self.max_wait_ms / 1000.0, self._flush, model_name
+            )
+
+        return await future
+
+    def _flush(self, model_name: str):
+        batch = self._pending.pop(model_name, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        now = time.perf_counter()
+        for enqueued in batch.enqueued:
+            stage_seconds.observe(now - enqueued, stage="batch_wait")
+
+        task = asyncio.ensure_future(self._run_batch(model_name, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, model_name: str, batch: _PendingBatch):
+        texts = [text for item_texts, _ in batch.items for text in item_texts]
+        self._record(model_name, len(batch.items), len(texts))
+
+        try:
+            embeddings = await self.executor.run(self.encode_fn, texts, model_name)
+        except Exception as e:
+            logger.error(f"Error running batch of {len(texts)} texts: {e}")
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future in batch.items:
+            end = offset + len(item_texts)
+            if not future.done():
+                future.set_result(embeddings[offset:end])
+            offset = end
+
+    def _record(self, model_name: str, requests: int, texts: int):
+        stats = self._stats.setdefault(
+            model_name, {"batches": 0, "requests": 0, "texts": 0, "filled_slots": 0}
+        )
+        stats["batches"] += 1
+        stats["requests"] += requests
+        stats["texts"] += texts
+        stats["filled_slots"] += min(texts, self.max_batch_size)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get batching statistics per model
+
+        Returns:
+            Dictionary with the batch settings, in-flight coalescing counts
+            and, for each model, the number of batches, requests and texts
+            plus the average batch fill rate
+        """
+        models = {}
+        for model_name, stats in self._stats.items():
+            models[model_name] = {
+                "batches": stats["batches"],
+                "requests": stats["requests"],
+                "texts": stats["texts"],
+                "avg_requests_per_batch": stats["requests"] / stats["batches"],
+                "fill_rate": stats["filled_slots"]
+                / (stats["batches"] * self.max_batch_size),
+            }
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "models": models,
+            "coalescing": self._coalescer.stats(),
+        }
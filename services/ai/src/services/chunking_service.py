@@ -0,0 +1,227 @@
+import os
+import re
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+WORD_PATTERN = re.compile(r"\S+")
+
+
+def split_markdown(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a Markdown document into blocks tagged with their heading path
+
+    Blocks are paragraphs, list groups or whole fenced code blocks. Headings
+    are not emitted as blocks; instead each block carries the chain of
+    headings it appears under (e.g. "# Setup > ## Install").
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        List of (heading_path, block) tuples in document order
+    """
+    blocks: List[Tuple[str, str]] = []
+    headings: List[Tuple[int, str]] = []
+    current: List[str] = []
+    in_code = False
+
+    def heading_path() -> str:
+        return " > ".join(f"{'#' * level} {title}" for level, title in headings)
+
+    def flush():
+        if current:
+            block = "\n".join(current).strip()
+            if block:
+                blocks.append((heading_path(), block))
+            current.clear()
+
+    for line in text.splitlines():
+        if FENCE_PATTERN.match(line):
+            if not in_code:
+                flush()
+            current.append(line)
+            in_code = not in_code
+            if not in_code:
+                flush()
+            continue
+        if in_code:
+            current.append(line)
+            continue
+
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            headings = [h for h in headings if h[0] < level]
+            headings.append((level, heading.group(2)))
+        elif not line.strip():
+            flush()
+        else:
+            current.append(line)
+
+    flush()
+    return blocks
+
+
+class DocumentChunker:
+    """
+    Splits documents into overlapping chunks that fit the model's token budget.
+
+    Markdown blocks are packed greedily into chunks of at most max_tokens
+    tokens as counted by the model's own tokenizer, each prefixed with its
+    heading path. Consecutive chunks share up to overlap_tokens of trailing
+    blocks, and blocks that are too long on their own are cut into
+    overlapping token windows.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any = None,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+    ):
+        """
+        Initialize the chunker
+
+        Args:
+            tokenizer: Hugging Face tokenizer of the embedding model; when
+                omitted whitespace-separated words are counted instead
+            max_tokens: Token budget per chunk, excluding special tokens
+            overlap_tokens: Tokens shared between consecutive chunks
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", "254"))
+        self.overlap_tokens = (
+            overlap_tokens
+            if overlap_tokens is not None
+            else int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+        )
+        if self.overlap_tokens >= self.max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for a batch of texts
+
+        Args:
+            texts: Texts to count
+
+        Returns:
+            Token count per text, excluding special tokens
+        """
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [len(WORD_PATTERN.findall(text)) for text in texts]
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def _token_spans(self, text: str) -> List[Tuple[int, int]]:
+        # Character span of every token, used to cut windows out of the text
+        if self.tokenizer is not None:
+            try:
+                encoded = self.tokenizer(
+                    text, add_special_tokens=False, return_offsets_mapping=True
+                )
+                return [tuple(span) for span in encoded["offset_mapping"]]
+            except (NotImplementedError, KeyError, TypeError):
+                pass
+        return [match.span() for match in WORD_PATTERN.finditer(text)]
+
+    def _windows(self, text: str, budget: int) -> List[str]:
+        spans = self._token_spans(text)
+        if not spans:
+            return [text] if text.strip() else []
+        overlap = min(self.overlap_tokens, budget // 2)
+        step = max(1, budget - overlap)
+        windows = []
+        for start in range(0, len(spans), step):
+            end = min(start + budget, len(spans))
+            windows.append(text[spans[start][0] : spans[end - 1][1]])
+            if end == len(spans):
+                break
+        return windows
+
+    def chunk(self, text: str) -> List[str]:
+        """
+        Split one document into chunks
+
+        Args:
+            text: Document text (Markdown or plain)
+
+        Returns:
+            List of chunk texts, each within the token budget
+        """
+        blocks = split_markdown(text)
+        if not blocks:
+            return []
+
+        paths = sorted({path for path, _ in blocks if path})
+        path_tokens = dict(zip(paths, self.count_tokens(paths)))
+        block_tokens = self.count_tokens([block for _, block in blocks])
+
+        chunks: List[str] = []
+        current: List[Tuple[str, int]] = []
+        current_path = None
+        current_size = 0
+
+        def emit():
+            body = "\n\n".join(block for block, _ in current)
+            chunks.append(f"{current_path}\n\n{body}" if current_path else body)
+
+        for (path, block), tokens in zip(blocks, block_tokens):
+            budget = max(1, self.max_tokens - path_tokens.get(path, 0))
+
+            if current and (path != current_path or current_size + tokens > budget):
+                emit()
+                # Carry trailing blocks of the same section into the next chunk
+                carried: List[Tuple[str, int]] = []
+                carried_size = 0
+                if path == current_path:
+                    for previous in reversed(current):
+                        if carried_size + previous[1] > self.overlap_tokens:
+                            break
+                        carried.insert(0, previous)
+                        carried_size += previous[1]
+                if carried_size + tokens > budget:
+                    carried, carried_size = [], 0
+                current, current_size = carried, carried_size
+
+            current_path = path
+            if tokens > budget:
+                # Oversized block: emit it as overlapping token windows
+                for window in self._windows(block, budget):
+                    current = [(window, budget)]
+                    emit()
+                current, current_size = [], 0
+                continue
+
+            current.append((block, tokens))
+            current_size += tokens
+
+        if current:
+            emit()
+        return chunks
+
+    def chunk_many(self, documents: List[str]) -> Tuple[List[str], List[int]]:
+        """
+        Chunk several documents into one flat list
+
+        Args:
+            documents: Document texts
+
+        Returns:
+            Tuple of (chunks, owners) where owners[i] is the index of the
+            document chunk i belongs to
+        """
+        chunks: List[str] = []
+        owners: List[int] = []
+        for index, document in enumerate(documents):
+            document_chunks = self.chunk(document) or [document]
+            chunks.extend(document_chunks)
+            owners.extend([index] * len(document_chunks))
+        return chunks, owners
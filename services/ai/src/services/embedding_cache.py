@@ -0,0 +1,305 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Keys per SELECT, below SQLite's default limit of 999 bound parameters
+DISK_LOOKUP_BATCH = 500
+
+deduplicated_texts = metrics.counter(
+    "deduplicated_texts", "Repeated texts in a batch that were encoded only once"
+)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so trivially different inputs share an entry
+
+    Applies Unicode NFC normalization and collapses runs of whitespace, which
+    the sentence-transformers tokenizers ignore anyway.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """
+    Build the content address for a (model, text) pair
+
+    Args:
+        model_name: Name of the model that produces the embedding
+        text: Raw input text
+
+    Returns:
+        Hex SHA-256 digest of the model name and normalized text
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by model name and text hash.
+
+    The first tier is an in-memory LRU bounded by the total size of the
+    stored vectors. The optional second tier is a SQLite database holding
+    float32 blobs, which survives restarts and is shared by worker processes.
+    Each process opens its own connection on first use, so a cache created
+    in a gunicorn master before forking never hands its handle to a worker.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Memory budget for the in-memory tier (0 disables it)
+            path: SQLite file for the persistent tier (None disables it)
+        """
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        )
+        self.path = path if path is not None else os.getenv("EMBEDDING_CACHE_PATH")
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Guards the SQLite connection separately, so disk I/O never holds
+        # up lookups served from memory
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "deduplicated": 0,
+        }
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        # Caller must hold the database lock. A connection inherited through fork()
+        # shares file locks with the parent, so it is dropped (not closed,
+        # which would touch the parent's state) and reopened in this process.
+        if not self.path:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            self._open_db()
+        return self._db
+
+    def _open_db(self):
+        logger.info(f"Opening persistent embedding cache at {self.path}")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+        self._db_pid = os.getpid()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        # Caller must hold the lock
+        if vector.nbytes > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._counters["evictions"] += 1
+
+    def _read_disk(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        rows: List[Tuple[str, bytes]] = []
+        with self._db_lock:
+            db = self._connection()
+            if db is None:
+                return rows
+            for start in range(0, len(keys), DISK_LOOKUP_BATCH):
+                batch = keys[start : start + DISK_LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(
+                    db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+        return rows
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up cached embeddings for a list of texts
+
+        Args:
+            model_name: Name of the model
+            texts: Texts to look up
+
+        Returns:
+            List aligned with texts holding a float32 vector or None for a miss
+        """
+        keys = [cache_key(model_name, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+
+        disk_lookup: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                    self._counters["hits"] += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+        rows = self._read_disk(list(disk_lookup)) if disk_lookup else []
+
+        with self._lock:
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember(key, vector)
+                for i in disk_lookup.pop(key):
+                    results[i] = vector
+                    self._counters["disk_hits"] += 1
+
+            self._counters["misses"] += sum(len(v) for v in disk_lookup.values())
+
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], embeddings: np.ndarray):
+        """
+        Store embeddings for a list of texts
+
+        Args:
+            model_name: Name of the model that produced the embeddings
+            texts: Texts that were embedded
+            embeddings: 2D array with one row per text
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        keys = [cache_key(model_name, text) for text in texts]
+
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                # Copy so cached rows don't pin the whole batch array in memory
+                self._remember(key, vector.copy())
+
+        with self._db_lock:
+            db = self._connection()
+            if db is not None:
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                    [
+                        (key, vector.shape[0], vector.tobytes())
+                        for key, vector in zip(keys, vectors)
+                    ],
+                )
+                db.commit()
+
+    def encode(
+        self,
+        texts: List[str],
+        model_name: str,
+        encode_fn: Callable[[List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        Encode texts, calling the model only for cache misses
+
+        Texts that repeat within the batch (after the same normalization as
+        the cache key) are encoded once and share the result.
+
+        Args:
+            texts: Texts to embed
+            model_name: Name of the model, used as part of the cache key
+            encode_fn: Function encoding a list of texts into a 2D array
+
+        Returns:
+            2D float32 array with one row per text
+        """
+        cached = self.get_many(model_name, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        if missing:
+            positions: Dict[str, List[int]] = {}
+            for i in missing:
+                positions.setdefault(cache_key(model_name, texts[i]), []).append(i)
+            unique = [texts[rows[0]] for rows in positions.values()]
+            if len(unique) < len(missing):
+                with self._lock:
+                    self._counters["deduplicated"] += len(missing) - len(unique)
+                deduplicated_texts.inc(len(missing) - len(unique))
+
+            encoded = np.asarray(encode_fn(unique), dtype=np.float32)
+            self.put_many(model_name, unique, encoded)
+            for row, rows in enumerate(positions.values()):
+                for i in rows:
+                    cached[i] = encoded[row]
+
+        return np.stack(cached) if cached else np.zeros((0, 0), dtype=np.float32)
+
+    def clear(self):
+        """
+        Drop all in-memory entries (the persistent tier is kept)
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss counters, hit rate and memory usage
+        """
+        with self._lock:
+            lookups = (
+                self._counters["hits"]
+                + self._counters["disk_hits"]
+                + self._counters["misses"]
+            )
+            hits = self._counters["hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": bool(self.path),
+            }
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache()
+metrics.gauge(
+    "embedding_cache_lookups",
+    "Embedding cache lookups by result since start",
+    lambda: {
+        key: embedding_cache.stats()[key] for key in ("hits", "disk_hits", "misses")
+    },
+    label="result",
+)
+metrics.gauge(
+    "embedding_cache_hit_ratio",
+    "Share of embedding cache lookups served from the cache",
+    lambda: embedding_cache.stats()["hit_rate"],
+)
+metrics.gauge(
+    "embedding_cache_bytes",
+    "Memory used by cached embeddings",
+    lambda: embedding_cache.stats()["bytes"],
+)
@@ -0,0 +1,217 @@
+import base64
+import struct
+import logging
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+from src.services.metrics import stage_seconds
+
+logger = logging.getLogger(__name__)
+
+# Wire formats understood by the embedding endpoints
+JSON_FORMAT = "json"
+BASE64_FORMAT = "base64"
+BINARY_FORMAT = "binary"
+WIRE_FORMATS = (JSON_FORMAT, BASE64_FORMAT, BINARY_FORMAT)
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+# Binary header: magic, dtype code, 3 padding bytes, rows, dimension
+HEADER = struct.Struct("<4sB3xII")
+MAGIC = b"EMB1"
+
+DTYPE_CODES = {"float32": 1, "float16": 2, "int8": 3}
+DTYPE_NAMES = {code: name for name, code in DTYPE_CODES.items()}
+
+
+def negotiate_format(
+    accept: Optional[str] = None,
+    wire_format: Optional[str] = None,
+    dtype: Optional[str] = None,
+) -> Tuple[str, str]:
+    """
+    Pick the response wire format and element type for an embedding request
+
+    An explicit format query parameter wins; otherwise an Accept header of
+    application/octet-stream selects the binary format. The element type may
+    be given as a query parameter or as a ``dtype`` media type parameter.
+
+    Args:
+        accept: Value of the Accept header
+        wire_format: Requested format (json, base64 or binary)
+        dtype: Requested element type (float32, float16 or int8)
+
+    Returns:
+        Tuple of (wire_format, dtype)
+
+    Raises:
+        ValueError: If the format or element type is not supported
+    """
+    accept_dtype = None
+    accept_binary = False
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() == BINARY_MEDIA_TYPE:
+            accept_binary = True
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "dtype":
+                    accept_dtype = value.strip().strip('"')
+            break
+
+    wire_format = (
+        wire_format or (BINARY_FORMAT if accept_binary else JSON_FORMAT)
+    ).lower()
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(
+            f"Unsupported format '{wire_format}', expected one of {', '.join(WIRE_FORMATS)}"
+        )
+
+    dtype = (dtype or accept_dtype or "float32").lower()
+    if dtype not in DTYPE_CODES:
+        raise ValueError(
+            f"Unsupported dtype '{dtype}', expected one of {', '.join(DTYPE_CODES)}"
+        )
+    if wire_format == JSON_FORMAT and dtype != "float32":
+        raise ValueError("The json format only supports dtype float32")
+
+    return wire_format, dtype
+
+
+def _pack(embeddings: np.ndarray, dtype: str) -> Tuple[bytes, Optional[bytes]]:
+    """
+    Convert embeddings to little-endian bytes of the requested type
+
+    Returns:
+        Tuple of (data, scales); scales holds one float32 per row for int8
+    """
+    if dtype == "float32":
+        return embeddings.astype("<f4", copy=False).tobytes(), None
+    if dtype == "float16":
+        return embeddings.astype("<f2").tobytes(), None
+
+    # Symmetric per-row int8 quantization
+    scales = np.abs(embeddings).max(axis=1, initial=0.0) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return quantized.tobytes(), scales.astype("<f4").tobytes()
+
+
+def encode_binary(embeddings: np.ndarray, dtype: str = "float32") -> bytes:
+    """
+    Serialize embeddings into the binary wire format
+
+    The payload is a 16 byte header (magic ``EMB1``, dtype code, rows,
+    dimension), followed for int8 by one float32 scale per row, followed by
+    the row-major element data. All values are little-endian.
+
+    Args:
+        embeddings: 2D array of embeddings
+        dtype: Element type to encode as
+
+    Returns:
+        Encoded bytes
+    """
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    rows, dim = embeddings.shape if embeddings.size else (0, 0)
+    data, scales = _pack(embeddings, dtype)
+    return HEADER.pack(MAGIC, DTYPE_CODES[dtype], rows, dim) + (scales or b"") + data
+
+
+def decode_binary(payload: bytes) -> np.ndarray:
+    """
+    Deserialize the binary wire format back into a float32 array
+
+    Args:
+        payload: Bytes produced by encode_binary
+
+    Returns:
+        2D float32 array of embeddings
+    """
+    magic, code, rows, dim = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Not an embedding payload")
+    dtype = DTYPE_NAMES[code]
+    offset = HEADER.size
+
+    if dtype == "int8":
+        scales = np.frombuffer(payload, dtype="<f4", count=rows, offset=offset)
+        offset += scales.nbytes
+        values = np.frombuffer(payload, dtype=np.int8, count=rows * dim, offset=offset)
+        return values.reshape(rows, dim).astype(np.float32) * scales[:, None]
+
+    values = np.frombuffer(
+        payload,
+        dtype="<f4" if dtype == "float32" else "<f2",
+        count=rows * dim,
+        offset=offset,
+    )
+    return values.reshape(rows, dim).astype(np.float32)
+
+
+def encode_base64(embeddings: np.ndarray, dtype: str = "float32") -> Dict[str, Any]:
+    """
+    Serialize embeddings as base64-packed arrays for a JSON body
+
+    Args:
+        embeddings: 2D array of embeddings
+        dtype: Element type to encode as
+
+    Returns:
+        Dictionary with the packed data, dtype, shape and (for int8) scales
+    """
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    rows, dim = embeddings.shape if embeddings.size else (0, 0)
+    data, scales = _pack(embeddings, dtype)
+    body = {
+        "embeddings_b64": base64.b64encode(data).decode("ascii"),
+        "dtype": dtype,
+        "shape": [rows, dim],
+    }
+    if scales is not None:
+        body["scales_b64"] = base64.b64encode(scales).decode("ascii")
+    return body
+
+
+def render_embeddings(
+    embeddings: np.ndarray,
+    wire_format: str = JSON_FORMAT,
+    dtype: str = "float32",
+    extra: Optional[Dict[str, Any]] = None,
+) -> Response:
+    """
+    Build the HTTP response for a batch of embeddings in the negotiated format
+
+    Returning a Response directly bypasses response_model validation, so no
+    format builds per-float pydantic objects.
+
+    Args:
+        embeddings: 2D array of embeddings
+        wire_format: One of json, base64 or binary
+        dtype: Element type for the base64 and binary formats
+        extra: Additional JSON fields (sent as X-Embedding-* headers in binary mode)
+
+    Returns:
+        Response carrying the encoded embeddings
+    """
+    with stage_seconds.time(stage="serialization"):
+        return _render(embeddings, wire_format, dtype, extra or {})
+
+
+def _render(
+    embeddings: np.ndarray, wire_format: str, dtype: str, extra: Dict[str, Any]
+) -> Response:
+    if wire_format == BINARY_FORMAT:
+        headers = {
+            f"X-Embedding-{key.title()}": str(value) for key, value in extra.items()
+        }
+        return Response(
+            content=encode_binary(embeddings, dtype),
+            media_type=BINARY_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    if wire_format == BASE64_FORMAT:
+        return JSONResponse({**encode_base64(embeddings, dtype), **extra})
+
+    return JSONResponse({"embeddings": np.asarray(embeddings).tolist(), **extra})
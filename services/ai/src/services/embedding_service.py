@@ -1,10 +1,27 @@
 import os
 import logging
-from typing import List, Optional
-import torch
-from sentence_transformers import SentenceTransformer
+from typing import Any, Dict, List, Optional, Tuple, Union
 import numpy as np
 from pathlib import Path
+from src.services.chunking_service import DocumentChunker
+from src.services.embedding_cache import embedding_cache
+from src.services.inference_backends import (
+    backend_model_key,
+    check_backend_accuracy,
+    load_encoder,
+    selected_backend,
+)
+from src.services.length_buckets import length_bucketer
+from src.services.metrics import request_texts, stage_seconds
+from src.services.model_registry import canonical_model_name, model_registry
+from src.services.model_warmup import warm_up
+from src.services.quantization import (
+    REDUCTIONS,
+    Calibration,
+    Quantizer,
+    calibration_path,
+    measure_recall,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +45,19 @@ class EmbeddingService:
         self.device = device or os.getenv("DEVICE", "cpu")
         self.model = None
         self.embedding_dim = int(os.getenv("EMBEDDING_DIMENSION", "384"))
+        self.reduction = os.getenv("EMBEDDING_REDUCTION", "none").lower()
+        if self.reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown embedding reduction '{self.reduction}'")
+        target = os.getenv("EMBEDDING_TARGET_DIMENSION")
+        self.target_dimension = int(target) if target else None
+        if self.reduction == "pca" and not self.target_dimension:
+            raise ValueError("EMBEDDING_REDUCTION=pca needs EMBEDDING_TARGET_DIMENSION")
+        if self.reduction != "none" and self.target_dimension:
+            self.embedding_dim = self.target_dimension
+        self.calibration_dir = os.getenv("EMBEDDING_CALIBRATION_DIR", "calibration")
+        self.calibration: Optional[Calibration] = None
+        # The service's model is always allowed and never evicted
+        model_registry.pin(self.model_name)
         logger.info(
             f"Initializing EmbeddingService with model {self.model_name} on {self.device}"
         )
@@ -39,7 +69,12 @@ class EmbeddingService:
         if self.model is None:
             logger.info(f"Loading model {self.model_name}...")
             try:
-                self.model = SentenceTransformer(self.model_name, device=self.device)
+                # The registry makes concurrent first requests share one load
+                model_registry.pin(self.model_name)
+                self.model = model_registry.get(
+                    self.model_name,
+                    loader=lambda name: load_encoder(name, device=self.device),
+                )
                 logger.info(
                     f"Model loaded successfully with dimension {self.model.get_sentence_embedding_dimension()}"
                 )
@@ -47,6 +82,129 @@ class EmbeddingService:
                 logger.error(f"Error loading model: {e}")
                 raise RuntimeError(f"Failed to load embedding model: {e}")
 
+    def serves(self, model_name: Optional[str]) -> bool:
+        """
+        Check whether a requested model name refers to the service's model
+
+        Args:
+            model_name: Requested model (None for the service's model)
+
+        Returns:
+            True if the name is None or names the service's model
+        """
+        return model_name is None or canonical_model_name(
+            model_name
+        ) == canonical_model_name(self.model_name)
+
+    def warm_up(self):
+        """
+        Load the model and run a warm-up encode, bypassing the cache
+        """
+        if self.model is None:
+            self.load_model()
+        warm_up(self.model)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts into a 2D numpy array of embeddings
+
+        Cached embeddings are returned without touching the model; only
+        cache misses are encoded. The configured reduction is applied to the
+        result; the cache holds the model's raw embeddings.
+
+        Args:
+            texts: List of texts to generate embeddings for
+
+        Returns:
+            Array of shape (len(texts), dimension)
+        """
+        try:
+            return self.get_calibration().reduce(self._encode_raw(texts))
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            raise RuntimeError(f"Failed to generate embeddings: {e}")
+
+    def _encode_raw(self, texts: List[str]) -> np.ndarray:
+        return embedding_cache.encode(
+            texts, backend_model_key(self.model_name), self._encode_uncached
+        )
+
+    def _encode_uncached(self, texts: List[str]) -> np.ndarray:
+        # Load model if not loaded
+        if self.model is None:
+            self.load_model()
+
+        # Batch texts of similar token length together to limit padding
+        return length_bucketer.encode(self.model, texts)
+
+    def get_calibration(self) -> Calibration:
+        """
+        Get the post-processing calibration of the model
+
+        Loaded from the model's calibration file when one matching the
+        configured reduction exists; otherwise an uncalibrated one is used,
+        which can truncate but not apply PCA.
+        """
+        if self.calibration is None:
+            path = calibration_path(
+                self.calibration_dir, backend_model_key(self.model_name)
+            )
+            calibration = Calibration(self.reduction, self.target_dimension)
+            if os.path.exists(path):
+                stored = Calibration.load(path)
+                if (stored.reduction, stored.dimension) == (
+                    self.reduction,
+                    self.target_dimension,
+                ):
+                    calibration = stored
+                else:
+                    logger.warning(
+                        f"Ignoring calibration {path}: it is for "
+                        f"{stored.reduction} to {stored.dimension} dimensions"
+                    )
+            self.calibration = calibration
+        return self.calibration
+
+    def quantizer(self) -> Optional[Quantizer]:
+        """
+        Get the calibrated quantizer for the model's embeddings, if any
+        """
+        quantizer = self.get_calibration().quantizer
+        return quantizer if quantizer.calibrated else None
+
+    def calibrate(
+        self, texts: List[str], top_k: int = 10, queries: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Fit the reduction and quantizer on sample texts and store them
+
+        Args:
+            texts: Representative texts; PCA needs at least as many as the
+                target dimension
+            top_k: Neighbours compared when measuring recall
+            queries: Sample texts used as queries when measuring recall
+
+        Returns:
+            Dictionary with the calibration settings, its file and the
+            measured recall and size of each storage type
+        """
+        raw = self._encode_raw(texts)
+        calibration = Calibration.fit(raw, self.reduction, self.target_dimension)
+        report = measure_recall(raw, calibration, top_k, queries)
+        path = calibration_path(
+            self.calibration_dir, backend_model_key(self.model_name)
+        )
+        calibration.save(path)
+        self.calibration = calibration
+        logger.info(f"Saved embedding calibration for {self.model_name} to {path}")
+        return {
+            "model": self.model_name,
+            "reduction": self.reduction,
+            "dimension": report["dimension"],
+            "path": path,
+            "recall": report,
+        }
+
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for a list of texts
@@ -60,19 +218,90 @@ class EmbeddingService:
         if not texts:
             return []
 
-        # Load model if not loaded
+        request_texts.observe(len(texts), kind="embeddings")
+        embeddings = self.encode(texts)
+
+        # Convert to list of lists for JSON serialization
+        with stage_seconds.time(stage="serialization"):
+            return embeddings.tolist()
+
+    def get_chunker(
+        self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None
+    ) -> DocumentChunker:
+        """
+        Create a document chunker that uses the model's tokenizer and budget
+
+        Args:
+            max_tokens: Token budget per chunk (capped at the model's limit)
+            overlap_tokens: Tokens shared between consecutive chunks
+
+        Returns:
+            Configured DocumentChunker
+        """
         if self.model is None:
             self.load_model()
 
-        try:
-            # Generate embeddings
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
+        # Leave room for the [CLS] and [SEP] tokens the model adds
+        limit = (getattr(self.model, "max_seq_length", None) or 256) - 2
+        max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", str(limit)))
+        return DocumentChunker(
+            getattr(self.model, "tokenizer", None),
+            min(max_tokens, limit),
+            overlap_tokens,
+        )
 
-            # Convert to list of lists for JSON serialization
-            return embeddings.tolist()
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {e}")
-            raise RuntimeError(f"Failed to generate embeddings: {e}")
+    def embed_documents(
+        self,
+        documents: List[str],
+        pooling: str = "mean",
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Embed long documents by chunking them and pooling the chunk vectors
+
+        All chunks of all documents are encoded together in one batched pass,
+        so no part of a document is lost to the model's truncation.
+
+        Args:
+            documents: Document texts (Markdown or plain)
+            pooling: "mean" or "max" to aggregate chunks into one vector per
+                document, or "none" to only return the chunk vectors
+            max_tokens: Token budget per chunk
+            overlap_tokens: Tokens shared between consecutive chunks
+
+        Returns:
+            Dictionary with "chunks" (chunk texts), "owners" (document index of
+            each chunk), "chunk_embeddings" (2D array) and "embeddings" (one
+            pooled vector per document, or None when pooling is "none")
+        """
+        if pooling not in ("mean", "max", "none"):
+            raise ValueError(f"Unknown pooling '{pooling}'")
+
+        chunker = self.get_chunker(max_tokens, overlap_tokens)
+        chunks, owners = chunker.chunk_many(documents)
+        chunk_embeddings = self.encode(chunks)
+
+        pooled = None
+        if pooling != "none" and documents:
+            owner_index = np.asarray(owners)
+            dimension = chunk_embeddings.shape[1]
+            if pooling == "mean":
+                norms = np.linalg.norm(chunk_embeddings, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                pooled = np.zeros((len(documents), dimension), dtype=np.float32)
+                np.add.at(pooled, owner_index, chunk_embeddings / norms)
+                pooled /= np.bincount(owner_index, minlength=len(documents))[:, None]
+            else:
+                pooled = np.full((len(documents), dimension), -np.inf, dtype=np.float32)
+                np.maximum.at(pooled, owner_index, chunk_embeddings)
+
+        return {
+            "chunks": chunks,
+            "owners": owners,
+            "chunk_embeddings": chunk_embeddings,
+            "embeddings": pooled,
+        }
 
     def compute_similarity(
         self, embedding1: List[float], embedding2: List[float]
@@ -101,6 +330,219 @@ class EmbeddingService:
 
         return float(dot_product / (norm1 * norm2))
 
+    def compute_similarity_matrix(
+        self,
+        left: np.ndarray,
+        right: np.ndarray,
+        top_k: Optional[int] = None,
+        chunk_bytes: Optional[int] = None,
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Compute cosine similarities between every pair of rows in two sets
+
+        Rows are normalized once and each chunk of left rows is scored
+        against all right rows with a single matrix multiplication. Chunks
+        are sized so that one block of scores stays within chunk_bytes.
+
+        Args:
+            left: 2D array of N embeddings
+            right: 2D array of M embeddings
+            top_k: If set, keep only the k best matches per left row
+            chunk_bytes: Memory budget for one block of scores
+
+        Returns:
+            The full (N, M) similarity matrix, or when top_k is set a tuple of
+            (indices, scores) arrays of shape (N, k) sorted by descending score
+        """
+        left = np.asarray(left, dtype=np.float32)
+        right = np.asarray(right, dtype=np.float32)
+        if left.ndim != 2 or right.ndim != 2 or left.shape[1] != right.shape[1]:
+            raise ValueError(
+                f"Incompatible embedding shapes {left.shape} and {right.shape}"
+            )
+
+        def normalize(vectors: np.ndarray) -> np.ndarray:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return vectors / norms
+
+        left = normalize(left)
+        right_t = np.ascontiguousarray(normalize(right).T)
+        n, m = left.shape[0], right.shape[0]
+
+        chunk_bytes = chunk_bytes or int(
+            os.getenv("SIMILARITY_CHUNK_BYTES", str(64 * 1024 * 1024))
+        )
+        chunk_rows = max(1, chunk_bytes // max(1, m * 4))
+
+        if top_k is None:
+            matrix = np.empty((n, m), dtype=np.float32)
+            for start in range(0, n, chunk_rows):
+                end = start + chunk_rows
+                np.matmul(left[start:end], right_t, out=matrix[start:end])
+            return matrix
+
+        k = max(0, min(top_k, m))
+        indices = np.empty((n, k), dtype=np.int64)
+        scores = np.empty((n, k), dtype=np.float32)
+        if k == 0:
+            return indices, scores
+        for start in range(0, n, chunk_rows):
+            end = start + chunk_rows
+            block = left[start:end] @ right_t
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            indices[start:end] = np.take_along_axis(top, order, axis=1)
+            scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+        return indices, scores
+
 
 # Singleton instance
 embedding_service = EmbeddingService()
+
+
+def get_model(model_name: Optional[str] = None) -> Any:
+    """
+    Get a loaded model by name
+
+    The service's model, under any of its names, is the service's own
+    instance; other models are loaded by the model registry, which enforces
+    the model allowlist.
+
+    Args:
+        model_name: Model name (None for the service's model)
+
+    Returns:
+        Loaded model
+    """
+    if embedding_service.serves(model_name):
+        if embedding_service.model is None:
+            embedding_service.load_model()
+        return embedding_service.model
+    return model_registry.get(model_name)
+
+
+def get_tokenizer(model_name: Optional[str] = None) -> Any:
+    """
+    Get a model's tokenizer without loading the model weights
+
+    The tokenizer of the resident service model is reused; otherwise only
+    the tokenizer files are loaded.
+
+    Args:
+        model_name: Model name (None for the service's model)
+
+    Returns:
+        Hugging Face tokenizer
+    """
+    if embedding_service.serves(model_name) and embedding_service.model is not None:
+        tokenizer = getattr(embedding_service.model, "tokenizer", None)
+        if tokenizer is not None:
+            return tokenizer
+    from transformers import AutoTokenizer
+
+    name = canonical_model_name(model_name or embedding_service.model_name)
+    logger.info(f"Loading tokenizer of {name}")
+    return AutoTokenizer.from_pretrained(name)
+
+
+def encode_texts(texts: List[str], model_name: Optional[str] = None) -> np.ndarray:
+    """
+    Encode texts with the singleton service
+
+    Module-level so it can be submitted to a process-based inference pool,
+    where each worker process lazily loads its own copy of the model. Texts
+    for the service's model get the service's reduction; other allowlisted
+    models share the embedding cache and length bucketing.
+    """
+    if embedding_service.serves(model_name):
+        return embedding_service.encode(texts)
+
+    def encode_misses(misses: List[str]) -> np.ndarray:
+        # Hold the model so it is not evicted mid-batch
+        with model_registry.use(model_name) as model:
+            return length_bucketer.encode(model, misses)
+
+    return embedding_cache.encode(texts, backend_model_key(model_name), encode_misses)
+
+
+def backend_encoder(backend: str) -> Any:
+    """
+    Get the service's model under an inference backend
+
+    The selected backend is the service's own model. Other backends are
+    loaded by the model registry as "<model>@<backend>", so they are loaded
+    once, count against the memory budget and can be evicted.
+
+    Args:
+        backend: Inference backend name
+
+    Returns:
+        Encoder exposing the SentenceTransformer encode interface
+    """
+    if backend == selected_backend():
+        return get_model()
+    return model_registry.get(
+        f"{canonical_model_name(embedding_service.model_name)}@{backend}",
+        loader=lambda _: load_encoder(
+            embedding_service.model_name, backend, embedding_service.device
+        ),
+        allow=True,
+    )
+
+
+def check_inference_backends(
+    backends: Optional[List[str]] = None, texts: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Compare inference backends of the singleton service's model
+
+    Module-level so it can be submitted to a process-based inference pool.
+    """
+    return check_backend_accuracy(
+        embedding_service.model_name,
+        backends,
+        texts,
+        embedding_service.device,
+        backend_encoder,
+    )
+
+
+def calibrate_embeddings(
+    texts: List[str], top_k: int = 10, queries: int = 100
+) -> Dict[str, Any]:
+    """
+    Calibrate the singleton service
+
+    Module-level so it can be submitted to a process-based inference pool.
+    """
+    return embedding_service.calibrate(texts, top_k, queries)
+
+
+def embed_documents(
+    documents: List[str],
+    pooling: str = "mean",
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Chunk and embed documents with the singleton service
+
+    Module-level so it can be submitted to a process-based inference pool.
+    """
+    return embedding_service.embed_documents(
+        documents, pooling, max_tokens, overlap_tokens
+    )
+
+
+def compute_similarity_matrix(
+    left: np.ndarray, right: np.ndarray, top_k: Optional[int] = None
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Compute a similarity matrix with the singleton service
+
+    Module-level so it can be submitted to a process-based inference pool.
+    """
+    with stage_seconds.time(stage="similarity"):
+        return embedding_service.compute_similarity_matrix(left, right, top_k)
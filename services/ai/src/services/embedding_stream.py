@@ -0,0 +1,153 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+import numpy as np
+from fastapi.responses import StreamingResponse
+from src.services.inference_executor import (
+    InferenceExecutor,
+    inference_executor,
+)
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Sentinel marking the end of the input stream
+_END = object()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response that may be sent while the request body is still arriving.
+
+    StreamingResponse normally consumes the ASGI receive channel to watch for
+    client disconnects, which would swallow request body chunks that the
+    streaming generator itself needs to read. Disconnects surface instead as
+    ClientDisconnect from request.stream().
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+async def _read_records(
+    chunks: AsyncIterator[bytes],
+    queue: "asyncio.Queue[Any]",
+    batch_size: int,
+):
+    """
+    Parse NDJSON records from the request body and queue them in batches
+
+    Each queued batch is a list of (id, text, error) tuples. The queue is
+    bounded, so reading pauses while encoding is behind.
+    """
+    buffer = b""
+    batch: List[Tuple[Any, Optional[str], Optional[str]]] = []
+    line_number = 0
+
+    async def parse(line: bytes):
+        nonlocal batch, line_number
+        line_number += 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            record = json.loads(line)
+            text = record["text"]
+            if not isinstance(text, str):
+                raise TypeError("'text' must be a string")
+            batch.append((record.get("id", line_number), text, None))
+        except Exception as e:
+            batch.append(
+                (line_number, None, f"Invalid record on line {line_number}: {e}")
+            )
+        if len(batch) >= batch_size:
+            await queue.put(batch)
+            batch = []
+
+    try:
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                await parse(line)
+        await parse(buffer)
+        if batch:
+            await queue.put(batch)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        await queue.put(_END)
+        raise
+    await queue.put(_END)
+
+
+async def stream_embeddings(
+    chunks: AsyncIterator[bytes],
+    encode_fn: Callable[[List[str], str], np.ndarray],
+    model_name: str,
+    batch_size: Optional[int] = None,
+    executor: Optional[InferenceExecutor] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Embed an NDJSON stream of {"id", "text"} records batch by batch
+
+    Reading the input and encoding run concurrently: while one batch is on
+    the inference executor's bulk lane the next one is being parsed, and each finished
+    batch is written out immediately as {"id", "embedding"} lines. At most a
+    couple of batches are held in memory regardless of the corpus size.
+    Malformed records produce {"id", "error"} lines instead of aborting.
+
+    Args:
+        chunks: Raw request body chunks
+        encode_fn: Blocking function taking (texts, model_name)
+        model_name: Model to encode with
+        batch_size: Records per internal batch
+        executor: Inference executor used to run the batches
+
+    Yields:
+        NDJSON-encoded result lines
+    """
+    batch_size = batch_size or int(os.getenv("EMBEDDING_STREAM_BATCH_SIZE", "128"))
+    executor = executor or inference_executor
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=2)
+    reader = asyncio.ensure_future(_read_records(chunks, queue, batch_size))
+
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is _END:
+                break
+
+            valid = [(record_id, text) for record_id, text, error in batch if not error]
+            embeddings = None
+            if valid:
+                # Bulk streams run on the bulk lane, behind interactive traffic
+                embeddings = await executor.run_bulk(
+                    encode_fn, [text for _, text in valid], model_name
+                )
+
+            lines = []
+            row = 0
+            for record_id, text, error in batch:
+                if error:
+                    lines.append(json.dumps({"id": record_id, "error": error}))
+                else:
+                    lines.append(
+                        json.dumps(
+                            {"id": record_id, "embedding": embeddings[row].tolist()}
+                        )
+                    )
+                    row += 1
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+        # Propagate read errors such as client disconnects
+        await reader
+    finally:
+        if not reader.done():
+            reader.cancel()
@@ -0,0 +1,450 @@
+import os
+import re
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+import numpy as np
+from src.services.metrics import batch_texts, stage_seconds, text_tokens, tokens
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+# Reference sentences for the backend accuracy check
+REFERENCE_TEXTS = [
+    "Add OAuth login with GitHub to the desktop app",
+    "Migrate the project list page to server-side pagination",
+    "New open-source vector database with HNSW indexing released",
+    "TypeError: Cannot read properties of undefined (reading 'map')",
+    "Fine-tuning small language models on consumer GPUs",
+    "Sync local project folders with the backend every five minutes",
+    "React Server Components reduce client bundle size",
+    "How to structure a monorepo with Yarn workspaces",
+    "Benchmark of ONNX Runtime versus PyTorch inference on CPU",
+    "Write unit tests for the relevance matching service",
+    "Prompt engineering techniques for code generation assistants",
+    "PostgreSQL connection pool exhausted under load",
+    "Retrieval augmented generation with hybrid lexical and dense search",
+    "Dark mode toggle for the settings screen",
+    "Quantization-aware training keeps accuracy at int8 precision",
+    "Deploy the AI service to Render with a Dockerfile",
+]
+
+
+def selected_backend() -> str:
+    """
+    Get the inference backend selected by the INFERENCE_BACKEND variable
+
+    Returns:
+        Backend name (default: torch)
+    """
+    return os.getenv("INFERENCE_BACKEND", "torch").lower()
+
+
+def backend_model_key(model_name: str) -> str:
+    """
+    Get the embedding cache namespace for a model under the selected backend
+
+    Quantized and ONNX embeddings differ slightly from fp32 ones, so they are
+    cached separately instead of being mixed with reference embeddings.
+
+    Args:
+        model_name: Name of the model
+
+    Returns:
+        The model name, suffixed with the backend unless it is plain torch
+    """
+    backend = selected_backend()
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+_encode_state = threading.local()
+
+
+def instrument_encoder(model: Any) -> Any:
+    """
+    Record per-stage metrics for every encode call of a model
+
+    Wraps the model's tokenize and encode methods so each call reports
+    tokenization and forward-pass time, texts per call, tokens per text and
+    padding tokens.
+
+    Args:
+        model: Loaded encoder
+
+    Returns:
+        The same model, instrumented
+    """
+    encode = model.encode
+    tokenize = getattr(model, "tokenize", None)
+
+    def timed_tokenize(texts, *args, **kwargs):
+        start = time.perf_counter()
+        features = tokenize(texts, *args, **kwargs)
+        _encode_state.tokenize_seconds = (
+            getattr(_encode_state, "tokenize_seconds", 0.0)
+            + time.perf_counter()
+            - start
+        )
+        mask = features.get("attention_mask") if hasattr(features, "get") else None
+        if mask is not None:
+            lengths = mask.sum(1).tolist()
+            for length in lengths:
+                text_tokens.observe(length)
+            text_total = sum(lengths)
+            tokens.inc(text_total, kind="text")
+            tokens.inc(
+                len(lengths) * max(lengths, default=0) - text_total, kind="padding"
+            )
+        return features
+
+    def timed_encode(sentences, *args, **kwargs):
+        _encode_state.tokenize_seconds = 0.0
+        start = time.perf_counter()
+        result = encode(sentences, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+        tokenize_seconds = _encode_state.tokenize_seconds
+        if tokenize is not None:
+            stage_seconds.observe(tokenize_seconds, stage="tokenization")
+        stage_seconds.observe(max(0.0, elapsed - tokenize_seconds), stage="forward")
+        batch_texts.observe(1 if isinstance(sentences, str) else len(sentences))
+        return result
+
+    if tokenize is not None:
+        model.tokenize = timed_tokenize
+    model.encode = timed_encode
+    return model
+
+
+def inference_threads() -> Optional[int]:
+    """
+    Get the configured number of intra-op threads per process
+
+    Returns:
+        Thread count from INFERENCE_THREADS, or None to use library defaults
+    """
+    value = os.getenv("INFERENCE_THREADS")
+    return int(value) if value else None
+
+
+def load_sentence_transformer(model_name: str, device: Optional[str] = None) -> Any:
+    """
+    Load a SentenceTransformer model
+
+    Args:
+        model_name: Name or path of the model
+        device: Device to load onto (defaults to the DEVICE variable)
+
+    Returns:
+        Loaded SentenceTransformer model
+    """
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device=device or os.getenv("DEVICE", "cpu"))
+
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an exported transformer graph on ONNX Runtime.
+
+    Implements the subset of the SentenceTransformer interface used by the
+    service (encode, tokenizer, max_seq_length, embedding dimension) and
+    reproduces the model's pooling and normalization in numpy.
+    """
+
+    def __init__(
+        self,
+        session: Any,
+        tokenizer: Any,
+        max_seq_length: int,
+        pooling_mode: str,
+        normalize: bool,
+        dimension: int,
+        nbytes: int = 0,
+    ):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.pooling_mode = pooling_mode
+        self.normalize = normalize
+        self.dimension = dimension
+        self.nbytes = nbytes
+        self.input_names = [node.name for node in session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def tokenize(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        return self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling_mode == "cls":
+            return hidden[:, 0]
+        mask = mask[..., None].astype(np.float32)
+        if self.pooling_mode == "max":
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        **kwargs: Any,
+    ) -> np.ndarray:
+        """
+        Encode sentences into embeddings
+
+        Args:
+            sentences: A sentence or list of sentences
+            batch_size: Sentences per forward pass
+            convert_to_numpy: Accepted for compatibility; output is always numpy
+            normalize_embeddings: L2-normalize the output
+
+        Returns:
+            1D array for a single sentence, otherwise a 2D array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            features = self.tokenize(texts[start : start + batch_size])
+            feeds = {name: features[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            outputs.append(self._pool(hidden, features["attention_mask"]))
+
+        embeddings = (
+            np.concatenate(outputs).astype(np.float32)
+            if outputs
+            else np.zeros((0, self.dimension), dtype=np.float32)
+        )
+        if self.normalize or normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = embeddings / norms
+        return embeddings[0] if single else embeddings
+
+
+def _pooling_config(model: Any) -> Dict[str, Any]:
+    pooling_mode = "mean"
+    normalize = False
+    for module in model:
+        if getattr(module, "pooling_mode_cls_token", False):
+            pooling_mode = "cls"
+        elif getattr(module, "pooling_mode_max_tokens", False):
+            pooling_mode = "max"
+        if type(module).__name__ == "Normalize":
+            normalize = True
+    return {"pooling_mode": pooling_mode, "normalize": normalize}
+
+
+def _export_onnx(model: Any, path: str):
+    import torch
+
+    transformer = model[0]
+    sample = transformer.tokenizer(
+        ["export sample"], padding=True, truncation=True, return_tensors="pt"
+    )
+    input_names = [
+        name
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in sample
+    ]
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            features = dict(zip(input_names, inputs))
+            return self.auto_model(**features).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    torch.onnx.export(
+        _HiddenStates(transformer.auto_model.cpu()).eval(),
+        tuple(sample[name] for name in input_names),
+        tmp_path,
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes=dynamic_axes,
+        opset_version=14,
+    )
+    os.replace(tmp_path, path)
+
+
+def load_onnx_encoder(model_name: str) -> OnnxEncoder:
+    """
+    Load a model as an ONNX Runtime encoder, exporting it on first use
+
+    The exported graph is cached in ONNX_CACHE_DIR and the session uses
+    INFERENCE_THREADS intra-op threads when set.
+
+    Args:
+        model_name: Name or path of the sentence-transformers model
+
+    Returns:
+        OnnxEncoder for the model
+    """
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError("The onnx backend requires the onnxruntime package")
+
+    model = load_sentence_transformer(model_name, "cpu")
+    cache_dir = os.getenv("ONNX_CACHE_DIR", "onnx_cache")
+    path = os.path.join(
+        cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name) + ".onnx"
+    )
+    if not os.path.exists(path):
+        logger.info(f"Exporting {model_name} to ONNX at {path}")
+        _export_onnx(model, path)
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    threads = inference_threads()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    session = onnxruntime.InferenceSession(
+        path, options, providers=["CPUExecutionProvider"]
+    )
+
+    return OnnxEncoder(
+        session,
+        model.tokenizer,
+        model.max_seq_length,
+        dimension=model.get_sentence_embedding_dimension(),
+        nbytes=os.path.getsize(path),
+        **_pooling_config(model),
+    )
+
+
+def load_encoder(
+    model_name: str, backend: Optional[str] = None, device: Optional[str] = None
+) -> Any:
+    """
+    Load a model with the selected inference backend
+
+    Args:
+        model_name: Name or path of the model
+        backend: "torch" (fp32), "torch-int8" (dynamic int8 quantization of
+            the linear layers) or "onnx" (ONNX Runtime); defaults to the
+            INFERENCE_BACKEND variable
+        device: Device for the torch backend
+
+    Returns:
+        Encoder exposing the SentenceTransformer encode interface
+    """
+    backend = (backend or selected_backend()).lower()
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}"
+        )
+    device = device or os.getenv("DEVICE", "cpu")
+
+    if backend == "onnx":
+        return instrument_encoder(load_onnx_encoder(model_name))
+
+    import torch
+
+    threads = inference_threads()
+    if threads:
+        torch.set_num_threads(threads)
+
+    model = load_sentence_transformer(model_name, device)
+    if backend == "torch-int8":
+        if device != "cpu":
+            raise ValueError("The torch-int8 backend only runs on cpu")
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return instrument_encoder(model)
+
+
+def check_backend_accuracy(
+    model_name: str,
+    backends: Optional[List[str]] = None,
+    texts: Optional[List[str]] = None,
+    device: Optional[str] = None,
+    get_encoder: Optional[Callable[[str], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Compare inference backends against the fp32 torch reference
+
+    For each backend, reports the mean and minimum cosine similarity between
+    its embeddings and the reference embeddings of the same texts, how often
+    the nearest neighbour of each text agrees with the reference, and the
+    encoding throughput.
+
+    Args:
+        model_name: Name or path of the model
+        backends: Backends to check (default: all)
+        texts: Reference texts (default: REFERENCE_TEXTS)
+        device: Device for the torch backends
+        get_encoder: Returns the encoder of the model for a backend, e.g.
+            from the model registry (default: load a fresh encoder)
+
+    Returns:
+        Dictionary with the model name, text count and per-backend results
+    """
+    texts = texts or REFERENCE_TEXTS
+    backends = backends or list(BACKENDS)
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown inference backends: {', '.join(unknown)}")
+
+    def normalized(embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def neighbours(embeddings: np.ndarray) -> np.ndarray:
+        similarities = embeddings @ embeddings.T
+        np.fill_diagonal(similarities, -np.inf)
+        return similarities.argmax(axis=1)
+
+    if get_encoder is None:
+
+        def get_encoder(backend: str) -> Any:
+            return load_encoder(model_name, backend, device)
+
+    reference = normalized(get_encoder("torch").encode(texts, convert_to_numpy=True))
+    reference_neighbours = neighbours(reference)
+
+    results = {}
+    for backend in backends:
+        try:
+            encoder = get_encoder(backend)
+            start = time.perf_counter()
+            embeddings = normalized(encoder.encode(texts, convert_to_numpy=True))
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            logger.error(f"Error checking backend {backend}: {e}")
+            results[backend] = {"error": str(e)}
+            continue
+
+        cosine = (embeddings * reference).sum(axis=1)
+        results[backend] = {
+            "mean_cosine": float(cosine.mean()),
+            "min_cosine": float(cosine.min()),
+            "neighbour_agreement": float(
+                (neighbours(embeddings) == reference_neighbours).mean()
+            ),
+            "texts_per_second": len(texts) / elapsed if elapsed > 0 else None,
+        }
+
+    return {"model": model_name, "texts": len(texts), "backends": results}
@@ -0,0 +1,252 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from src.services.metrics import metrics, stage_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceOverloadedError(RuntimeError):
+    """
+    Raised when the inference queue is full and a new job is rejected
+    """
+
+
+def _timed_call(submitted: float, call: Callable[[], Any]) -> Any:
+    # Runs on the worker thread, so the delay since submission is queue wait
+    stage_seconds.observe(time.perf_counter() - submitted, stage="queue_wait")
+    return call()
+
+
+class InferenceExecutor:
+    """
+    Bounded pool for running blocking model inference off the event loop.
+
+    Jobs are admitted while fewer than ``max_workers + max_queue_depth`` are
+    in flight; anything beyond that is rejected immediately with
+    InferenceOverloadedError so callers can shed load instead of queueing
+    without limit.
+
+    Background work goes through run_bulk(), a lower priority lane: a bulk
+    call only starts while no interactive job is in flight and at most
+    ``max_bulk_workers`` run at once, so request traffic waits for at most
+    the bulk calls already running. Under steady request traffic the pool
+    is never idle, so a bulk call that has waited ``max_bulk_wait`` seconds
+    for its turn starts anyway; bulk work keeps a share of the pool instead
+    of starving.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+        kind: Optional[str] = None,
+        max_bulk_workers: Optional[int] = None,
+        max_bulk_wait: Optional[float] = None,
+    ):
+        """
+        Initialize the executor settings. The pool itself is created lazily.
+
+        Args:
+            max_workers: Number of concurrent inference workers
+            max_queue_depth: Number of jobs allowed to wait for a free worker
+            kind: Pool type, either "thread" or "process"
+            max_bulk_workers: Number of bulk calls allowed to run at once
+            max_bulk_wait: Seconds a bulk call waits for interactive jobs
+                to drain before it starts alongside them
+        """
+        self.max_workers = max_workers or int(os.getenv("INFERENCE_WORKERS", "2"))
+        self.max_queue_depth = (
+            max_queue_depth
+            if max_queue_depth is not None
+            else int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+        )
+        self.kind = (kind or os.getenv("INFERENCE_EXECUTOR", "thread")).lower()
+        if self.kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor type '{self.kind}'")
+        self.max_bulk_workers = max(
+            1,
+            min(
+                self.max_workers,
+                max_bulk_workers or int(os.getenv("INFERENCE_BULK_WORKERS", "1")),
+            ),
+        )
+        self.max_bulk_wait = (
+            max_bulk_wait
+            if max_bulk_wait is not None
+            else float(os.getenv("INFERENCE_BULK_MAX_WAIT", "2"))
+        )
+
+        self._pool: Optional[Executor] = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._bulk_in_flight = 0
+        self._bulk_waiting = 0
+        self._bulk_completed = 0
+        self._bulk_aged = 0
+        # Created on first use so they belong to the serving event loop
+        self._interactive_idle: Optional[asyncio.Event] = None
+        self._bulk_slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def capacity(self) -> int:
+        """
+        Maximum number of jobs that may be running or waiting at once
+        """
+        return self.max_workers + self.max_queue_depth
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            logger.info(
+                f"Starting {self.kind} inference pool with {self.max_workers} workers "
+                f"and queue depth {self.max_queue_depth}"
+            )
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="inference"
+                )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable on the inference pool and await its result
+
+        In process mode the callable and its arguments must be picklable, so
+        pass module-level functions rather than bound methods of loaded models.
+
+        Args:
+            fn: Blocking callable to run
+            *args: Positional arguments for the callable
+            **kwargs: Keyword arguments for the callable
+
+        Returns:
+            The callable's return value
+
+        Raises:
+            InferenceOverloadedError: If the queue is already full
+        """
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            logger.warning(
+                f"Rejecting inference job: {self._in_flight} jobs in flight "
+                f"(capacity {self.capacity})"
+            )
+            raise InferenceOverloadedError("Inference queue is full, retry later")
+
+        self._in_flight += 1
+        if self._interactive_idle is not None:
+            self._interactive_idle.clear()
+        try:
+            return await self._submit(fn, *args, **kwargs)
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            if self._in_flight == 0 and self._interactive_idle is not None:
+                self._interactive_idle.set()
+
+    async def run_bulk(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable on the inference pool at bulk priority
+
+        Waits, rather than being rejected, for a free bulk slot and then
+        until no interactive job is in flight, or at most max_bulk_wait
+        seconds. Callers should split large work into calls that finish
+        quickly, since a running call is not interrupted.
+
+        Args:
+            fn: Blocking callable to run
+            *args: Positional arguments for the callable
+            **kwargs: Keyword arguments for the callable
+
+        Returns:
+            The callable's return value
+        """
+        if self._bulk_slots is None:
+            self._bulk_slots = asyncio.Semaphore(self.max_bulk_workers)
+            self._interactive_idle = asyncio.Event()
+            if self._in_flight == 0:
+                self._interactive_idle.set()
+
+        self._bulk_waiting += 1
+        acquired = False
+        try:
+            await self._bulk_slots.acquire()
+            acquired = True
+            deadline = time.monotonic() + self.max_bulk_wait
+            while self._in_flight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Waited long enough: run next to the interactive jobs
+                    self._bulk_aged += 1
+                    break
+                try:
+                    await asyncio.wait_for(self._interactive_idle.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if acquired:
+                self._bulk_slots.release()
+            raise
+        finally:
+            self._bulk_waiting -= 1
+
+        self._bulk_in_flight += 1
+        try:
+            return await self._submit(fn, *args, **kwargs)
+        finally:
+            self._bulk_in_flight -= 1
+            self._bulk_completed += 1
+            self._bulk_slots.release()
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        if self.kind == "thread":
+            call = functools.partial(_timed_call, time.perf_counter(), call)
+        return await loop.run_in_executor(self._get_pool(), call)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get current queue statistics
+
+        Returns:
+            Dictionary with pool configuration and counters
+        """
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "max_bulk_workers": self.max_bulk_workers,
+            "bulk_in_flight": self._bulk_in_flight,
+            "bulk_waiting": self._bulk_waiting,
+            "bulk_completed": self._bulk_completed,
+            "bulk_aged": self._bulk_aged,
+        }
+
+    def shutdown(self):
+        """
+        Shut down the worker pool, waiting for running jobs to finish
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+# Singleton instance
+inference_executor = InferenceExecutor()
+metrics.gauge(
+    "inference_in_flight",
+    "Inference jobs running or queued",
+    lambda: inference_executor.stats()["in_flight"],
+)
@@ -0,0 +1,564 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.services.embedding_service import embedding_service, encode_texts
+from src.services.inference_executor import inference_executor
+from src.services.metrics import metrics
+from src.services.vector_index import (
+    COLLECTION_NAME_PATTERN,
+    VectorCollection,
+    vector_index,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("embeddings", "reindex")
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+jobs_finished = metrics.counter("jobs_finished", "Background jobs by final status")
+job_chunks = metrics.counter("job_chunks", "Background job chunks encoded")
+
+
+class JobQueueFullError(RuntimeError):
+    """
+    Raised when too many jobs are waiting and a new one is rejected
+    """
+
+
+def read_corpus(path: str) -> Tuple[List[str], List[str]]:
+    """
+    Read a corpus file
+
+    Files ending in .jsonl hold one {"text": ..., "id": ...} record per line
+    (the id is optional); any other file holds one text per line. Texts
+    without an id are identified by their line number.
+
+    Args:
+        path: Corpus file path
+
+    Returns:
+        Tuple of (ids, texts)
+
+    Raises:
+        ValueError: If a JSON line has no text
+    """
+    ids: List[str] = []
+    texts: List[str] = []
+    jsonl = path.endswith(".jsonl")
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if jsonl:
+                record = json.loads(line)
+                if not isinstance(record.get("text"), str):
+                    raise ValueError(f"Line {line_number} has no 'text' string")
+                ids.append(str(record.get("id", line_number)))
+                texts.append(record["text"])
+            else:
+                ids.append(str(line_number))
+                texts.append(line)
+    return ids, texts
+
+
+class Job:
+    """
+    A background embedding or reindex job, processed in fixed-size chunks
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        kind: str,
+        ids: List[str],
+        texts: List[str],
+        chunk_size: int,
+        model: str,
+        collection: Optional[str] = None,
+    ):
+        self.id = job_id
+        self.kind = kind
+        self.ids = ids
+        self.texts = texts
+        self.chunk_size = chunk_size
+        self.model = model
+        self.collection = collection
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.completed_chunks = 0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Chunk results, kept here when there is no job store
+        self.results: Dict[int, np.ndarray] = {}
+        # Rebuilt collection of a reindex job, swapped in when it completes
+        self.staging: Optional[VectorCollection] = None
+        self._updated = asyncio.Event()
+
+    @property
+    def chunks(self) -> int:
+        return -(-len(self.texts) // self.chunk_size)
+
+    def chunk_bounds(self, chunk: int) -> Tuple[int, int]:
+        start = chunk * self.chunk_size
+        return start, min(start + self.chunk_size, len(self.texts))
+
+    def touch(self):
+        """
+        Wake up everyone waiting for progress on this job
+        """
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def wait_for_update(self, timeout: float):
+        """
+        Wait until the job makes progress or the timeout expires
+        """
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "model": self.model,
+            "collection": self.collection,
+            "chunk_size": self.chunk_size,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Get the job status and progress
+
+        Returns:
+            Job metadata with the number of texts and completed chunks
+        """
+        return {
+            **self.metadata(),
+            "texts": len(self.texts),
+            "chunks": self.chunks,
+            "completed_chunks": self.completed_chunks,
+            "progress": self.completed_chunks / self.chunks if self.chunks else 1.0,
+        }
+
+
+class JobQueue:
+    """
+    Bounded queue of background embedding and reindex jobs.
+
+    A fixed number of workers take jobs in submission order and encode them
+    one chunk at a time on the inference executor's bulk lane, so request
+    traffic always runs first and waits for at most one chunk. With a job
+    store, each finished chunk is written to disk as a checkpoint and jobs
+    interrupted by a restart resume from their last finished chunk.
+
+    A reindex job rebuilds a vector collection from its texts in a staging
+    collection and swaps it in once every chunk is encoded, so searches keep
+    using the old vectors until the new ones are complete.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        max_finished: Optional[int] = None,
+    ):
+        """
+        Initialize the queue. Workers are started by start().
+
+        Args:
+            path: Job store directory for inputs, checkpoints and results
+                (None keeps jobs in memory only)
+            workers: Number of jobs processed at once
+            max_queued: Number of jobs allowed to wait for a worker
+            chunk_size: Default number of texts encoded per chunk
+            max_finished: Finished jobs kept before the oldest are removed
+        """
+        self.path = path if path is not None else os.getenv("JOB_STORE_PATH")
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "1"))
+        self.max_queued = max_queued or int(os.getenv("JOB_MAX_QUEUED", "100"))
+        self.chunk_size = chunk_size or int(os.getenv("JOB_CHUNK_SIZE", "256"))
+        self.max_finished = max_finished or int(os.getenv("JOB_MAX_FINISHED", "100"))
+        self.corpus_dir = os.getenv("JOB_CORPUS_DIR")
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional["asyncio.Queue[str]"] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.path, job_id)
+
+    def _chunk_path(self, job_id: str, chunk: int) -> str:
+        return os.path.join(self._job_dir(job_id), f"chunk-{chunk:06d}.npy")
+
+    def resolve_corpus(self, corpus_path: str) -> str:
+        """
+        Resolve a corpus file name inside the corpus directory
+
+        Raises:
+            ValueError: If corpus files are disabled or the path escapes the
+                corpus directory
+            KeyError: If the file does not exist
+        """
+        if not self.corpus_dir:
+            raise ValueError("JOB_CORPUS_DIR is not set")
+        root = os.path.realpath(self.corpus_dir)
+        path = os.path.realpath(os.path.join(root, corpus_path))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Corpus path '{corpus_path}' is outside JOB_CORPUS_DIR")
+        if not os.path.isfile(path):
+            raise KeyError(f"Corpus file '{corpus_path}' not found")
+        return path
+
+    def submit(
+        self,
+        kind: str,
+        texts: List[str],
+        ids: Optional[List[str]] = None,
+        collection: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Job:
+        """
+        Queue a new job
+
+        Args:
+            kind: "embeddings" to compute and keep vectors, or "reindex" to
+                rebuild a vector collection
+            texts: Texts to encode
+            ids: One id per text (defaults to the text positions)
+            collection: Collection rebuilt by a reindex job
+            chunk_size: Texts encoded per chunk
+
+        Returns:
+            The queued job
+
+        Raises:
+            ValueError: If the job is invalid
+            JobQueueFullError: If too many jobs are waiting
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}', expected one of {JOB_KINDS}")
+        if not texts:
+            raise ValueError("A job needs at least one text")
+        if ids is None:
+            ids = [str(i) for i in range(len(texts))]
+        if len(ids) != len(texts):
+            raise ValueError("Expected one id per text")
+        if kind == "reindex":
+            if not collection:
+                raise ValueError("A reindex job needs a 'collection'")
+            if not COLLECTION_NAME_PATTERN.match(collection):
+                raise ValueError(f"Invalid collection name '{collection}'")
+        chunk_size = chunk_size or self.chunk_size
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFullError("Job queue is full, retry later")
+
+        job = Job(
+            uuid.uuid4().hex,
+            kind,
+            list(ids),
+            list(texts),
+            chunk_size,
+            embedding_service.model_name,
+            collection,
+        )
+        if self.path:
+            job_dir = self._job_dir(job.id)
+            os.makedirs(job_dir, exist_ok=True)
+            self._write_json(
+                os.path.join(job_dir, "input.json"),
+                {"ids": job.ids, "texts": job.texts},
+            )
+            self._checkpoint(job)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        logger.info(
+            f"Queued {kind} job {job.id} with {len(texts)} texts "
+            f"in {job.chunks} chunks"
+        )
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """
+        Look up a job
+
+        Raises:
+            KeyError: If the job does not exist
+        """
+        if job_id not in self.jobs:
+            raise KeyError(f"Job '{job_id}' not found")
+        return self.jobs[job_id]
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a job; a running job stops after its current chunk
+
+        Raises:
+            KeyError: If the job does not exist
+        """
+        job = self.get(job_id)
+        if job.status not in TERMINAL_STATES:
+            self._finish(job, "cancelled")
+        return job
+
+    def results(self, job_id: str, chunk: int) -> Tuple[Job, np.ndarray]:
+        """
+        Get the embeddings of one finished chunk
+
+        Args:
+            job_id: Job id
+            chunk: Chunk number
+
+        Returns:
+            Tuple of (job, 2D array of the chunk's embeddings)
+
+        Raises:
+            KeyError: If the job does not exist
+            ValueError: If the job is not an embeddings job or the chunk is
+                not finished yet
+        """
+        job = self.get(job_id)
+        if job.kind != "embeddings":
+            raise ValueError("Only embeddings jobs keep their results")
+        if not 0 <= chunk < job.chunks:
+            raise ValueError(f"Chunk must be between 0 and {job.chunks - 1}")
+        if chunk >= job.completed_chunks:
+            raise ValueError(f"Chunk {chunk} is not finished yet")
+        if self.path:
+            return job, np.load(self._chunk_path(job.id, chunk))
+        return job, job.results[chunk]
+
+    async def _run_job(self, job: Job):
+        job.status = "running"
+        job.started = job.started or time.time()
+        self._checkpoint(job)
+        job.touch()
+
+        if job.kind == "reindex":
+            job.staging = VectorCollection(
+                job.collection, quantizer=embedding_service.quantizer()
+            )
+            # Restore chunks encoded before a restart without re-encoding them
+            for chunk in range(job.completed_chunks):
+                start, end = job.chunk_bounds(chunk)
+                job.staging.upsert(
+                    job.ids[start:end],
+                    np.load(self._chunk_path(job.id, chunk)),
+                    job.texts[start:end],
+                )
+
+        for chunk in range(job.completed_chunks, job.chunks):
+            if job.status != "running":
+                return
+            start, end = job.chunk_bounds(chunk)
+            vectors = await inference_executor.run_bulk(
+                encode_texts, job.texts[start:end], job.model
+            )
+            if job.status != "running":
+                return
+            if self.path:
+                await asyncio.to_thread(self._save_chunk, job.id, chunk, vectors)
+            elif job.kind == "embeddings":
+                job.results[chunk] = vectors
+            if job.staging is not None:
+                await asyncio.to_thread(
+                    job.staging.upsert,
+                    job.ids[start:end],
+                    vectors,
+                    job.texts[start:end],
+                )
+            job.completed_chunks = chunk + 1
+            job_chunks.inc(kind=job.kind)
+            self._checkpoint(job)
+            job.touch()
+
+        # A cancel that landed while the last chunk was being saved must not
+        # be overwritten, nor its staging collection swapped in
+        if job.status != "running":
+            return
+        if job.staging is not None:
+            vector_index.replace(job.collection, job.staging)
+            job.staging = None
+        self._finish(job, "completed")
+        logger.info(f"Job {job.id} completed {job.chunks} chunks")
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        job.staging = None
+        jobs_finished.inc(status=status)
+        self._checkpoint(job)
+        job.touch()
+        self._prune()
+
+    def _prune(self):
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in TERMINAL_STATES),
+            key=lambda job: job.finished,
+        )
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
+            if self.path:
+                shutil.rmtree(self._job_dir(job.id), ignore_errors=True)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue
+            try:
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                # Shutting down: leave the job resumable from its checkpoint
+                if job.status == "running":
+                    job.status = "queued"
+                    self._checkpoint(job)
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                self._finish(job, "failed", str(e))
+
+    def _save_chunk(self, job_id: str, chunk: int, vectors: np.ndarray):
+        path = self._chunk_path(job_id, chunk)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(vectors, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _checkpoint(self, job: Job):
+        if self.path and os.path.isdir(self._job_dir(job.id)):
+            self._write_json(
+                os.path.join(self._job_dir(job.id), "job.json"), job.metadata()
+            )
+
+    def _load(self):
+        if not self.path or not os.path.isdir(self.path):
+            return
+        saved = []
+        for job_id in os.listdir(self.path):
+            job_dir = self._job_dir(job_id)
+            try:
+                with open(os.path.join(job_dir, "job.json")) as f:
+                    metadata = json.load(f)
+                with open(os.path.join(job_dir, "input.json")) as f:
+                    inputs = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading job {job_id}: {e}")
+                continue
+            saved.append((job_id, metadata, inputs))
+
+        # Job ids are random, so resume in submission order
+        saved.sort(key=lambda item: item[1]["created"])
+        for job_id, metadata, inputs in saved:
+            job = Job(
+                job_id,
+                metadata["kind"],
+                inputs["ids"],
+                inputs["texts"],
+                metadata["chunk_size"],
+                metadata["model"],
+                metadata["collection"],
+            )
+            for key in ("status", "error", "created", "started", "finished"):
+                setattr(job, key, metadata[key])
+            # Chunk files are the checkpoint: resume after the last one written
+            while job.completed_chunks < job.chunks and os.path.exists(
+                self._chunk_path(job_id, job.completed_chunks)
+            ):
+                job.completed_chunks += 1
+            self.jobs[job_id] = job
+
+            if job.status not in TERMINAL_STATES:
+                if job.model != embedding_service.model_name:
+                    self._finish(
+                        job,
+                        "failed",
+                        f"Interrupted job used model {job.model}, "
+                        f"now serving {embedding_service.model_name}",
+                    )
+                    continue
+                job.status = "queued"
+                self._queue.put_nowait(job_id)
+                logger.info(
+                    f"Resuming job {job_id} at chunk {job.completed_chunks} "
+                    f"of {job.chunks}"
+                )
+
+    def start(self, resume: bool = True):
+        """
+        Restore stored jobs and start the workers
+
+        Args:
+            resume: Resume the jobs in the job store; only one process
+                sharing the store may do so
+        """
+        self._queue = asyncio.Queue()
+        if resume:
+            self._load()
+        self._tasks = [
+            asyncio.ensure_future(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """
+        Stop the workers; running jobs resume from their checkpoint on restart
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue statistics
+
+        Returns:
+            Dictionary with the queue configuration and job counts by status
+        """
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "chunk_size": self.chunk_size,
+            "persistent": bool(self.path),
+            "jobs": statuses,
+        }
+
+
+# Singleton instance
+job_queue = JobQueue()
+metrics.gauge(
+    "jobs",
+    "Background jobs by status",
+    lambda: job_queue.stats()["jobs"],
+    label="status",
+)
@@ -0,0 +1,196 @@
+import os
+import bisect
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.services.chunking_service import WORD_PATTERN
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+bucket_batches = metrics.counter(
+    "bucket_batches", "Forward passes run per token-length bucket"
+)
+
+
+class LengthBucketer:
+    """
+    Encodes texts in batches of similar token length.
+
+    Texts are counted with the model's tokenizer and grouped into buckets by
+    token length. Within a bucket texts are sorted by length and encoded in
+    batches whose size is derived from a token budget, so short texts run in
+    large batches and long ones in small batches, and each batch is only
+    padded to its own longest text. Embeddings are returned in input order.
+    """
+
+    def __init__(
+        self,
+        boundaries: Optional[List[int]] = None,
+        token_budget: Optional[int] = None,
+    ):
+        """
+        Initialize the bucketer
+
+        Args:
+            boundaries: Upper token length of each bucket; longer texts go to
+                a final bucket capped by the model's maximum sequence length
+            token_budget: Padded tokens per forward pass, which sets the
+                batch size of each bucket
+        """
+        if boundaries is None:
+            boundaries = [
+                int(value)
+                for value in os.getenv(
+                    "EMBEDDING_BUCKET_BOUNDARIES", "16,32,64,128,256"
+                ).split(",")
+                if value.strip()
+            ]
+        self.boundaries = sorted(boundaries)
+        self.token_budget = token_budget or int(
+            os.getenv("EMBEDDING_BUCKET_TOKEN_BUDGET", "4096")
+        )
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def bucket_label(self, index: int) -> str:
+        if index < len(self.boundaries):
+            return f"<={self.boundaries[index]}"
+        return f">{self.boundaries[-1]}" if self.boundaries else "all"
+
+    def count_tokens(self, model: Any, texts: List[str]) -> List[int]:
+        """
+        Count tokens per text as the model will see them
+
+        Args:
+            model: Loaded encoder
+            texts: Texts to count
+
+        Returns:
+            Token count per text, including special tokens and truncation
+        """
+        tokenizer = getattr(model, "tokenizer", None)
+        max_length = getattr(model, "max_seq_length", None)
+        if tokenizer is not None:
+            try:
+                encoded = tokenizer(
+                    texts,
+                    add_special_tokens=True,
+                    truncation=max_length is not None,
+                    max_length=max_length,
+                )
+                return [len(ids) for ids in encoded["input_ids"]]
+            except (TypeError, KeyError, NotImplementedError):
+                pass
+        lengths = [len(WORD_PATTERN.findall(text)) + 2 for text in texts]
+        return (
+            [min(length, max_length) for length in lengths] if max_length else lengths
+        )
+
+    def encode(self, model: Any, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts bucket by bucket
+
+        Args:
+            model: Loaded encoder with a SentenceTransformer encode method
+            texts: Texts to encode
+
+        Returns:
+            Array of shape (len(texts), dimension) in input order
+        """
+        if not texts:
+            dimension = model.get_sentence_embedding_dimension() or 0
+            return np.zeros((0, dimension), dtype=np.float32)
+
+        lengths = self.count_tokens(model, texts)
+        buckets: Dict[int, List[int]] = {}
+        for index, length in enumerate(lengths):
+            bucket = bisect.bisect_left(self.boundaries, length)
+            buckets.setdefault(bucket, []).append(index)
+
+        output: Optional[np.ndarray] = None
+        for bucket, indices in sorted(buckets.items()):
+            indices.sort(key=lambda i: lengths[i])
+            label = self.bucket_label(bucket)
+            upper = (
+                self.boundaries[bucket]
+                if bucket < len(self.boundaries)
+                else max(lengths[i] for i in indices)
+            )
+            batch_size = max(1, self.token_budget // max(1, upper))
+
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start : start + batch_size]
+                embeddings = np.asarray(
+                    model.encode(
+                        [texts[i] for i in batch],
+                        batch_size=len(batch),
+                        convert_to_numpy=True,
+                    ),
+                    dtype=np.float32,
+                )
+                if output is None:
+                    output = np.empty(
+                        (len(texts), embeddings.shape[1]), dtype=np.float32
+                    )
+                output[batch] = embeddings
+
+                batch_lengths = [lengths[i] for i in batch]
+                self._record(
+                    label,
+                    len(batch),
+                    sum(batch_lengths),
+                    len(batch) * max(batch_lengths),
+                )
+                bucket_batches.inc(bucket=label)
+
+        return output
+
+    def _record(self, label: str, texts: int, tokens: int, padded_tokens: int):
+        with self._lock:
+            stats = self._stats.setdefault(
+                label, {"batches": 0, "texts": 0, "tokens": 0, "padded_tokens": 0}
+            )
+            stats["batches"] += 1
+            stats["texts"] += texts
+            stats["tokens"] += tokens
+            stats["padded_tokens"] += padded_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-bucket statistics
+
+        Returns:
+            Dictionary with the bucket configuration and, per bucket, the
+            batches, texts, tokens and share of padding tokens
+        """
+        with self._lock:
+            buckets = {
+                label: {
+                    **stats,
+                    "padding_ratio": (
+                        1 - stats["tokens"] / stats["padded_tokens"]
+                        if stats["padded_tokens"]
+                        else 0.0
+                    ),
+                }
+                for label, stats in self._stats.items()
+            }
+        tokens = sum(bucket["tokens"] for bucket in buckets.values())
+        padded = sum(bucket["padded_tokens"] for bucket in buckets.values())
+        return {
+            "boundaries": self.boundaries,
+            "token_budget": self.token_budget,
+            "padding_ratio": 1 - tokens / padded if padded else 0.0,
+            "buckets": buckets,
+        }
+
+
+# Singleton instance
+length_bucketer = LengthBucketer()
+metrics.gauge(
+    "bucket_padding_ratio",
+    "Share of padding tokens in bucketed forward passes since start",
+    lambda: length_bucketer.stats()["padding_ratio"],
+)
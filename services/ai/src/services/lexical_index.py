@@ -0,0 +1,222 @@
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Identifiers such as "react-query", "@types/node", "E11000" or "sklearn.metrics"
+# are kept whole; their alphanumeric parts are indexed as well
+TOKEN_PATTERN = re.compile(r"[a-z0-9_@#+]+(?:[.\-/:][a-z0-9_@#+]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lexical search terms
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Lowercased terms; compound identifiers yield the whole identifier
+        followed by its parts
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+
+    Documents are added, replaced and removed individually. Each document
+    keeps a stable row, so postings never need renumbering, and each term's
+    postings are cached as numpy arrays until the term changes, so a query
+    costs one vectorized update per query term.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._terms: Dict[str, Dict[str, int]] = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._total_length = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _remove(self, doc_id: str):
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        for term in self._terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[row]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._total_length -= int(self._lengths[row])
+        self._lengths[row] = 0
+        self._ids[row] = None
+        self._free.append(row)
+
+    def add(self, ids: List[str], texts: List[str]):
+        """
+        Index documents, replacing any with the same ids
+
+        Args:
+            ids: Document ids
+            texts: Document texts
+        """
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self.add_terms(doc_id, Counter(tokenize(text)))
+
+    def add_terms(self, doc_id: str, terms: Dict[str, int]):
+        """
+        Index one document from its term frequencies
+        """
+        with self._lock:
+            self._remove(doc_id)
+            if self._free:
+                row = self._free.pop()
+                self._ids[row] = doc_id
+            else:
+                row = len(self._ids)
+                self._ids.append(doc_id)
+                if row >= self._lengths.shape[0]:
+                    lengths = np.zeros(max(64, row * 2), dtype=np.float32)
+                    lengths[: self._lengths.shape[0]] = self._lengths
+                    self._lengths = lengths
+
+            self._rows[doc_id] = row
+            self._terms[doc_id] = dict(terms)
+            length = sum(terms.values())
+            self._lengths[row] = length
+            self._total_length += length
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[row] = frequency
+                self._arrays.pop(term, None)
+
+    def remove(self, ids: List[str]) -> int:
+        """
+        Remove documents from the index
+
+        Args:
+            ids: Document ids (unknown ids are ignored)
+
+        Returns:
+            Number of documents removed
+        """
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._rows:
+                    self._remove(doc_id)
+                    removed += 1
+        return removed
+
+    def _term_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings)),
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Find the documents with the highest BM25 score for a query
+
+        Args:
+            query: Query text
+            top_k: Maximum number of results
+
+        Returns:
+            List of (id, score) tuples, best first; documents sharing no
+            term with the query are not returned
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._rows)
+            if count == 0 or top_k <= 0:
+                return []
+            average_length = self._total_length / count or 1.0
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            lengths = self._lengths[: len(self._ids)]
+
+            for term in terms:
+                if term not in self._postings:
+                    continue
+                rows, frequencies = self._term_arrays(term)
+                idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+                scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+            matched = np.flatnonzero(scores > 0)
+            k = min(top_k, matched.shape[0])
+            if k == 0:
+                return []
+            top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._ids[row], float(scores[row])) for row in top]
+
+    def documents(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the term frequencies of every document, for snapshots
+        """
+        with self._lock:
+            return {doc_id: dict(terms) for doc_id, terms in self._terms.items()}
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Tuple[str, float]]], k: int = 60, top_k: int = 10
+) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion
+
+    Args:
+        rankings: Ranked (id, score) lists, best first
+        k: Rank smoothing constant
+        top_k: Maximum number of results
+
+    Returns:
+        List of (id, fused score) tuples, best first
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
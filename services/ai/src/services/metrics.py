@@ -0,0 +1,270 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonically increasing counter, optionally labelled
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self, constant_labels: Labels = ()) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                labels = constant_labels + labels
+                lines.append(
+                    f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets, optionally labelled
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, Dict[str, Union[List[int], float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        """
+        Record one observation
+
+        Args:
+            value: Observed value
+            **labels: Label values of the series
+        """
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                }
+            series["counts"][index] += 1
+            series["sum"] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observe the duration of a block in seconds
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self, constant_labels: Labels = ()) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                labels = constant_labels + labels
+                cumulative = 0
+                for bound, count in zip(
+                    self.buckets + (float("inf"),), series["counts"]
+                ):
+                    cumulative += count
+                    bucket_labels = labels + (("le", _format_value(bound)),)
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                    )
+                lines.append(
+                    f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}"
+                )
+                lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose values are read from a callback when metrics are rendered
+
+    The callback returns either a single value or a mapping of label
+    values (for the gauge's single label) to values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Union[float, Dict[str, float]]],
+        label: str = "",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.label = label
+
+    def render(self, constant_labels: Labels = ()) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        try:
+            values = self.read()
+        except Exception as e:
+            logger.error(f"Error reading gauge {self.name}: {e}")
+            return lines
+        if isinstance(values, dict):
+            for label_value, value in sorted(values.items()):
+                labels = constant_labels + ((self.label, label_value),)
+                lines.append(
+                    f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+                )
+        elif values is not None:
+            lines.append(
+                f"{self.name}{_format_labels(constant_labels)} {_format_value(values)}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered in the Prometheus text exposition format.
+
+    Metrics are kept per process; with several server workers each worker
+    exposes its own values. Every series carries a worker label with the
+    process id, so series scraped from different workers stay distinct and
+    can be summed across workers. Counter names get the conventional
+    _total suffix.
+    """
+
+    def __init__(self, prefix: str = "ideahub_ai_"):
+        self.prefix = prefix
+        self._metrics: Dict[str, Union[Counter, Histogram, Gauge]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(f"{self.prefix}{name}_total", documentation))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(self.prefix + name, documentation, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Union[float, Dict[str, float]]],
+        label: str = "",
+    ) -> Gauge:
+        return self._register(Gauge(self.prefix + name, documentation, read, label))
+
+    def render(self) -> str:
+        """
+        Render all metrics
+
+        Returns:
+            Metrics in the Prometheus text format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        # Read at render time, since workers fork after the metrics are created
+        constant_labels = (("worker", str(os.getpid())),)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render(constant_labels))
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+# Content type of the Prometheus text format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+stage_seconds = metrics.histogram(
+    "stage_seconds",
+    "Time spent per pipeline stage (queue_wait, batch_wait, tokenization, "
+    "forward, similarity, serialization)",
+)
+request_texts = metrics.histogram(
+    "request_texts", "Texts or documents per request", SIZE_BUCKETS
+)
+batch_texts = metrics.histogram(
+    "batch_texts", "Texts per model forward pass", SIZE_BUCKETS
+)
+text_tokens = metrics.histogram("text_tokens", "Tokens per encoded text", SIZE_BUCKETS)
+tokens = metrics.counter(
+    "tokens", "Tokens in tokenized batches, by kind (text or padding)"
+)
@@ -0,0 +1,335 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+from src.services.inference_backends import load_encoder
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+model_loads = metrics.counter("model_loads", "Models loaded into the registry")
+model_load_failures = metrics.counter(
+    "model_load_failures", "Model loads that raised an error"
+)
+model_evictions = metrics.counter(
+    "model_evictions", "Models evicted to stay within the memory budget"
+)
+
+
+class ModelNotAllowedError(ValueError):
+    """
+    Raised when a request asks for a model that is not on the allowlist
+    """
+
+
+def canonical_model_name(model_name: str) -> str:
+    """
+    Get the Hugging Face Hub id of a sentence-transformers model name
+
+    Bare names such as "all-MiniLM-L6-v2" resolve to the sentence-transformers
+    organization, as SentenceTransformer() resolves them, so both spellings
+    refer to the same model.
+
+    Args:
+        model_name: Model name, Hub id or local path
+
+    Returns:
+        Hub id, or the name unchanged for Hub ids and local paths
+    """
+    if "/" in model_name or os.path.exists(model_name):
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """
+    Estimate the memory held by a model's parameters and buffers
+
+    Args:
+        model: Loaded model (a torch module, or an encoder exposing nbytes)
+
+    Returns:
+        Size in bytes, or 0 if it cannot be determined
+    """
+    nbytes = getattr(model, "nbytes", None)
+    if nbytes:
+        return nbytes
+    total = 0
+    for attribute in ("parameters", "buffers"):
+        tensors = getattr(model, attribute, None)
+        if tensors is None:
+            continue
+        try:
+            total += sum(t.numel() * t.element_size() for t in tensors())
+        except Exception:
+            pass
+    return total
+
+
+class ModelRegistry:
+    """
+    Memory-bounded registry of loaded models.
+
+    Models are loaded on first use and kept in LRU order. When the resident
+    models exceed the memory budget, the least recently used unpinned models
+    are evicted. Each model has its own load lock, so concurrent requests for
+    a model that is still loading wait for that single load instead of
+    starting their own. Only allowlisted or pinned models can be loaded.
+    Models are keyed by their canonical name, so "all-MiniLM-L6-v2" and
+    "sentence-transformers/all-MiniLM-L6-v2" are one allowlist entry and
+    one resident model. Models held through use() are not evicted until
+    the caller is done with them.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: Optional[int] = None,
+        allowed_models: Optional[Set[str]] = None,
+        loader: Callable[[str], Any] = load_encoder,
+    ):
+        """
+        Initialize the registry
+
+        Args:
+            memory_budget_bytes: Total size of resident models before eviction
+            allowed_models: Models that may be loaded on request; "*" allows any
+            loader: Function loading a model by name (default: the
+                INFERENCE_BACKEND selected loader)
+        """
+        self.memory_budget_bytes = memory_budget_bytes or (
+            int(os.getenv("MODEL_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024
+        )
+        if allowed_models is None:
+            allowed_models = {
+                name.strip()
+                for name in os.getenv("ALLOWED_MODELS", "").split(",")
+                if name.strip()
+            }
+        self.allowed_models = {
+            name if name == "*" else canonical_model_name(name)
+            for name in allowed_models
+        }
+        self.loader = loader
+
+        self._models: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pinned: Set[str] = set()
+        self._in_use: Dict[str, int] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "loads": 0,
+            "load_failures": 0,
+            "load_waits": 0,
+            "evictions": 0,
+            "rejected": 0,
+        }
+
+    def pin(self, model_name: str):
+        """
+        Allow a model and protect it from eviction
+
+        Args:
+            model_name: Name of the model
+        """
+        with self._lock:
+            self._pinned.add(canonical_model_name(model_name))
+
+    def is_allowed(self, model_name: str) -> bool:
+        """
+        Check whether a model may be loaded
+        """
+        if "*" in self.allowed_models:
+            return True
+        key = canonical_model_name(model_name)
+        return key in self.allowed_models or key in self._pinned
+
+    def check_allowed(self, model_name: str):
+        """
+        Raise ModelNotAllowedError if a model may not be loaded
+        """
+        if not self.is_allowed(model_name):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise ModelNotAllowedError(f"Model '{model_name}' is not allowed")
+
+    def get(
+        self,
+        model_name: str,
+        loader: Optional[Callable[[str], Any]] = None,
+        allow: bool = False,
+    ) -> Any:
+        """
+        Get a loaded model, loading it if needed
+
+        Args:
+            model_name: Name of the model
+            loader: Optional loader overriding the registry default; it is
+                called with the canonical model name
+            allow: Skip the allowlist, for variants the service derives from
+                its own model
+
+        Returns:
+            The loaded model
+
+        Raises:
+            ModelNotAllowedError: If the model is not allowed
+        """
+        return self._get(model_name, loader, allow, hold=False)
+
+    @contextmanager
+    def use(
+        self,
+        model_name: str,
+        loader: Optional[Callable[[str], Any]] = None,
+        allow: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Get a loaded model and keep it resident while the block runs
+
+        Eviction skips models in use, so a model is not dropped (and
+        reloaded by the next request) while it is still encoding.
+
+        Args:
+            model_name: Name of the model
+            loader: Optional loader overriding the registry default
+            allow: Skip the allowlist
+
+        Yields:
+            The loaded model
+        """
+        key = canonical_model_name(model_name)
+        model = self._get(model_name, loader, allow, hold=True)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+
+    def _touch(self, key: str, hold: bool) -> Optional[Any]:
+        # Caller must hold the lock
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        entry["last_used"] = time.time()
+        if hold:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        return entry["model"]
+
+    def _get(
+        self,
+        model_name: str,
+        loader: Optional[Callable[[str], Any]],
+        allow: bool,
+        hold: bool,
+    ) -> Any:
+        key = canonical_model_name(model_name)
+        with self._lock:
+            model = self._touch(key, hold)
+            if model is not None:
+                return model
+        if not allow:
+            self.check_allowed(model_name)
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        if not load_lock.acquire(blocking=False):
+            # Another thread is loading this model; wait for it
+            with self._lock:
+                self._counters["load_waits"] += 1
+            load_lock.acquire()
+
+        try:
+            with self._lock:
+                model = self._touch(key, hold)
+                if model is not None:
+                    return model
+
+            logger.info(f"Loading model: {key}")
+            start = time.perf_counter()
+            try:
+                model = (loader or self.loader)(key)
+            except Exception:
+                with self._lock:
+                    self._counters["load_failures"] += 1
+                model_load_failures.inc(model=key)
+                raise
+            elapsed = time.perf_counter() - start
+            size = estimate_model_bytes(model)
+            logger.info(
+                f"Model {key} loaded in {elapsed:.2f}s "
+                f"({size / (1024 * 1024):.1f} MB)"
+            )
+
+            with self._lock:
+                self._models[key] = {
+                    "model": model,
+                    "bytes": size,
+                    "load_seconds": elapsed,
+                    "last_used": time.time(),
+                }
+                if hold:
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                self._counters["loads"] += 1
+                self._evict(keep=key)
+            model_loads.inc(model=key)
+            return model
+        finally:
+            load_lock.release()
+
+    def _evict(self, keep: str):
+        # Caller must hold the lock
+        resident = sum(entry["bytes"] for entry in self._models.values())
+        for name in list(self._models):
+            if resident <= self.memory_budget_bytes:
+                break
+            if name == keep or name in self._pinned or name in self._in_use:
+                continue
+            evicted = self._models.pop(name)
+            resident -= evicted["bytes"]
+            self._counters["evictions"] += 1
+            model_evictions.inc(model=name)
+            logger.info(f"Evicted model {name} to stay within the model memory budget")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get registry statistics
+
+        Returns:
+            Dictionary with counters, memory usage and resident models
+        """
+        with self._lock:
+            models = {
+                name: {
+                    "bytes": entry["bytes"],
+                    "load_seconds": round(entry["load_seconds"], 3),
+                    "idle_seconds": round(time.time() - entry["last_used"], 1),
+                    "pinned": name in self._pinned,
+                    "in_use": self._in_use.get(name, 0),
+                }
+                for name, entry in self._models.items()
+            }
+            return {
+                **self._counters,
+                "resident_bytes": sum(model["bytes"] for model in models.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "models": models,
+            }
+
+
+# Singleton instance
+model_registry = ModelRegistry()
+metrics.gauge(
+    "model_memory_bytes",
+    "Estimated memory of each resident model",
+    lambda: {
+        name: model["bytes"] for name, model in model_registry.stats()["models"].items()
+    },
+    label="model",
+)
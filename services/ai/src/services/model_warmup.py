@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# One short and one max-length input so both small and full-size kernels
+# and buffers are initialized before real traffic arrives
+WARMUP_TEXTS = ["warm up", " ".join(["warmup"] * 512)]
+
+
+def preload_model_names(default: str) -> List[str]:
+    """
+    Get the list of models to preload from the PRELOAD_MODELS variable
+
+    Args:
+        default: Model to preload when the variable is not set
+
+    Returns:
+        List of model names (empty when preloading is disabled)
+    """
+    value = os.getenv("PRELOAD_MODELS", default)
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def warm_up(model: Any):
+    """
+    Run a throwaway encode so lazy initialization happens before serving
+
+    Args:
+        model: Loaded SentenceTransformer model
+    """
+    model.encode(WARMUP_TEXTS, convert_to_numpy=True)
+
+
+class ModelWarmup:
+    """
+    Tracks background model preloading and answers readiness checks.
+
+    The service reports ready only after every configured model has been
+    loaded and warmed up, so a load balancer never routes traffic to a cold
+    pod. Liveness is independent of this state.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started = False
+
+    def start(self, loaders: Dict[str, Callable[[], Any]]):
+        """
+        Start loading and warming up models in the background
+
+        Args:
+            loaders: Mapping of model name to a blocking function that loads
+                and warms up that model
+        """
+        self._started = True
+        self.models = {name: {"status": "loading"} for name in loaders}
+        self._task = asyncio.ensure_future(self._run(loaders))
+
+    async def _run(self, loaders: Dict[str, Callable[[], Any]]):
+        for name, loader in loaders.items():
+            start = time.perf_counter()
+            try:
+                logger.info(f"Preloading model {name}")
+                await asyncio.to_thread(loader)
+                elapsed = time.perf_counter() - start
+                self.models[name] = {
+                    "status": "ready",
+                    "load_seconds": round(elapsed, 3),
+                }
+                logger.info(f"Model {name} loaded and warmed up in {elapsed:.2f}s")
+            except Exception as e:
+                self.models[name] = {"status": "failed", "error": str(e)}
+                logger.error(f"Error preloading model {name}: {e}")
+
+    def is_ready(self) -> bool:
+        """
+        Check whether every preloaded model is resident
+
+        Returns:
+            True once preloading has started and all models are loaded
+        """
+        if not self._started:
+            return False
+        return all(model["status"] == "ready" for model in self.models.values())
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Get readiness status
+
+        Returns:
+            Dictionary with the overall status and per-model state
+        """
+        return {
+            "status": "ready" if self.is_ready() else "not_ready",
+            "models": self.models,
+        }
+
+    async def stop(self):
+        """
+        Cancel any preloading that is still running
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+# Singleton instance
+model_warmup = ModelWarmup()
@@ -0,0 +1,89 @@
+import gc
+import os
+import sys
+import logging
+import importlib
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    Get the number of CPUs this process may run on
+
+    Returns:
+        CPU count, respecting the scheduler affinity mask where available
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_threads(workers: int, cpus: Optional[int] = None) -> int:
+    """
+    Get the intra-op thread count for each server worker
+
+    Every worker runs up to INFERENCE_WORKERS forward passes at once, so the
+    cores are split across workers * INFERENCE_WORKERS concurrent passes to
+    avoid oversubscription. INFERENCE_THREADS overrides the computed value.
+
+    Args:
+        workers: Number of server worker processes
+        cpus: Available CPUs (default: detected)
+
+    Returns:
+        Threads per forward pass, at least 1
+    """
+    configured = os.getenv("INFERENCE_THREADS")
+    if configured:
+        return int(configured)
+    concurrent = max(1, workers) * max(1, int(os.getenv("INFERENCE_WORKERS", "2")))
+    return max(1, (cpus or available_cpus()) // concurrent)
+
+
+def set_inference_threads(threads: int):
+    """
+    Apply an intra-op thread count to the current process
+
+    Sets INFERENCE_THREADS, which backends read when creating sessions, and
+    updates torch directly if it is already imported.
+
+    Args:
+        threads: Number of intra-op threads
+    """
+    os.environ["INFERENCE_THREADS"] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def preload_before_fork(app_uri: str):
+    """
+    Load model weights in the pre-fork master process
+
+    Calls preload_weights() of the application module, so the workers forked
+    afterwards share the weights copy-on-write instead of each loading its
+    own copy. No inference runs here: warm-up happens in each worker, after
+    its thread pools have been sized. Surviving objects are then frozen so
+    the garbage collector does not dirty the shared pages.
+
+    Args:
+        app_uri: Application path in "module:attribute" form
+    """
+    if os.getenv("INFERENCE_BACKEND", "torch").lower() == "onnx":
+        # ONNX Runtime sessions are not fork-safe; workers load their own
+        logger.info("Skipping pre-fork model loading for the onnx backend")
+        return
+
+    module = importlib.import_module(app_uri.split(":")[0])
+    preload_weights = getattr(module, "preload_weights", None)
+    if preload_weights is None:
+        logger.warning(f"{app_uri} does not define preload_weights()")
+        return
+
+    # Keep the master single-threaded so no thread pool exists at fork time
+    set_inference_threads(1)
+    preload_weights()
+    gc.freeze()
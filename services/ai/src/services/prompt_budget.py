@@ -0,0 +1,441 @@
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from src.services.chunking_service import DocumentChunker
+
+logger = logging.getLogger(__name__)
+
+# Marks where context chunks were left out of a field
+ELISION = "[...]"
+
+BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+
+class PromptBudgeter:
+    """
+    Fits the context fields of a prompt into a token budget.
+
+    Each context field is split into chunks of whole paragraphs (or lines,
+    for long paragraphs such as code). When the full prompt is over budget,
+    the chunks are ranked by similarity to the question and added greedily,
+    most relevant first, while they fit; the kept chunks are put back in
+    document order with an elision marker where chunks were dropped. Token
+    counts are cached by text, so context that is sent again (project
+    documentation, for example) is not tokenized again.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any = None,
+        chunk_tokens: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        load_tokenizer: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        Initialize the budgeter
+
+        Args:
+            tokenizer: Hugging Face tokenizer used to count tokens; when
+                omitted whitespace-separated words are counted instead
+            chunk_tokens: Target size of context chunks in tokens
+            cache_size: Number of token counts kept in the LRU cache
+            load_tokenizer: Loads the tokenizer on the first count instead;
+                if it fails, words are counted instead
+        """
+        self.chunk_tokens = chunk_tokens or int(os.getenv("PROMPT_CHUNK_TOKENS", "128"))
+        self.cache_size = (
+            cache_size
+            if cache_size is not None
+            else int(os.getenv("PROMPT_TOKEN_CACHE_SIZE", "8192"))
+        )
+        self._load_tokenizer = load_tokenizer
+        self._counter: Optional[DocumentChunker] = None
+        if load_tokenizer is None:
+            self._counter = DocumentChunker(tokenizer, self.chunk_tokens, 0)
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "truncated": 0}
+
+    def _get_counter(self) -> DocumentChunker:
+        if self._counter is None:
+            with self._lock:
+                if self._counter is None:
+                    try:
+                        tokenizer = self._load_tokenizer()
+                    except Exception as e:
+                        logger.warning(
+                            f"Prompt tokenizer unavailable, counting words instead: {e}"
+                        )
+                        tokenizer = None
+                    self._counter = DocumentChunker(tokenizer, self.chunk_tokens, 0)
+        return self._counter
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for a batch of texts, using cached counts where possible
+
+        Args:
+            texts: Texts to count
+
+        Returns:
+            Token count per text, excluding special tokens
+        """
+        counts: List[Optional[int]] = []
+        with self._lock:
+            for text in texts:
+                count = self._counts.get(text)
+                if count is not None:
+                    self._counts.move_to_end(text)
+                counts.append(count)
+        missing = list(dict.fromkeys(t for t, c in zip(texts, counts) if c is None))
+        fresh = (
+            dict(zip(missing, self._get_counter().count_tokens(missing)))
+            if missing
+            else {}
+        )
+
+        with self._lock:
+            self._counters["hits"] += len(texts) - len(missing)
+            self._counters["misses"] += len(missing)
+            if self.cache_size > 0:
+                for text, count in fresh.items():
+                    self._counts[text] = count
+                while len(self._counts) > self.cache_size:
+                    self._counts.popitem(last=False)
+        return [
+            count if count is not None else fresh[t] for t, count in zip(texts, counts)
+        ]
+
+    def split(self, text: str) -> List[str]:
+        """
+        Split context text into chunks of about chunk_tokens tokens
+
+        Consecutive paragraphs are packed together; paragraphs over the
+        chunk size are packed line by line instead. Joining the chunks with
+        blank lines restores the text, apart from the whitespace between
+        chunks.
+
+        Args:
+            text: Context text
+
+        Returns:
+            List of chunk texts in document order
+        """
+        blocks = [block for block in BLOCK_SEPARATOR.split(text) if block.strip()]
+        pieces: List[Tuple[str, str]] = []
+        for block, tokens in zip(blocks, self.count_tokens(blocks)):
+            if tokens <= self.chunk_tokens:
+                pieces.append(("\n\n", block))
+            else:
+                lines = block.split("\n")
+                pieces.append(("\n\n", lines[0]))
+                pieces.extend(("\n", line) for line in lines[1:])
+
+        chunks: List[str] = []
+        current: List[str] = []
+        size = 0
+        for (separator, piece), tokens in zip(
+            pieces, self.count_tokens([piece for _, piece in pieces])
+        ):
+            if current and size + tokens > self.chunk_tokens:
+                chunks.append("".join(current))
+                current, size = [], 0
+            current.append(separator + piece if current else piece)
+            size += tokens
+        if current:
+            chunks.append("".join(current))
+        return chunks
+
+    def fit(
+        self,
+        render: Callable[[Dict[str, str]], str],
+        fields: Dict[str, str],
+        max_tokens: Optional[int],
+        query: Optional[str] = None,
+        encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Render a prompt with its context fields cut down to a token budget
+
+        Args:
+            render: Builds the prompt from values for the context fields
+            fields: Context field name to full text
+            max_tokens: Token budget for the whole prompt (None for no limit)
+            query: Text the context chunks are ranked against; without it
+                the start of each field is kept
+            encode: Embeds a list of texts, used to rank chunks by query
+
+        Returns:
+            Dictionary with "prompt", "token_count" (None without a budget,
+            when nothing is tokenized), "truncated" and, when the context was
+            cut, the number of chunks and kept chunks per field under
+            "fields"
+
+        Raises:
+            ValueError: If max_tokens is not positive
+        """
+        (result,) = self.fit_many([(render, fields, max_tokens, query)], encode)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def fit_many(
+        self,
+        requests: List[
+            Tuple[Callable[[Dict[str, str]], str], Dict[str, str], Optional[int], Any]
+        ],
+        encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+    ) -> List[Any]:
+        """
+        Render several prompts, each cut down to its token budget
+
+        The prompts with a budget are counted in one tokenizer call, and the
+        context chunks of all prompts that are over budget are embedded in
+        one encode call. Prompts without a budget are only rendered.
+
+        Args:
+            requests: (render, fields, max_tokens, query) tuples, as the
+                arguments of fit
+            encode: Embeds a list of texts, used to rank chunks by query
+
+        Returns:
+            Result of each request as returned by fit, or the exception
+            raised while rendering it
+        """
+        results: List[Any] = [None] * len(requests)
+        prompts: Dict[int, str] = {}
+        for index, (render, fields, max_tokens, _) in enumerate(requests):
+            try:
+                if max_tokens is not None and max_tokens <= 0:
+                    raise ValueError("max_tokens must be positive")
+                prompts[index] = render({n: t for n, t in fields.items() if t})
+            except Exception as e:
+                results[index] = e
+
+        over: List[int] = []
+        budgeted = [index for index in prompts if requests[index][2] is not None]
+        counts = dict(
+            zip(budgeted, self.count_tokens([prompts[index] for index in budgeted]))
+        )
+        for index, prompt in prompts.items():
+            max_tokens = requests[index][2]
+            token_count = counts.get(index)
+            if max_tokens is None or token_count <= max_tokens:
+                results[index] = {
+                    "prompt": prompt,
+                    "token_count": token_count,
+                    "truncated": False,
+                    "fields": {},
+                }
+            else:
+                over.append(index)
+        if not over:
+            return results
+
+        plans: Dict[int, Tuple[List[Tuple[str, int, str]], int]] = {}
+        for index in over:
+            render, fields, _, _ = requests[index]
+            try:
+                plans[index] = self._plan(render, fields)
+            except Exception as e:
+                results[index] = e
+        scores = self._scores(
+            [(plans[index][0], requests[index][3]) for index in plans], encode
+        )
+        for (index, (candidates, fixed)), item_scores in zip(plans.items(), scores):
+            render, _, max_tokens, _ = requests[index]
+            try:
+                results[index] = self._cut(
+                    render, candidates, item_scores, max_tokens - fixed, max_tokens
+                )
+            except Exception as e:
+                results[index] = e
+        return results
+
+    def _plan(
+        self, render: Callable[[Dict[str, str]], str], fields: Dict[str, str]
+    ) -> Tuple[List[Tuple[str, int, str]], int]:
+        # Context chunks of every field and the tokens the prompt takes
+        # without any context
+        fields = {name: text for name, text in fields.items() if text}
+        (fixed,) = self.count_tokens([render({name: "" for name in fields})])
+        candidates: List[Tuple[str, int, str]] = []
+        for name, text in fields.items():
+            candidates.extend(
+                (name, i, chunk) for i, chunk in enumerate(self.split(text))
+            )
+        return candidates, fixed
+
+    def _cut(
+        self,
+        render: Callable[[Dict[str, str]], str],
+        candidates: List[Tuple[str, int, str]],
+        scores: np.ndarray,
+        available: int,
+        max_tokens: int,
+    ) -> Dict[str, Any]:
+        sizes = self.count_tokens([chunk for _, _, chunk in candidates])
+        (separator,) = self.count_tokens([ELISION])
+
+        # Greedily take the most relevant chunks that still fit
+        kept: List[int] = []
+        used = 0
+        for index in np.argsort(-scores, kind="stable"):
+            cost = sizes[index] + separator
+            if used + cost <= available:
+                kept.append(int(index))
+                used += cost
+
+        totals: Dict[str, int] = {}
+        for name, _, _ in candidates:
+            totals[name] = totals.get(name, 0) + 1
+
+        # The estimate ignores how chunks tokenize when joined; trim until the
+        # rendered prompt really fits
+        while True:
+            prompt = render(self._assemble(totals, candidates, kept))
+            (token_count,) = self.count_tokens([prompt])
+            if token_count <= max_tokens or not kept:
+                break
+            kept.pop()
+
+        with self._lock:
+            self._counters["truncated"] += 1
+        kept_counts = {name: 0 for name in totals}
+        for index in kept:
+            kept_counts[candidates[index][0]] += 1
+        return {
+            "prompt": prompt,
+            "token_count": token_count,
+            "truncated": True,
+            "fields": {
+                name: {"chunks": total, "kept": kept_counts[name]}
+                for name, total in totals.items()
+            },
+        }
+
+    @staticmethod
+    def _scores(
+        items: List[Tuple[List[Tuple[str, int, str]], Optional[str]]],
+        encode: Optional[Callable[[List[str]], np.ndarray]],
+    ) -> List[np.ndarray]:
+        # Score each item's chunks against its query, encoding all queries
+        # and chunks together
+        texts: List[str] = []
+        offsets: List[Optional[int]] = []
+        for candidates, query in items:
+            if candidates and query and encode is not None:
+                offsets.append(len(texts))
+                texts.append(query)
+                texts.extend(chunk for _, _, chunk in candidates)
+            else:
+                offsets.append(None)
+
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        if texts:
+            try:
+                vectors = np.asarray(encode(texts), dtype=np.float32)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                vectors = vectors / norms
+            except Exception as e:
+                logger.warning(
+                    f"Ranking prompt context by position, encode failed: {e}"
+                )
+                offsets = [None] * len(items)
+
+        scores = []
+        for (candidates, _), offset in zip(items, offsets):
+            if offset is None:
+                # No question to rank against: prefer the start of every field
+                scores.append(np.array([1.0 / (1 + i) for _, i, _ in candidates]))
+            else:
+                chunks = vectors[offset + 1 : offset + 1 + len(candidates)]
+                scores.append(chunks @ vectors[offset])
+        return scores
+
+    @staticmethod
+    def _assemble(
+        totals: Dict[str, int],
+        candidates: List[Tuple[str, int, str]],
+        kept: List[int],
+    ) -> Dict[str, str]:
+        chosen: Dict[str, List[Tuple[int, str]]] = {name: [] for name in totals}
+        for index in kept:
+            name, position, chunk = candidates[index]
+            chosen[name].append((position, chunk))
+
+        values = {}
+        for name, total in totals.items():
+            parts: List[str] = []
+            expected = 0
+            for position, chunk in sorted(chosen[name]):
+                if position != expected:
+                    parts.append(ELISION)
+                parts.append(chunk)
+                expected = position + 1
+            if expected != total:
+                parts.append(ELISION)
+            values[name] = "\n\n".join(parts)
+        return values
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cached_counts": len(self._counts), **self._counters}
+
+
+_budgeters: Dict[str, PromptBudgeter] = {}
+_budgeters_lock = threading.Lock()
+
+
+def load_prompt_tokenizer(name: str) -> Any:
+    """
+    Load a Hugging Face tokenizer by name, e.g. the tokenizer of the LLM the
+    prompts are sent to
+    """
+    from transformers import AutoTokenizer
+
+    logger.info(f"Loading prompt tokenizer {name}")
+    return AutoTokenizer.from_pretrained(name)
+
+
+def get_prompt_budgeter(
+    default_key: str, default_tokenizer: Callable[[], Any]
+) -> PromptBudgeter:
+    """
+    Get the shared budgeter for a tokenizer, creating it on first use
+
+    The tokenizer named by PROMPT_TOKENIZER is used when set; otherwise the
+    caller's default, typically the embedding model's tokenizer. Either is
+    loaded on the first token count, once per process, and kept with its
+    token count cache; if it cannot be loaded, words are counted instead.
+
+    Args:
+        default_key: Cache key of the default tokenizer
+        default_tokenizer: Loads the default tokenizer
+
+    Returns:
+        PromptBudgeter for the tokenizer
+    """
+    name = os.getenv("PROMPT_TOKENIZER")
+    key = name or default_key
+    with _budgeters_lock:
+        budgeter = _budgeters.get(key)
+        if budgeter is None:
+            load = (lambda: load_prompt_tokenizer(name)) if name else default_tokenizer
+            budgeter = _budgeters[key] = PromptBudgeter(load_tokenizer=load)
+    return budgeter
+
+
+def default_max_tokens(max_tokens: Optional[int]) -> Optional[int]:
+    """
+    Resolve a request's token budget, falling back to PROMPT_MAX_TOKENS
+    """
+    if max_tokens is not None:
+        return max_tokens
+    configured = os.getenv("PROMPT_MAX_TOKENS")
+    return int(configured) if configured else None
@@ -1,45 +1,74 @@
-import os
 import logging
-from typing import Dict, Any, List, Optional
-import json
-from pathlib import Path
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
+from src.services.embedding_service import embedding_service, get_tokenizer
+from src.services.prompt_budget import get_prompt_budgeter
+from src.services.prompt_templates import CompiledTemplate, TemplateRegistry
 
 logger = logging.getLogger(__name__)
 
+# Templates available without a template directory; files in
+# PROMPT_TEMPLATE_DIR with the same name override them
+BUILTIN_TEMPLATES = {
+    "project_summary": "# Project Summary for {project_name}\n\n"
+    "## Description\n{project_description}\n\n"
+    "## Status\nCurrent status: {project_status}\n\n"
+    "## Tags\n{project_tags}\n\n"
+    "## Documentation\n{project_documentation}\n\n"
+    "## Related Developments\n{related_developments}",
+    "development_application": "# How to Apply Development to Project\n\n"
+    "## Development\n{development_content}\n\n"
+    "## Project\n{project_name}: {project_description}\n\n"
+    "## Suggested Application\nBased on the development and project details, "
+    "here are specific ways to apply this development to the project:\n\n"
+    "1. Consider how {development_content} could enhance {project_name}\n"
+    "2. Look for integration points between the development and project\n"
+    "3. Identify potential challenges and solutions",
+    "project_improvement": "# Project Improvement Suggestions\n\n"
+    "## Project\n{project_name}: {project_description}\n\n"
+    "## Current Status\n{project_status}\n\n"
+    "## Improvement Areas\nBased on the project details, "
+    "here are potential areas for improvement:\n\n"
+    "1. Consider enhancing {project_name} by...\n"
+    "2. Look for opportunities to improve...\n"
+    "3. Address potential challenges such as...",
+}
+
+# Context variables that may be cut down to fit a token budget
+BUDGETED_FIELDS = ("project_documentation", "code_snippets", "related_developments")
+
+# Context variables the budgeted context is ranked against when the request
+# has no explicit query
+QUERY_FIELDS = ("question", "project_name", "project_description")
+
+
+def _render(
+    template: CompiledTemplate, context: Dict[str, Any], values: Dict[str, str]
+) -> str:
+    return template.render({**context, **values})
+
 
 class PromptService:
     """
     Service for generating prompts for AI models based on project data
     """
 
-    def __init__(self):
+    def __init__(self, template_dir: Optional[str] = None):
         """
         Initialize the prompt service
+
+        Args:
+            template_dir: Directory of template files to load and watch
+                (defaults to PROMPT_TEMPLATE_DIR)
+        """
+        self.registry = TemplateRegistry(BUILTIN_TEMPLATES, template_dir)
+
+    @property
+    def templates(self) -> Dict[str, str]:
         """
-        self.templates = {
-            "project_summary": "# Project Summary for {project_name}\n\n"
-            "## Description\n{project_description}\n\n"
-            "## Status\nCurrent status: {project_status}\n\n"
-            "## Tags\n{project_tags}\n\n"
-            "## Documentation\n{project_documentation}\n\n"
-            "## Related Developments\n{related_developments}",
-            "development_application": "# How to Apply Development to Project\n\n"
-            "## Development\n{development_content}\n\n"
-            "## Project\n{project_name}: {project_description}\n\n"
-            "## Suggested Application\nBased on the development and project details, "
-            "here are specific ways to apply this development to the project:\n\n"
-            "1. Consider how {development_content} could enhance {project_name}\n"
-            "2. Look for integration points between the development and project\n"
-            "3. Identify potential challenges and solutions",
-            "project_improvement": "# Project Improvement Suggestions\n\n"
-            "## Project\n{project_name}: {project_description}\n\n"
-            "## Current Status\n{project_status}\n\n"
-            "## Improvement Areas\nBased on the project details, "
-            "here are potential areas for improvement:\n\n"
-            "1. Consider enhancing {project_name} by...\n"
-            "2. Look for opportunities to improve...\n"
-            "3. Address potential challenges such as...",
-        }
+        Source text of every template, by name
+        """
+        return {name: self.registry.get(name).source for name in self.registry.names()}
 
     def generate_prompt(self, template_name: str, context: Dict[str, Any]) -> str:
         """
@@ -52,25 +81,92 @@ class PromptService:
         Returns:
             Formatted prompt string
         """
-        if template_name not in self.templates:
-            logger.error(f"Template '{template_name}' not found")
-            raise ValueError(f"Template '{template_name}' not found")
-
         try:
-            # Get the template
-            template = self.templates[template_name]
-
-            # Format the template with context
-            prompt = template.format(**context)
-
-            return prompt
-        except KeyError as e:
-            logger.error(f"Missing context variable: {e}")
-            raise ValueError(f"Missing context variable: {e}")
+            return self.registry.get(template_name).render(context)
+        except ValueError as e:
+            logger.error(str(e))
+            raise
         except Exception as e:
             logger.error(f"Error generating prompt: {e}")
             raise RuntimeError(f"Failed to generate prompt: {e}")
 
+    def build_prompt(
+        self,
+        template_name: str,
+        context: Dict[str, Any],
+        max_tokens: Optional[int] = None,
+        query: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate a prompt within a token budget
+
+        Text context variables in BUDGETED_FIELDS are split into chunks,
+        ranked against the query with the embedding model, and the most
+        relevant chunks that fit the budget are kept.
+
+        Args:
+            template_name: Name of the template to use
+            context: Dictionary of context variables to fill in the template
+            max_tokens: Token budget for the prompt (None for no limit)
+            query: Text to rank context against (defaults to the question,
+                or the project name and description)
+
+        Returns:
+            Dictionary with "prompt", "token_count", "truncated" and "fields"
+        """
+        (result,) = self.build_prompts([(template_name, context, max_tokens, query)])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def build_prompts(
+        self, items: List[Tuple[str, Dict[str, Any], Optional[int], Optional[str]]]
+    ) -> List[Any]:
+        """
+        Generate many prompts in one pass
+
+        The prompts are counted in one tokenizer call, and the context of all
+        prompts over their budget is ranked with one embedding call.
+
+        Args:
+            items: (template_name, context, max_tokens, query) tuples, as the
+                arguments of build_prompt
+
+        Returns:
+            Result of each item as returned by build_prompt, or the
+            exception raised for it (e.g. ValueError for an unknown template
+            or missing context variable)
+        """
+        results: List[Any] = [None] * len(items)
+        requests = []
+        positions = []
+        for index, (template_name, context, max_tokens, query) in enumerate(items):
+            try:
+                template = self.registry.get(template_name)
+            except ValueError as e:
+                results[index] = e
+                continue
+            fields = {
+                name: context[name]
+                for name in BUDGETED_FIELDS
+                if name in template.fields and isinstance(context.get(name), str)
+            }
+            if query is None:
+                query = "\n".join(
+                    str(context[name]) for name in QUERY_FIELDS if context.get(name)
+                )
+            requests.append(
+                (partial(_render, template, context), fields, max_tokens, query)
+            )
+            positions.append(index)
+
+        if requests:
+            budgeter = get_prompt_budgeter(embedding_service.model_name, get_tokenizer)
+            fitted = budgeter.fit_many(requests, embedding_service.encode)
+            for index, result in zip(positions, fitted):
+                results[index] = result
+        return results
+
     def get_available_templates(self) -> List[str]:
         """
         Get a list of available template names
@@ -78,8 +174,42 @@ class PromptService:
         Returns:
             List of template names
         """
-        return list(self.templates.keys())
+        return self.registry.names()
+
+    def describe_templates(self) -> List[Dict[str, Any]]:
+        """
+        Get the name, required fields and origin of every template
+
+        Returns:
+            List of template descriptions
+        """
+        return self.registry.describe()
 
 
 # Singleton instance
 prompt_service = PromptService()
+
+
+def build_prompt(
+    template_name: str,
+    context: Dict[str, Any],
+    max_tokens: Optional[int] = None,
+    query: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Generate a budgeted prompt with the singleton service
+
+    Module-level so it can be submitted to a process-based inference pool.
+    """
+    return prompt_service.build_prompt(template_name, context, max_tokens, query)
+
+
+def build_prompts(
+    items: List[Tuple[str, Dict[str, Any], Optional[int], Optional[str]]],
+) -> List[Any]:
+    """
+    Generate many budgeted prompts with the singleton service
+
+    Module-level so it can be submitted to a process-based inference pool.
+    """
+    return prompt_service.build_prompts(items)
@@ -0,0 +1,264 @@
+import os
+import time
+import asyncio
+import logging
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = (".txt", ".md", ".tmpl")
+
+_formatter = Formatter()
+
+# Conversions allowed after "!" in a field
+CONVERSIONS: Dict[str, Callable[[Any], str]] = {"r": repr, "s": str, "a": ascii}
+
+
+class CompiledTemplate:
+    """
+    Prompt template parsed once into literal text and field slots.
+
+    Templates use str.format syntax with named fields (``{project_name}``,
+    optionally with a ``!r``, ``!s`` or ``!a`` conversion and a format
+    spec); ``{{`` and ``}}`` are literal braces. The template is split into
+    segments once at load time, so rendering only joins the literals with
+    the formatted field values and never parses the template again.
+    """
+
+    def __init__(self, name: str, source: str, origin: str = "builtin"):
+        """
+        Compile a template
+
+        Args:
+            name: Template name
+            source: Template text
+            origin: Where the template came from (a file path or "builtin")
+
+        Raises:
+            ValueError: If the template is malformed, uses positional or
+                attribute/index fields, or an unknown conversion
+        """
+        self.name = name
+        self.source = source
+        self.origin = origin
+        # (literal, field, conversion, spec) with field None for trailing text
+        self._segments: List[Tuple[str, Optional[str], Optional[str], str]] = []
+        try:
+            # The parser reports a "!\0" conversion as no conversion at all,
+            # and a NUL has no business in prompt text anyway
+            if "\0" in source:
+                raise ValueError("Template contains a NUL character")
+            for literal, field, spec, conversion in _formatter.parse(source):
+                if field is None:
+                    self._segments.append((literal, None, None, ""))
+                    continue
+                if not field.isidentifier():
+                    raise ValueError(
+                        f"Field '{{{field}}}' must be a plain name "
+                        "(no positional, attribute or index fields)"
+                    )
+                if conversion is not None and conversion not in CONVERSIONS:
+                    raise ValueError(
+                        f"Field '{field}' has unknown conversion {conversion!r}, "
+                        "expected 'r', 's' or 'a'"
+                    )
+                if spec and ("{" in spec):
+                    raise ValueError(f"Field '{field}' has a nested format spec")
+                self._segments.append((literal, field, conversion, spec or ""))
+        except ValueError as e:
+            raise ValueError(f"Invalid template '{name}': {e}") from None
+
+        # Fields in order of first use
+        self.fields = list(
+            dict.fromkeys(field for _, field, _, _ in self._segments if field)
+        )
+
+    def _render(self, context: Dict[str, Any]) -> str:
+        pieces = []
+        for literal, field, conversion, spec in self._segments:
+            pieces.append(literal)
+            if field is not None:
+                value = context[field]
+                if conversion is not None:
+                    value = CONVERSIONS[conversion](value)
+                pieces.append(format(value, spec))
+        return "".join(pieces)
+
+    def render(self, context: Dict[str, Any]) -> str:
+        """
+        Fill the template
+
+        Args:
+            context: Field values; extra keys are ignored
+
+        Returns:
+            Rendered text
+
+        Raises:
+            ValueError: If a field is missing from the context
+        """
+        try:
+            return self._render(context)
+        except KeyError:
+            missing = [field for field in self.fields if field not in context]
+            if not missing:
+                raise
+            raise ValueError(
+                f"Missing context variable(s) for template '{self.name}': "
+                f"{', '.join(missing)}"
+            ) from None
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "fields": self.fields, "origin": self.origin}
+
+
+class TemplateRegistry:
+    """
+    In-memory registry of compiled prompt templates with directory hot-reload.
+
+    Built-in templates are always available; template files in the watched
+    directory (``<name>.txt``, ``.md`` or ``.tmpl``) add templates or
+    override built-ins of the same name. A reload compiles every file into a
+    new mapping and swaps it in only if all of them compiled, so renders
+    never see a half-updated or broken set of templates.
+    """
+
+    def __init__(
+        self,
+        builtins: Optional[Dict[str, str]] = None,
+        directory: Optional[str] = None,
+        poll_seconds: Optional[float] = None,
+    ):
+        """
+        Initialize the registry and compile the built-in templates
+
+        Args:
+            builtins: Mapping of template name to template text
+            directory: Template directory to load and watch (None disables it)
+            poll_seconds: Interval between checks of the directory for changes
+        """
+        self.directory = (
+            directory if directory is not None else os.getenv("PROMPT_TEMPLATE_DIR")
+        )
+        self.poll_seconds = poll_seconds or float(
+            os.getenv("PROMPT_TEMPLATE_POLL_SECONDS", "2")
+        )
+        self._builtins = {
+            name: CompiledTemplate(name, source)
+            for name, source in (builtins or {}).items()
+        }
+        self._templates: Dict[str, CompiledTemplate] = dict(self._builtins)
+        self._signature: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_reload: Optional[Dict[str, Any]] = None
+
+    def get(self, name: str) -> CompiledTemplate:
+        """
+        Look up a compiled template
+
+        Raises:
+            ValueError: If no template has that name
+        """
+        template = self._templates.get(name)
+        if template is None:
+            raise ValueError(f"Template '{name}' not found")
+        return template
+
+    def names(self) -> List[str]:
+        return list(self._templates.keys())
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """
+        Get the name, fields and origin of every template
+        """
+        return [template.describe() for template in self._templates.values()]
+
+    def _directory_signature(self) -> Tuple:
+        if not self.directory or not os.path.isdir(self.directory):
+            return ()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(TEMPLATE_EXTENSIONS):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries))
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        Compile the template directory and swap in the result
+
+        Returns:
+            Dictionary with the reload status, the loaded files and any errors;
+            on errors the previous templates stay in use
+        """
+        signature = self._directory_signature()
+        templates = dict(self._builtins)
+        errors: Dict[str, str] = {}
+        loaded: List[str] = []
+        for filename, _, _ in signature:
+            path = os.path.join(self.directory, filename)
+            name = os.path.splitext(filename)[0]
+            try:
+                with open(path, encoding="utf-8") as f:
+                    templates[name] = CompiledTemplate(name, f.read(), path)
+                loaded.append(name)
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                errors[filename] = str(e)
+
+        self._signature = signature
+        if errors:
+            logger.error(f"Keeping previous prompt templates, reload failed: {errors}")
+            status = "failed"
+        else:
+            self._templates = templates
+            status = "reloaded"
+            logger.info(
+                f"Loaded {len(loaded)} prompt templates from {self.directory}"
+                if self.directory
+                else "Using built-in prompt templates"
+            )
+        self.last_reload = {
+            "status": status,
+            "time": time.time(),
+            "files": loaded,
+            "errors": errors,
+        }
+        return self.last_reload
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload when a template file was added, changed or removed
+
+        Returns:
+            True if a reload was attempted
+        """
+        if self._directory_signature() == self._signature:
+            return False
+        self.reload()
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                logger.error(f"Error checking prompt templates: {e}")
+
+    def start(self):
+        """
+        Load the template directory and start watching it for changes
+        """
+        self.reload()
+        if self.directory and self._task is None:
+            self._task = asyncio.ensure_future(self._watch())
+
+    async def stop(self):
+        """
+        Stop watching the template directory
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,498 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORAGE_TYPES = ("float32", "int8", "binary")
+REDUCTIONS = ("none", "truncate", "pca")
+
+# Rows scored per block when compact codes are widened to float32
+SCORE_BLOCK_ROWS = 16384
+
+# Number of set bits in every byte value
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+Rows = Union[slice, np.ndarray]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class Quantizer:
+    """
+    Per-dimension scalar quantizer for normalized embeddings.
+
+    int8 codes store ``round((x - center) / scale)`` per dimension and binary
+    codes store the sign of ``x - center``, one bit per dimension. Without
+    calibration the center is zero and the scale covers [-1, 1]; fit() sets
+    both from sample vectors so the int8 range is spent where the values are.
+    """
+
+    def __init__(
+        self, center: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None
+    ):
+        self.center = center
+        self.scale = scale
+
+    @property
+    def calibrated(self) -> bool:
+        return self.center is not None
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, percentile: float = 99.9) -> "Quantizer":
+        """
+        Calibrate a quantizer on sample vectors
+
+        Args:
+            vectors: 2D array of normalized sample vectors
+            percentile: Percentile of each dimension's absolute deviation that
+                maps to the int8 limit; rarer outliers are clipped
+
+        Returns:
+            Calibrated quantizer
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        center = np.median(vectors, axis=0).astype(np.float32)
+        spread = np.percentile(np.abs(vectors - center), percentile, axis=0)
+        scale = (np.maximum(spread, 1e-6) / 127).astype(np.float32)
+        return cls(center, scale)
+
+    def _parameters(self, dimension: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.center is None:
+            return (
+                np.zeros(dimension, dtype=np.float32),
+                np.full(dimension, 1 / 127, dtype=np.float32),
+            )
+        if self.center.shape[0] != dimension:
+            raise ValueError(
+                f"Quantizer is calibrated for dimension {self.center.shape[0]}, "
+                f"got vectors of dimension {dimension}"
+            )
+        return self.center, self.scale
+
+    def encode_int8(self, vectors: np.ndarray) -> np.ndarray:
+        center, scale = self._parameters(vectors.shape[1])
+        return np.clip(np.rint((vectors - center) / scale), -127, 127).astype(np.int8)
+
+    def decode_int8(self, codes: np.ndarray) -> np.ndarray:
+        center, scale = self._parameters(codes.shape[1])
+        return codes.astype(np.float32) * scale + center
+
+    def encode_binary(self, vectors: np.ndarray) -> np.ndarray:
+        center, _ = self._parameters(vectors.shape[1])
+        return np.packbits(vectors > center, axis=1)
+
+    def int8_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Score int8 codes against a float query without decoding them
+
+        Uses ``decode(c) . q = c . (scale * q) + center . q``, widening one
+        block of codes at a time.
+        """
+        center, scale = self._parameters(query.shape[0])
+        weights = (scale * query).astype(np.float32)
+        offset = np.float32(center @ query)
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK_ROWS):
+            block = codes[start : start + SCORE_BLOCK_ROWS]
+            scores[start : start + block.shape[0]] = block.astype(np.float32) @ weights
+        return scores + offset
+
+    def to_arrays(self, prefix: str = "quantizer_") -> Dict[str, np.ndarray]:
+        if self.center is None:
+            return {}
+        return {f"{prefix}center": self.center, f"{prefix}scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, data: Any, prefix: str = "quantizer_") -> "Quantizer":
+        if f"{prefix}center" not in data:
+            return cls()
+        return cls(data[f"{prefix}center"], data[f"{prefix}scale"])
+
+
+def hamming_distances(bits: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    """
+    Count differing bits between packed binary codes and a packed query
+
+    Args:
+        bits: 2D uint8 array of packed codes
+        query_bits: 1D uint8 array of the packed query
+
+    Returns:
+        Number of differing bits per row
+    """
+    distances = np.empty(bits.shape[0], dtype=np.int32)
+    for start in range(0, bits.shape[0], SCORE_BLOCK_ROWS):
+        block = np.bitwise_xor(bits[start : start + SCORE_BLOCK_ROWS], query_bits)
+        distances[start : start + block.shape[0]] = POPCOUNT[block].sum(
+            axis=1, dtype=np.int32
+        )
+    return distances
+
+
+class VectorStore:
+    """
+    Row storage for the normalized vectors of a collection.
+
+    The float32 store keeps vectors as they are. The int8 store keeps one
+    byte per dimension and scores codes directly against the float query.
+    The binary store keeps one bit per dimension, ranks rows by Hamming
+    distance and estimates scores from it. No store keeps float32 copies of
+    compact rows, so rescoring is int8 rescoring and only applies to binary
+    storage. It is opt-in: with a rescore_factor above zero the binary store
+    also keeps int8 codes (eight times the size of the bits) and rescores the
+    best ``rescore_factor * top_k`` candidates from them against the float
+    query. The int8 store's scores are final.
+    """
+
+    def __init__(
+        self,
+        storage: str,
+        dimension: int,
+        quantizer: Optional[Quantizer] = None,
+        rescore_factor: Optional[int] = None,
+    ):
+        """
+        Initialize an empty store
+
+        Args:
+            storage: "float32", "int8" or "binary"
+            dimension: Vector dimension
+            quantizer: Quantizer for the compact storage types
+            rescore_factor: Candidates per result rescored from int8 codes
+                in binary storage (0, the default, disables rescoring and
+                keeps only the bits)
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(
+                f"Unknown vector storage '{storage}', expected one of {STORAGE_TYPES}"
+            )
+        self.storage = storage
+        self.dimension = dimension
+        self.quantizer = quantizer or Quantizer()
+        self.rescore_factor = (
+            rescore_factor
+            if rescore_factor is not None
+            else int(os.getenv("VECTOR_RESCORE_FACTOR", "0"))
+        )
+        self.vectors: Optional[np.ndarray] = None
+        self.codes: Optional[np.ndarray] = None
+        self.bits: Optional[np.ndarray] = None
+        if storage == "float32":
+            self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        if storage == "int8" or (storage == "binary" and self.rescore_factor > 0):
+            self.codes = np.zeros((0, dimension), dtype=np.int8)
+        if storage == "binary":
+            self.bits = np.zeros((0, (dimension + 7) // 8), dtype=np.uint8)
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"vectors": self.vectors, "codes": self.codes, "bits": self.bits}
+        return {name: array for name, array in arrays.items() if array is not None}
+
+    @property
+    def capacity(self) -> int:
+        return next(iter(self._arrays().values())).shape[0]
+
+    def bytes_per_vector(self) -> int:
+        """
+        Get the bytes held per row, including the int8 codes that binary
+        storage keeps for rescoring
+        """
+        return sum(array.shape[1] * array.itemsize for array in self._arrays().values())
+
+    def reserve(self, capacity: int, size: int):
+        """
+        Grow the backing arrays to hold at least capacity rows
+        """
+        for name, array in self._arrays().items():
+            grown = np.zeros((capacity, array.shape[1]), dtype=array.dtype)
+            grown[:size] = array[:size]
+            setattr(self, name, grown)
+
+    def write(self, rows: np.ndarray, vectors: np.ndarray):
+        """
+        Store normalized vectors at the given rows
+        """
+        if self.vectors is not None:
+            self.vectors[rows] = vectors
+        if self.codes is not None:
+            self.codes[rows] = self.quantizer.encode_int8(vectors)
+        if self.bits is not None:
+            self.bits[rows] = self.quantizer.encode_binary(vectors)
+
+    def move(self, source: int, target: int):
+        for array in self._arrays().values():
+            array[target] = array[source]
+
+    def decode(self, rows: Rows) -> np.ndarray:
+        """
+        Reconstruct float32 vectors for the given rows
+        """
+        if self.vectors is not None:
+            return self.vectors[rows]
+        if self.codes is not None:
+            return normalize_rows(self.quantizer.decode_int8(self.codes[rows]))
+        signs = np.unpackbits(self.bits[rows], axis=1, count=self.dimension)
+        return normalize_rows(signs.astype(np.float32) * 2 - 1)
+
+    def scores(self, query: np.ndarray, rows: Rows) -> np.ndarray:
+        """
+        Score rows against a normalized float query
+        """
+        if self.vectors is not None:
+            return self.vectors[rows] @ query
+        if self.codes is not None:
+            return self.quantizer.int8_scores(self.codes[rows], query)
+        return self._hamming_scores(query, rows)
+
+    def _hamming_scores(self, query: np.ndarray, rows: Rows) -> np.ndarray:
+        query_bits = self.quantizer.encode_binary(query[None, :])[0]
+        distances = hamming_distances(self.bits[rows], query_bits)
+        # Angle estimate of sign random projections
+        return np.cos(np.pi * distances / self.dimension).astype(np.float32)
+
+    def search(
+        self, query: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the best rows for a normalized float query
+
+        Args:
+            query: Normalized query vector
+            top_k: Maximum number of results
+            rows: Row indices to search (the first ``size`` rows when given
+                as a slice)
+
+        Returns:
+            Tuple of (row indices, scores), best first
+        """
+        if self.storage == "binary":
+            scores = self._hamming_scores(query, rows)
+            if self.codes is not None:
+                candidates = _top(scores, top_k * self.rescore_factor)
+                candidate_rows = _select(rows, candidates)
+                scores = self.quantizer.int8_scores(self.codes[candidate_rows], query)
+                top = _top(scores, top_k)
+                return candidate_rows[top], scores[top]
+        else:
+            scores = self.scores(query, rows)
+        top = _top(scores, top_k)
+        return _select(rows, top), scores[top]
+
+    def to_arrays(self, size: int) -> Dict[str, np.ndarray]:
+        arrays = {name: array[:size] for name, array in self._arrays().items()}
+        arrays.update(self.quantizer.to_arrays())
+        return arrays
+
+    def restore(self, data: Any, size: int):
+        """
+        Fill the first size rows, already reserved, from arrays written by
+        to_arrays()
+
+        A float32 snapshot can be restored into compact storage; the vectors
+        are quantized on load.
+        """
+        names = self._arrays().keys()
+        if all(name in data for name in names):
+            for name in names:
+                getattr(self, name)[:size] = data[name]
+        elif "vectors" in data:
+            self.write(np.arange(size), np.asarray(data["vectors"], dtype=np.float32))
+        else:
+            raise ValueError(f"Snapshot has no vectors for {self.storage} storage")
+
+
+def _select(rows: Rows, positions: np.ndarray) -> np.ndarray:
+    if isinstance(rows, slice):
+        return positions + (rows.start or 0)
+    return rows[positions]
+
+
+class Calibration:
+    """
+    Per-model post-processing parameters: an optional PCA projection and the
+    quantizer for the (reduced) embeddings
+    """
+
+    def __init__(
+        self,
+        reduction: str = "none",
+        dimension: Optional[int] = None,
+        mean: Optional[np.ndarray] = None,
+        components: Optional[np.ndarray] = None,
+        quantizer: Optional[Quantizer] = None,
+    ):
+        self.reduction = reduction
+        self.dimension = dimension
+        self.mean = mean
+        self.components = components
+        self.quantizer = quantizer or Quantizer()
+
+    @classmethod
+    def fit(
+        cls, vectors: np.ndarray, reduction: str, dimension: Optional[int]
+    ) -> "Calibration":
+        """
+        Fit the reduction and quantizer on sample embeddings
+
+        Args:
+            vectors: 2D array of raw model embeddings
+            reduction: "none", "truncate" or "pca"
+            dimension: Target dimension for truncation and PCA
+
+        Returns:
+            Fitted calibration
+        """
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        calibration = cls(reduction, dimension)
+        if reduction == "pca":
+            if not dimension:
+                raise ValueError("PCA needs a target dimension")
+            if dimension > min(vectors.shape):
+                raise ValueError(
+                    f"PCA to {dimension} dimensions needs at least {dimension} "
+                    f"calibration texts, got {vectors.shape[0]}"
+                )
+            calibration.mean = vectors.mean(axis=0)
+            _, _, vt = np.linalg.svd(vectors - calibration.mean, full_matrices=False)
+            # PCA concentrates variance in the leading components, which
+            # leaves most sign bits uninformative; a random rotation spreads
+            # it evenly without changing dot products
+            rotation, _ = np.linalg.qr(
+                np.random.default_rng(0).standard_normal((dimension, dimension))
+            )
+            calibration.components = (rotation @ vt[:dimension]).astype(np.float32)
+        calibration.quantizer = Quantizer.fit(calibration.reduce(vectors))
+        return calibration
+
+    def reduce(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Reduce raw embeddings to the target dimension
+
+        Truncation keeps the leading dimensions (for Matryoshka-trained
+        models) and PCA projects onto the fitted components; either way the
+        result is renormalized.
+        """
+        if self.reduction == "none" or not self.dimension:
+            return vectors
+        if self.reduction == "truncate":
+            return normalize_rows(vectors[:, : self.dimension])
+        if self.components is None:
+            raise ValueError(
+                "PCA reduction is not calibrated; POST /embeddings/calibrate first"
+            )
+        return normalize_rows((normalize_rows(vectors) - self.mean) @ self.components.T)
+
+    def save(self, path: str):
+        arrays = {
+            "metadata": np.array(
+                json.dumps({"reduction": self.reduction, "dimension": self.dimension})
+            ),
+            **self.quantizer.to_arrays(),
+        }
+        if self.components is not None:
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            return cls(
+                metadata["reduction"],
+                metadata["dimension"],
+                data["mean"] if "mean" in data else None,
+                data["components"] if "components" in data else None,
+                Quantizer.from_arrays(data),
+            )
+
+
+def calibration_path(directory: str, model_key: str) -> str:
+    """
+    Get the calibration file of a model
+    """
+    return os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_key) + ".npz")
+
+
+def measure_recall(
+    raw: np.ndarray,
+    calibration: Calibration,
+    top_k: int = 10,
+    queries: int = 100,
+) -> Dict[str, Any]:
+    """
+    Measure the recall of reduced and quantized search against exact search
+
+    The first ``queries`` vectors are used as queries against all vectors
+    (excluding themselves); results of every storage type are compared with
+    exact float search over the raw embeddings.
+
+    Args:
+        raw: 2D array of raw model embeddings
+        calibration: Calibration to evaluate
+        top_k: Neighbours compared per query
+        queries: Number of query vectors
+
+    Returns:
+        Dictionary with, per storage type, the recall at top_k and the bytes
+        stored per vector
+    """
+    raw = normalize_rows(np.asarray(raw, dtype=np.float32))
+    reduced = normalize_rows(calibration.reduce(raw))
+    count = raw.shape[0]
+    queries = min(queries, count)
+    top_k = min(top_k, count - 1)
+    if top_k <= 0:
+        raise ValueError("Recall needs at least two calibration texts")
+
+    def neighbours(scores: np.ndarray, index: int, k: int) -> set:
+        scores = scores.copy()
+        scores[index] = -np.inf
+        return set(_top(scores, k).tolist())
+
+    exact = [neighbours(raw @ raw[i], i, top_k) for i in range(queries)]
+    report: Dict[str, Any] = {
+        "top_k": top_k,
+        "queries": queries,
+        "dimension": reduced.shape[1],
+        "raw_dimension": raw.shape[1],
+    }
+    variants = [("float32", 0), ("int8", 0), ("binary", 0), ("binary", 4)]
+    for storage, rescore_factor in variants:
+        store = VectorStore(
+            storage, reduced.shape[1], calibration.quantizer, rescore_factor
+        )
+        store.reserve(count, 0)
+        store.write(np.arange(count), reduced)
+        hits = 0
+        for i in range(queries):
+            rows, _ = store.search(reduced[i], top_k + 1, slice(0, count))
+            found = [row for row in rows.tolist() if row != i][:top_k]
+            hits += len(exact[i].intersection(found))
+        name = storage if not rescore_factor else f"{storage}+int8_rescore"
+        report[name] = {
+            "recall": hits / (queries * top_k),
+            "bytes_per_vector": store.bytes_per_vector(),
+        }
+    report["raw_bytes_per_vector"] = raw.shape[1] * 4
+    return report
@@ -0,0 +1,403 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEVELOPMENTS = "developments"
+PROJECTS = "projects"
+SIDES = (DEVELOPMENTS, PROJECTS)
+
+# Batches larger than this rebuild the other side's top lists in one
+# vectorized pass instead of patching them item by item
+BULK_UPSERT_SIZE = 16
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _best(scores: np.ndarray, ids: List[str], k: int) -> List[Tuple[float, str]]:
+    # Top-k (score, id) pairs of one score vector, best first
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(float(scores[i]), ids[i]) for i in top]
+
+
+class _Side:
+    """
+    Items of one side of the table with their vectors and top-k lists
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        # Best matches on the other side, sorted by descending score
+        self.top: List[List[Tuple[float, str]]] = []
+        # Lowest score in each full top list, -inf while a list is not full
+        self.floor = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class RelevanceTable:
+    """
+    Persisted development x project relevance score table.
+
+    Every development is scored against every project once, and each item
+    keeps its current top-k matches. When an item is added, changed or
+    removed only its row (or column) of scores is recomputed, and only the
+    top-k lists on the other side that the change can affect are patched,
+    so reading an item's matches never rescans the table.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_top_k: Optional[int] = None):
+        """
+        Initialize an empty table
+
+        Args:
+            path: Snapshot file (default: the RELEVANCE_TABLE_PATH variable)
+            max_top_k: Length of the maintained top-k lists
+        """
+        self.path = path if path is not None else os.getenv("RELEVANCE_TABLE_PATH")
+        self.max_top_k = max_top_k or int(os.getenv("RELEVANCE_MAX_TOP_K", "50"))
+        self.dimension: Optional[int] = None
+        self._sides = {DEVELOPMENTS: _Side(), PROJECTS: _Side()}
+        # Scores with developments as rows and projects as columns
+        self._scores = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def _pair(self, side: str) -> Tuple[_Side, _Side, str]:
+        if side not in SIDES:
+            raise ValueError(f"Unknown side '{side}', expected one of {SIDES}")
+        other = PROJECTS if side == DEVELOPMENTS else DEVELOPMENTS
+        return self._sides[side], self._sides[other], other
+
+    def _row_scores(self, side: str, row: int) -> np.ndarray:
+        # Scores of one item against every item on the other side
+        if side == DEVELOPMENTS:
+            return self._scores[row, : len(self._sides[PROJECTS])]
+        return self._scores[: len(self._sides[DEVELOPMENTS]), row]
+
+    def _write_scores(self, side: str, rows: np.ndarray, scores: np.ndarray):
+        if side == DEVELOPMENTS:
+            self._scores[rows, : scores.shape[1]] = scores
+        else:
+            self._scores[: scores.shape[1], rows] = scores.T
+
+    def _reserve(self, side: str, size: int):
+        # Grow vectors, floors and the score matrix geometrically
+        items = self._sides[side]
+        capacity = items.vectors.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+
+        vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+        vectors[: len(items)] = items.vectors[: len(items)]
+        items.vectors = vectors
+        floor = np.full(capacity, -np.inf, dtype=np.float32)
+        floor[: len(items)] = items.floor[: len(items)]
+        items.floor = floor
+
+        rows, columns = self._scores.shape
+        shape = (capacity, columns) if side == DEVELOPMENTS else (rows, capacity)
+        scores = np.zeros(shape, dtype=np.float32)
+        scores[:rows, :columns] = self._scores
+        self._scores = scores
+
+    def _set_top(self, items: _Side, row: int, entries: List[Tuple[float, str]]):
+        items.top[row] = entries
+        items.floor[row] = entries[-1][0] if len(entries) == self.max_top_k else -np.inf
+
+    def _rebuild_top(self, side: str, row: int):
+        _, other, _ = self._pair(side)
+        self._set_top(
+            self._sides[side],
+            row,
+            _best(self._row_scores(side, row), other.ids, self.max_top_k),
+        )
+
+    def _patch_top(self, side: str, row: int, item_id: str, score: Optional[float]):
+        # Update one top list after item_id's score changed (None: removed)
+        items = self._sides[side]
+        entries = items.top[row]
+        was_full = len(entries) == self.max_top_k
+        old_floor = items.floor[row]
+
+        removed = False
+        for position, (_, entry_id) in enumerate(entries):
+            if entry_id == item_id:
+                del entries[position]
+                removed = True
+                break
+
+        if removed and was_full and (score is None or score < old_floor):
+            # An item outside the list may now rank above the changed one
+            self._rebuild_top(side, row)
+            return
+
+        if score is not None and (
+            len(entries) < self.max_top_k or score > entries[-1][0]
+        ):
+            position = len(entries)
+            while position > 0 and entries[position - 1][0] < score:
+                position -= 1
+            entries.insert(position, (score, item_id))
+            del entries[self.max_top_k :]
+        self._set_top(items, row, entries)
+
+    def upsert(self, side: str, ids: List[str], vectors: np.ndarray):
+        """
+        Add or replace items and update the affected scores
+
+        Args:
+            side: "developments" or "projects"
+            ids: Item ids
+            vectors: 2D array with one embedding per id
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("Expected one vector per id")
+
+        with self._lock:
+            items, other, other_side = self._pair(side)
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                for existing in self._sides.values():
+                    existing.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Table has dimension {self.dimension}, "
+                    f"got vectors of dimension {vectors.shape[1]}"
+                )
+            # Keep the last vector of ids repeated within the batch
+            positions = {item_id: position for position, item_id in enumerate(ids)}
+            if len(positions) < len(ids):
+                ids = list(positions)
+                vectors = vectors[list(positions.values())]
+            vectors = _normalize_rows(vectors)
+            self._reserve(side, len(items) + len(ids))
+
+            rows = []
+            previous = []
+            for item_id in ids:
+                row = items.rows.get(item_id)
+                if row is None:
+                    row = len(items)
+                    items.ids.append(item_id)
+                    items.rows[item_id] = row
+                    items.top.append([])
+                    previous.append(None)
+                else:
+                    previous.append(self._row_scores(side, row).copy())
+                rows.append(row)
+            rows = np.array(rows)
+
+            items.vectors[rows] = vectors
+            scores = vectors @ other.vectors[: len(other)].T
+            self._write_scores(side, rows, scores)
+            for row in rows:
+                self._rebuild_top(side, row)
+
+            if len(ids) > BULK_UPSERT_SIZE:
+                for row in range(len(other)):
+                    self._rebuild_top(other_side, row)
+                return
+
+            floor = other.floor[: len(other)]
+            for item_id, new, old in zip(ids, scores, previous):
+                affected = new > floor
+                if old is not None:
+                    affected |= old >= floor
+                for row in np.flatnonzero(affected):
+                    self._patch_top(other_side, row, item_id, float(new[row]))
+
+    def delete(self, side: str, ids: List[str]) -> int:
+        """
+        Remove items and drop them from the other side's top-k lists
+
+        Args:
+            side: "developments" or "projects"
+            ids: Item ids to delete (unknown ids are ignored)
+
+        Returns:
+            Number of items deleted
+        """
+        deleted = 0
+        with self._lock:
+            items, other, other_side = self._pair(side)
+            for item_id in ids:
+                row = items.rows.pop(item_id, None)
+                if row is None:
+                    continue
+                affected = np.flatnonzero(
+                    self._row_scores(side, row) >= other.floor[: len(other)]
+                )
+
+                # Move the last item into the freed row to keep arrays dense
+                last = len(items) - 1
+                if row != last:
+                    moved = items.ids[last]
+                    items.ids[row] = moved
+                    items.rows[moved] = row
+                    items.vectors[row] = items.vectors[last]
+                    items.top[row] = items.top[last]
+                    items.floor[row] = items.floor[last]
+                    if side == DEVELOPMENTS:
+                        self._scores[row] = self._scores[last]
+                    else:
+                        self._scores[:, row] = self._scores[:, last]
+                items.ids.pop()
+                items.top.pop()
+                items.floor[last] = -np.inf
+
+                for other_row in affected:
+                    self._patch_top(other_side, other_row, item_id, None)
+                deleted += 1
+        return deleted
+
+    def matches(
+        self, side: str, item_id: str, top_k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Get the best matches of an item on the other side
+
+        Lists of up to max_top_k entries are maintained on update, so this
+        is a slice; larger top_k values are computed from the score row.
+
+        Args:
+            side: "developments" or "projects"
+            item_id: Item id
+            top_k: Number of matches to return
+
+        Returns:
+            List of (id, score) tuples sorted by descending score
+
+        Raises:
+            KeyError: If the item is not in the table
+        """
+        with self._lock:
+            items, other, _ = self._pair(side)
+            row = items.rows.get(item_id)
+            if row is None:
+                raise KeyError(f"Unknown {side[:-1]} '{item_id}'")
+            if top_k <= self.max_top_k:
+                entries = items.top[row][:top_k]
+            else:
+                entries = _best(self._row_scores(side, row), other.ids, top_k)
+            return [(entry_id, score) for score, entry_id in entries]
+
+    def score(self, development_id: str, project_id: str) -> float:
+        """
+        Get the stored relevance score of one development and project
+
+        Raises:
+            KeyError: If either item is not in the table
+        """
+        with self._lock:
+            row = self._sides[DEVELOPMENTS].rows.get(development_id)
+            column = self._sides[PROJECTS].rows.get(project_id)
+            if row is None or column is None:
+                raise KeyError(f"Unknown pair '{development_id}', '{project_id}'")
+            return float(self._scores[row, column])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get table statistics
+        """
+        with self._lock:
+            developments = len(self._sides[DEVELOPMENTS])
+            projects = len(self._sides[PROJECTS])
+            return {
+                "developments": developments,
+                "projects": projects,
+                "dimension": self.dimension,
+                "max_top_k": self.max_top_k,
+                "score_bytes": developments * projects * 4,
+            }
+
+    def save(self):
+        """
+        Write the table to the snapshot file atomically
+        """
+        if not self.path:
+            return
+        with self._lock:
+            developments = self._sides[DEVELOPMENTS]
+            projects = self._sides[PROJECTS]
+            arrays = {
+                "development_ids": np.array(developments.ids, dtype=str),
+                "project_ids": np.array(projects.ids, dtype=str),
+                "development_vectors": developments.vectors[: len(developments)],
+                "project_vectors": projects.vectors[: len(projects)],
+                "scores": self._scores[: len(developments), : len(projects)],
+                "metadata": np.array(json.dumps({"dimension": self.dimension})),
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.path)
+        logger.info(
+            f"Saved relevance table ({len(developments)} x {len(projects)}) "
+            f"to {self.path}"
+        )
+
+    def load(self):
+        """
+        Restore the table from the snapshot file, rebuilding the top-k lists
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                dimension = json.loads(str(data["metadata"]))["dimension"]
+                loaded = {
+                    DEVELOPMENTS: (
+                        data["development_ids"].tolist(),
+                        data["development_vectors"],
+                    ),
+                    PROJECTS: (data["project_ids"].tolist(), data["project_vectors"]),
+                }
+                scores = data["scores"]
+        except Exception as e:
+            logger.error(f"Error loading relevance table {self.path}: {e}")
+            return
+
+        with self._lock:
+            self.dimension = dimension
+            self._sides = {DEVELOPMENTS: _Side(), PROJECTS: _Side()}
+            self._scores = np.zeros((0, 0), dtype=np.float32)
+            for side, (ids, vectors) in loaded.items():
+                items = self._sides[side]
+                items.vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+                if ids:
+                    self._reserve(side, len(ids))
+                items.ids = ids
+                items.rows = {item_id: row for row, item_id in enumerate(ids)}
+                items.vectors[: len(ids)] = vectors
+                items.top = [[] for _ in ids]
+            self._scores[: scores.shape[0], : scores.shape[1]] = scores
+            for side in SIDES:
+                for row in range(len(self._sides[side])):
+                    self._rebuild_top(side, row)
+        logger.info(
+            f"Loaded relevance table ({scores.shape[0]} x {scores.shape[1]}) "
+            f"from {self.path}"
+        )
+
+
+# Singleton instance
+relevance_table = RelevanceTable()
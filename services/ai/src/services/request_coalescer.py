@@ -0,0 +1,89 @@
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+coalesced_requests = metrics.counter(
+    "coalesced_requests", "Requests served by an identical request already in flight"
+)
+
+
+def request_key(*parts: Any) -> str:
+    """
+    Build a key identifying a request by its exact inputs
+
+    Args:
+        parts: JSON-serializable request inputs (model, texts, options)
+
+    Returns:
+        Hex SHA-256 digest of the inputs
+    """
+    payload = json.dumps(parts, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RequestCoalescer:
+    """
+    Shares one computation between identical concurrent requests.
+
+    The first request for a key starts the computation; requests with the
+    same key that arrive before it finishes await the same future instead
+    of starting their own. Nothing is kept once the computation finishes,
+    so this only removes duplicate in-flight work and never serves stale
+    results. A caller that disconnects does not cancel the computation for
+    the others.
+    """
+
+    def __init__(self, kind: str):
+        """
+        Initialize the coalescer
+
+        Args:
+            kind: Request kind, used as the metrics label
+        """
+        self.kind = kind
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counters = {"requests": 0, "coalesced": 0}
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a computation, or join the identical one already in flight
+
+        Args:
+            key: Request key, e.g. from request_key()
+            compute: Starts the computation when no identical one is running
+
+        Returns:
+            The computation's result, shared by every request with the key
+        """
+        self._counters["requests"] += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self._counters["coalesced"] += 1
+            coalesced_requests.inc(kind=self.kind)
+        else:
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(future)
+
+    def _finished(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the error as retrieved in case every waiter has gone away
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing statistics
+
+        Returns:
+            Dictionary with the request and coalesced request counts and the
+            number of computations in flight
+        """
+        return {**self._counters, "in_flight": len(self._inflight)}
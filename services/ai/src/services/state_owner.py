@@ -0,0 +1,110 @@
+import os
+import logging
+import tempfile
+from typing import IO, Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so every process owns its state
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class StateOwner:
+    """
+    Elects the one worker process that persists the service's state.
+
+    Under the pre-fork server every worker holds its own in-memory vector
+    collections, relevance table and job queue. The worker that takes an
+    exclusive lock on the state lock file at startup owns the persisted
+    state: it alone resumes checkpointed jobs and writes snapshots, so
+    workers do not resume the same jobs or overwrite each other's
+    snapshots on shutdown. The other workers load the snapshots for
+    reading. The lock is released when the owner exits, and the worker
+    started in its place takes it over.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the election; nothing is locked until acquire()
+
+        Args:
+            path: Lock file shared by the workers (default: the
+                STATE_LOCK_PATH variable, or a file per port in the
+                temporary directory)
+        """
+        self.path = (
+            path
+            or os.getenv("STATE_LOCK_PATH")
+            or os.path.join(
+                tempfile.gettempdir(), f"ideahub-ai-{os.getenv('PORT', '8000')}.lock"
+            )
+        )
+        self.is_owner = False
+        self._handle: Optional[IO[str]] = None
+
+    def acquire(self) -> bool:
+        """
+        Try to become the state owner, without waiting
+
+        Returns:
+            True if this process owns the state
+        """
+        if self.is_owner:
+            return True
+        if fcntl is None:
+            self.is_owner = True
+            return True
+
+        handle = open(self.path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            logger.info(
+                f"Worker {os.getpid()} serves a read copy of the state owned by "
+                f"worker {self.owner_pid()}"
+            )
+            return False
+
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._handle = handle
+        self.is_owner = True
+        logger.info(f"Worker {os.getpid()} owns the persisted service state")
+        return True
+
+    def owner_pid(self) -> Optional[int]:
+        """
+        Get the pid of the owning worker, as recorded in the lock file
+        """
+        if self.is_owner:
+            return os.getpid()
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        """
+        Give up ownership, letting a worker started later take it
+        """
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self.is_owner = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "owner": self.is_owner,
+            "owner_pid": self.owner_pid(),
+            "lock_path": self.path,
+        }
+
+
+# Singleton instance
+state_owner = StateOwner()
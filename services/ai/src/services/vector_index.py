@@ -0,0 +1,579 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from src.services.quantization import STORAGE_TYPES, Quantizer, VectorStore
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Below this size an IVF index has too few vectors per list to be useful
+MIN_IVF_SIZE = 1024
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorCollection:
+    """
+    Named set of vectors with cosine top-k search.
+
+    Vectors are L2-normalized on insert and kept in one contiguous matrix, so
+    exact search is a single matrix-vector product. The matrix holds float32
+    vectors or, to cut memory 4x or 32x, int8 or binary codes that are scored
+    directly; binary storage with int8 rescoring enabled also keeps int8
+    codes, which brings the saving down to about 3.5x (see VectorStore).
+    Deletions move the last row into the freed slot to keep the matrix dense.
+    Once a collection grows past ivf_threshold it also maintains an IVF index
+    (k-means coarse quantizer) and only scores the rows in the nprobe lists
+    closest to the query.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dimension: Optional[int] = None,
+        index_type: Optional[str] = None,
+        ivf_threshold: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        storage: Optional[str] = None,
+        quantizer: Optional[Quantizer] = None,
+    ):
+        """
+        Initialize an empty collection
+
+        Args:
+            name: Collection name
+            dimension: Vector dimension (fixed by the first insert if omitted)
+            index_type: "flat" for exact search only, "ivf" to always build
+                an IVF index, or "auto" to build one past ivf_threshold
+            ivf_threshold: Minimum size before an IVF index is built in auto mode
+            nprobe: Number of IVF lists scanned per query
+            storage: "float32", "int8" or "binary" vector storage
+            quantizer: Calibrated quantizer for int8 and binary storage
+        """
+        self.name = name
+        self.dimension = dimension
+        self.index_type = (index_type or os.getenv("VECTOR_INDEX_TYPE", "auto")).lower()
+        if self.index_type not in ("flat", "ivf", "auto"):
+            raise ValueError(f"Unknown index type '{self.index_type}'")
+        self.ivf_threshold = ivf_threshold or int(
+            os.getenv("VECTOR_INDEX_IVF_THRESHOLD", "50000")
+        )
+        self.nprobe = nprobe or int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+        self.storage = (storage or os.getenv("VECTOR_STORAGE", "float32")).lower()
+        if self.storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown vector storage '{self.storage}'")
+        self.quantizer = quantizer
+
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._store: Optional[VectorStore] = None
+        if dimension:
+            self._store = VectorStore(self.storage, dimension, quantizer)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self.lexical = BM25Index()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _reserve(self, size: int):
+        # Grow the backing matrix geometrically so upserts are amortized O(1)
+        capacity = self._store.capacity
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+        self._store.reserve(capacity, len(self._ids))
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[: len(self._ids)] = self._assignments[: len(self._ids)]
+        self._assignments = assignments
+
+    def upsert(
+        self, ids: List[str], vectors: np.ndarray, texts: Optional[List[str]] = None
+    ):
+        """
+        Insert new vectors or replace existing ones by id
+
+        Args:
+            ids: Vector ids
+            vectors: 2D array with one row per id
+            texts: Texts the vectors were computed from, indexed for lexical
+                search; ids upserted without texts are dropped from it
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("Expected one vector per id")
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._store = VectorStore(self.storage, self.dimension, self.quantizer)
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Collection '{self.name}' has dimension {self.dimension}, "
+                    f"got vectors of dimension {vectors.shape[1]}"
+                )
+
+            vectors = _normalize_rows(vectors)
+            self._reserve(len(self._ids) + len(ids))
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, vector_id in enumerate(ids):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(vector_id)
+                    self._rows[vector_id] = row
+                rows[i] = row
+            # Later duplicates of an id overwrite earlier ones
+            self._store.write(rows, vectors)
+            if self._centroids is not None:
+                self._assignments[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+
+            if texts is not None:
+                self.lexical.add(ids, texts)
+            else:
+                self.lexical.remove(ids)
+
+            self._maybe_train()
+
+    def delete(self, ids: List[str]) -> int:
+        """
+        Delete vectors by id
+
+        Args:
+            ids: Vector ids to delete (unknown ids are ignored)
+
+        Returns:
+            Number of vectors deleted
+        """
+        deleted = 0
+        with self._lock:
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._ids[row] = moved_id
+                    self._rows[moved_id] = row
+                    self._store.move(last, row)
+                    self._assignments[row] = self._assignments[last]
+                self._ids.pop()
+                deleted += 1
+            self.lexical.remove(ids)
+        return deleted
+
+    def get(self, ids: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Fetch stored (normalized) vectors by id, decoded from compact storage
+
+        Args:
+            ids: Vector ids to fetch, or None for the whole collection
+
+        Returns:
+            Tuple of (ids, 2D array with one row per id)
+
+        Raises:
+            KeyError: If any id is not in the collection
+        """
+        with self._lock:
+            if ids is None:
+                size = len(self._ids)
+                if size == 0:
+                    return [], np.zeros((0, self.dimension or 0), dtype=np.float32)
+                return list(self._ids), self._store.decode(slice(0, size)).copy()
+            missing = [vector_id for vector_id in ids if vector_id not in self._rows]
+            if missing:
+                raise KeyError(
+                    f"Ids not found in collection '{self.name}': {', '.join(missing[:10])}"
+                )
+            rows = [self._rows[vector_id] for vector_id in ids]
+            return list(ids), self._store.decode(np.asarray(rows, dtype=np.int64))
+
+    def _maybe_train(self):
+        size = len(self._ids)
+        if self.index_type == "flat":
+            return
+        if size < (self.ivf_threshold if self.index_type == "auto" else MIN_IVF_SIZE):
+            return
+        # Retrain when the collection has doubled since the last training run
+        if self._centroids is None or size >= 2 * self._trained_size:
+            self.train()
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """
+        Build the IVF coarse quantizer with spherical k-means
+
+        Args:
+            iterations: Number of k-means iterations
+            seed: Random seed for centroid initialization and sampling
+        """
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return
+            nlist = max(1, min(size, int(4 * np.sqrt(size))))
+            rng = np.random.default_rng(seed)
+
+            # Train on a sample to bound the cost on very large collections
+            sample_size = min(size, nlist * 64)
+            sample = self._store.decode(
+                np.sort(rng.choice(size, sample_size, replace=False))
+            )
+            centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+            for _ in range(iterations):
+                assignments = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, sample)
+                empty = ~sums.any(axis=1)
+                sums[empty] = centroids[empty]
+                centroids = _normalize_rows(sums)
+
+            self._centroids = centroids.astype(np.float32)
+            for start in range(0, size, 16384):
+                end = min(size, start + 16384)
+                vectors = self._store.decode(slice(start, end))
+                self._assignments[start:end] = np.argmax(
+                    vectors @ self._centroids.T, axis=1
+                )
+            self._trained_size = size
+            logger.info(
+                f"Trained IVF index for collection '{self.name}' "
+                f"with {nlist} lists over {size} vectors"
+            )
+
+    def search(self, query: np.ndarray, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Find the vectors most similar to a query
+
+        Args:
+            query: Query vector
+            top_k: Maximum number of results
+
+        Returns:
+            List of (id, cosine similarity) tuples, most similar first
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self._lock:
+            size = len(self._ids)
+            if size == 0 or top_k <= 0:
+                return []
+            if query.shape[0] != self.dimension:
+                raise ValueError(
+                    f"Collection '{self.name}' has dimension {self.dimension}, "
+                    f"got a query of dimension {query.shape[0]}"
+                )
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+
+            candidates = None
+            if self._centroids is not None and self.index_type != "flat":
+                probes = np.argsort(-(self._centroids @ query))[: self.nprobe]
+                probed = np.zeros(len(self._centroids), dtype=bool)
+                probed[probes] = True
+                candidates = np.flatnonzero(probed[self._assignments[:size]])
+                # Fall back to exact search if the probed lists are too small
+                if candidates.shape[0] < top_k:
+                    candidates = None
+
+            rows, scores = self._store.search(
+                query, top_k, candidates if candidates is not None else slice(0, size)
+            )
+            return [(self._ids[row], float(score)) for row, score in zip(rows, scores)]
+
+    def search_lexical(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Find the documents with the best BM25 match for a query text
+
+        Args:
+            query: Query text
+            top_k: Maximum number of results
+
+        Returns:
+            List of (id, BM25 score) tuples, best first
+        """
+        return self.lexical.search(query, top_k)
+
+    def search_hybrid(
+        self,
+        query: np.ndarray,
+        text: str,
+        top_k: int = 10,
+        candidates: Optional[int] = None,
+        rrf_k: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Combine dense and lexical retrieval with reciprocal rank fusion
+
+        Both retrievers return their top candidates (a partial sort over the
+        collection each), and the two rankings are fused by rank.
+
+        Args:
+            query: Query vector
+            text: Query text
+            top_k: Maximum number of results
+            candidates: Results taken from each retriever before fusion
+            rrf_k: Rank smoothing constant of the fusion
+
+        Returns:
+            List of (id, fused score) tuples, best first
+        """
+        candidates = max(top_k, candidates or int(os.getenv("HYBRID_CANDIDATES", "50")))
+        rrf_k = rrf_k or int(os.getenv("HYBRID_RRF_K", "60"))
+        dense = self.search(query, candidates)
+        lexical = self.lexical.search(text, candidates)
+        return reciprocal_rank_fusion([dense, lexical], rrf_k, top_k)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get collection statistics
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._ids),
+                "dimension": self.dimension,
+                "index_type": self.index_type,
+                "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+                "storage": self.storage,
+                "rescore_factor": self._store.rescore_factor if self._store else 0,
+                "bytes": len(self._ids)
+                * (self._store.bytes_per_vector() if self._store else 0),
+                "float32_bytes": len(self._ids) * (self.dimension or 0) * 4,
+                "lexical_documents": len(self.lexical),
+            }
+
+    def save(self, path: str):
+        """
+        Write a snapshot of the collection to a .npz file atomically
+
+        Args:
+            path: Destination file path
+        """
+        with self._lock:
+            size = len(self._ids)
+            metadata = {
+                "name": self.name,
+                "dimension": self.dimension,
+                "index_type": self.index_type,
+                "trained_size": self._trained_size,
+                "storage": self.storage,
+            }
+            arrays = {
+                "ids": np.array(self._ids, dtype=str),
+                "assignments": self._assignments[:size],
+                "metadata": np.array(json.dumps(metadata)),
+            }
+            if self._store is not None:
+                arrays.update(self._store.to_arrays(size))
+            if self._centroids is not None:
+                arrays["centroids"] = self._centroids
+            if len(self.lexical):
+                arrays["lexical"] = np.array(json.dumps(self.lexical.documents()))
+
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorCollection":
+        """
+        Load a collection snapshot written by save()
+
+        Args:
+            path: Snapshot file path
+
+        Returns:
+            Restored collection
+        """
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            collection = cls(
+                metadata["name"],
+                dimension=metadata["dimension"],
+                index_type=metadata["index_type"],
+                storage=metadata.get("storage"),
+                quantizer=Quantizer.from_arrays(data),
+            )
+            ids = data["ids"].tolist()
+            if collection._store is None:
+                return collection
+            collection._reserve(len(ids))
+            collection._ids = ids
+            collection._rows = {vector_id: row for row, vector_id in enumerate(ids)}
+            collection._store.restore(data, len(ids))
+            collection._assignments[: len(ids)] = data["assignments"]
+            if "centroids" in data:
+                collection._centroids = data["centroids"]
+            collection._trained_size = metadata["trained_size"]
+            if "lexical" in data:
+                for doc_id, terms in json.loads(str(data["lexical"])).items():
+                    collection.lexical.add_terms(doc_id, terms)
+        return collection
+
+
+class VectorIndex:
+    """
+    Registry of named vector collections with disk snapshots
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the index
+
+        Args:
+            path: Snapshot directory (None disables persistence)
+        """
+        self.path = path if path is not None else os.getenv("VECTOR_INDEX_PATH")
+        self.collections: Dict[str, VectorCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(
+        self, name: str, create: bool = False, quantizer: Optional[Quantizer] = None
+    ) -> VectorCollection:
+        """
+        Look up a collection by name
+
+        Args:
+            name: Collection name
+            create: Create the collection if it does not exist
+            quantizer: Calibrated quantizer for a newly created collection
+
+        Returns:
+            The collection
+
+        Raises:
+            ValueError: If the name is invalid
+            KeyError: If the collection does not exist and create is False
+        """
+        if not COLLECTION_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid collection name '{name}'")
+        with self._lock:
+            if name not in self.collections:
+                if not create:
+                    raise KeyError(f"Collection '{name}' not found")
+                self.collections[name] = VectorCollection(name, quantizer=quantizer)
+            return self.collections[name]
+
+    def replace(self, name: str, collection: VectorCollection):
+        """
+        Swap in a rebuilt collection under a name, in one step
+
+        Args:
+            name: Collection name
+            collection: Fully built collection
+        """
+        if not COLLECTION_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid collection name '{name}'")
+        collection.name = name
+        with self._lock:
+            self.collections[name] = collection
+        logger.info(f"Replaced collection '{name}' ({len(collection)} vectors)")
+
+    def upsert(
+        self,
+        name: str,
+        ids: List[str],
+        vectors: np.ndarray,
+        texts: Optional[List[str]] = None,
+        quantizer: Optional[Quantizer] = None,
+    ):
+        """
+        Insert or replace vectors in a collection, creating it if needed
+        """
+        self.get_collection(name, create=True, quantizer=quantizer).upsert(
+            ids, vectors, texts
+        )
+
+    def delete(self, name: str, ids: List[str]) -> int:
+        """
+        Delete vectors from a collection
+
+        Returns:
+            Number of vectors deleted
+        """
+        return self.get_collection(name).delete(ids)
+
+    def search(
+        self, name: str, query: np.ndarray, top_k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Run a top-k search against a collection
+        """
+        return self.get_collection(name).search(query, top_k)
+
+    def search_lexical(
+        self, name: str, query: str, top_k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Run a BM25 search against a collection
+        """
+        return self.get_collection(name).search_lexical(query, top_k)
+
+    def search_hybrid(
+        self, name: str, query: np.ndarray, text: str, top_k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Run a fused dense and BM25 search against a collection
+        """
+        return self.get_collection(name).search_hybrid(query, text, top_k)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Get statistics for every collection
+        """
+        with self._lock:
+            collections = list(self.collections.values())
+        return [collection.stats() for collection in collections]
+
+    def save(self):
+        """
+        Snapshot every collection to the index directory
+        """
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            collections = list(self.collections.values())
+        for collection in collections:
+            collection.save(os.path.join(self.path, f"{collection.name}.npz"))
+        logger.info(f"Saved {len(collections)} vector collections to {self.path}")
+
+    def load(self):
+        """
+        Restore all collection snapshots from the index directory
+        """
+        if not self.path or not os.path.isdir(self.path):
+            return
+        for filename in sorted(os.listdir(self.path)):
+            if not filename.endswith(".npz"):
+                continue
+            try:
+                collection = VectorCollection.load(os.path.join(self.path, filename))
+            except Exception as e:
+                logger.error(f"Error loading vector snapshot {filename}: {e}")
+                continue
+            with self._lock:
+                self.collections[collection.name] = collection
+        logger.info(
+            f"Loaded {len(self.collections)} vector collections from {self.path}"
+        )
+
+
+# Singleton instance
+vector_index = VectorIndex()
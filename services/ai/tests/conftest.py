@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The service imports its modules as src.* and top-level modules, so the
+# tests run against the service directory whatever the working directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,90 @@
+import base64
+import numpy as np
+import pytest
+from src.services.embedding_codec import (
+    HEADER,
+    decode_binary,
+    encode_base64,
+    encode_binary,
+    negotiate_format,
+)
+
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((5, 12)).astype(np.float32)
+    vectors[2] = 0.0
+    return vectors
+
+
+def decode_base64(body):
+    rows, dim = body["shape"]
+    data = base64.b64decode(body["embeddings_b64"])
+    if body["dtype"] == "int8":
+        scales = np.frombuffer(base64.b64decode(body["scales_b64"]), dtype="<f4")
+        values = np.frombuffer(data, dtype=np.int8).reshape(rows, dim)
+        return values.astype(np.float32) * scales[:, None]
+    dtype = "<f4" if body["dtype"] == "float32" else "<f2"
+    return np.frombuffer(data, dtype=dtype).reshape(rows, dim).astype(np.float32)
+
+
+def test_float32_round_trip_is_exact(embeddings):
+    np.testing.assert_array_equal(decode_binary(encode_binary(embeddings)), embeddings)
+    np.testing.assert_array_equal(decode_base64(encode_base64(embeddings)), embeddings)
+
+
+def test_float16_round_trip(embeddings):
+    decoded = decode_binary(encode_binary(embeddings, "float16"))
+    np.testing.assert_allclose(decoded, embeddings, rtol=1e-3, atol=1e-3)
+    np.testing.assert_array_equal(
+        decode_base64(encode_base64(embeddings, "float16")), decoded
+    )
+
+
+def test_int8_round_trip_within_half_a_step(embeddings):
+    decoded = decode_binary(encode_binary(embeddings, "int8"))
+    step = np.abs(embeddings).max(axis=1, keepdims=True) / 127
+    assert np.all(np.abs(decoded - embeddings) <= step / 2 + 1e-6)
+    np.testing.assert_array_equal(decoded[2], 0.0)
+    np.testing.assert_array_equal(
+        decode_base64(encode_base64(embeddings, "int8")), decoded
+    )
+
+
+def test_binary_payload_size(embeddings):
+    rows, dim = embeddings.shape
+    assert len(encode_binary(embeddings)) == HEADER.size + rows * dim * 4
+    assert len(encode_binary(embeddings, "int8")) == HEADER.size + rows * (4 + dim)
+
+
+def test_empty_round_trip():
+    decoded = decode_binary(encode_binary(np.zeros((0, 0), dtype=np.float32)))
+    assert decoded.shape == (0, 0)
+
+
+def test_rejects_foreign_payload():
+    with pytest.raises(ValueError):
+        decode_binary(b"JUNK" + bytes(HEADER.size))
+
+
+@pytest.mark.parametrize(
+    "accept, wire_format, dtype, expected",
+    [
+        (None, None, None, ("json", "float32")),
+        ("application/octet-stream", None, None, ("binary", "float32")),
+        ("application/octet-stream; dtype=int8", None, None, ("binary", "int8")),
+        ("application/octet-stream", "base64", "float16", ("base64", "float16")),
+        ("application/json", "BINARY", None, ("binary", "float32")),
+    ],
+)
+def test_negotiate_format(accept, wire_format, dtype, expected):
+    assert negotiate_format(accept, wire_format, dtype) == expected
+
+
+@pytest.mark.parametrize(
+    "wire_format, dtype", [("xml", None), ("binary", "float64"), ("json", "int8")]
+)
+def test_negotiate_format_rejects(wire_format, dtype):
+    with pytest.raises(ValueError):
+        negotiate_format(None, wire_format, dtype)
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import pytest
+from src.services.inference_executor import InferenceExecutor
+
+
+@pytest.mark.asyncio
+async def test_bulk_call_runs_under_steady_interactive_load():
+    executor = InferenceExecutor(max_workers=2, max_queue_depth=4, max_bulk_wait=0.1)
+    release = threading.Event()
+    try:
+        # An interactive job stays in flight for the whole test
+        interactive = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0)
+
+        result = await asyncio.wait_for(executor.run_bulk(sum, [1, 2]), 2)
+
+        assert result == 3
+        assert executor.stats()["bulk_aged"] == 1
+        assert not interactive.done()
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bulk_call_waits_for_interactive_jobs():
+    executor = InferenceExecutor(max_workers=2, max_queue_depth=4, max_bulk_wait=5)
+    release = threading.Event()
+    try:
+        interactive = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0)
+        bulk = asyncio.ensure_future(executor.run_bulk(sum, [1, 2]))
+        await asyncio.sleep(0.1)
+        assert not bulk.done()
+
+        release.set()
+        await interactive
+        assert await asyncio.wait_for(bulk, 2) == 3
+        assert executor.stats()["bulk_aged"] == 0
+    finally:
+        release.set()
+        executor.shutdown()
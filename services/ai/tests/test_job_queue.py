@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import threading
+import numpy as np
+import pytest
+import src.services.job_queue as job_queue_module
+from src.services.inference_executor import InferenceExecutor
+from src.services.job_queue import JobQueue
+
+TEXTS = [f"t{i}" for i in range(6)]
+
+
+def vectors_for(texts):
+    return np.array([[float(text[1:]), 1.0] for text in texts], dtype=np.float32)
+
+
+class GatedEncoder:
+    """
+    Fake encode_texts that blocks on the chunk starting with a given text
+    until released
+    """
+
+    def __init__(self, gate_text):
+        self.gate_text = gate_text
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, texts, model_name=None):
+        self.calls.append(list(texts))
+        if texts[0] == self.gate_text and not self.release.is_set():
+            self.started.set()
+            self.release.wait(5)
+        return vectors_for(texts)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    # A fresh pool per test, since its asyncio primitives bind to the loop
+    executor = InferenceExecutor(max_workers=2, max_queue_depth=4)
+    monkeypatch.setattr(job_queue_module, "inference_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+async def wait_for_status(job, status, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while job.status != status:
+        assert asyncio.get_running_loop().time() < deadline, job.progress()
+        await job.wait_for_update(0.05)
+
+
+@pytest.mark.asyncio
+async def test_job_completes_in_chunks(executor, monkeypatch):
+    encoder = GatedEncoder(gate_text=None)
+    monkeypatch.setattr(job_queue_module, "encode_texts", encoder)
+    queue = JobQueue(path="", chunk_size=4)
+    queue.start()
+    try:
+        job = queue.submit("embeddings", TEXTS)
+        await wait_for_status(job, "completed")
+    finally:
+        await queue.stop()
+
+    assert encoder.calls == [TEXTS[:4], TEXTS[4:]]
+    _, chunk = queue.results(job.id, 1)
+    np.testing.assert_array_equal(chunk, vectors_for(TEXTS[4:]))
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_after_current_chunk(executor, monkeypatch):
+    encoder = GatedEncoder(gate_text="t2")
+    monkeypatch.setattr(job_queue_module, "encode_texts", encoder)
+    queue = JobQueue(path="", chunk_size=2, workers=1)
+    queue.start()
+    try:
+        job = queue.submit("embeddings", TEXTS)
+        await asyncio.to_thread(encoder.started.wait, 5)
+        queue.cancel(job.id)
+        encoder.release.set()
+        # The single worker only starts the next job once it dropped this one
+        follow_up = queue.submit("embeddings", ["t9"])
+        await wait_for_status(follow_up, "completed")
+    finally:
+        await queue.stop()
+
+    assert job.status == "cancelled"
+    assert job.completed_chunks == 1
+    assert TEXTS[4:] not in encoder.calls
+    with pytest.raises(ValueError):
+        queue.results(job.id, 1)
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_saving_last_chunk(executor, monkeypatch, tmp_path):
+    monkeypatch.setattr(job_queue_module, "encode_texts", GatedEncoder(None))
+    queue = JobQueue(path=str(tmp_path), chunk_size=3, workers=1)
+    saving = threading.Event()
+    release = threading.Event()
+    save_chunk = queue._save_chunk
+
+    def slow_save(job_id, chunk, vectors):
+        save_chunk(job_id, chunk, vectors)
+        if chunk == 1:
+            saving.set()
+            release.wait(5)
+
+    monkeypatch.setattr(queue, "_save_chunk", slow_save)
+    queue.start()
+    try:
+        job = queue.submit("embeddings", TEXTS)
+        await asyncio.to_thread(saving.wait, 5)
+        queue.cancel(job.id)
+        release.set()
+        follow_up = queue.submit("embeddings", ["t9"])
+        await wait_for_status(follow_up, "completed")
+    finally:
+        await queue.stop()
+
+    assert job.status == "cancelled"
+    with open(os.path.join(tmp_path, job.id, "job.json")) as f:
+        assert json.load(f)["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_resume_from_checkpoint_after_restart(executor, monkeypatch, tmp_path):
+    encoder = GatedEncoder(gate_text="t2")
+    monkeypatch.setattr(job_queue_module, "encode_texts", encoder)
+    queue = JobQueue(path=str(tmp_path), chunk_size=2)
+    queue.start()
+    job = queue.submit("embeddings", TEXTS)
+    await asyncio.to_thread(encoder.started.wait, 5)
+    # Shut down while the second chunk is being encoded
+    await queue.stop()
+    encoder.release.set()
+    assert job.completed_chunks == 1
+
+    restarted = JobQueue(path=str(tmp_path), chunk_size=2)
+    restarted.start()
+    try:
+        resumed = restarted.get(job.id)
+        assert resumed.completed_chunks == 1
+        await wait_for_status(resumed, "completed")
+    finally:
+        await restarted.stop()
+
+    # Only the unfinished chunks were encoded again
+    assert encoder.calls == [TEXTS[:2], TEXTS[2:4], TEXTS[2:4], TEXTS[4:]]
+    for chunk in range(resumed.chunks):
+        _, vectors = restarted.results(job.id, chunk)
+        np.testing.assert_array_equal(
+            vectors, vectors_for(TEXTS[2 * chunk : 2 * chunk + 2])
+        )
+
+
+@pytest.mark.asyncio
+async def test_resume_in_submission_order(executor, monkeypatch, tmp_path):
+    encoder = GatedEncoder(gate_text="t0")
+    monkeypatch.setattr(job_queue_module, "encode_texts", encoder)
+    queue = JobQueue(path=str(tmp_path), workers=1)
+    queue.start()
+    jobs = [queue.submit("embeddings", [text]) for text in TEXTS]
+    await asyncio.to_thread(encoder.started.wait, 5)
+    # Shut down with the first job running and the others queued
+    await queue.stop()
+    encoder.release.set()
+    encoder.calls.clear()
+
+    restarted = JobQueue(path=str(tmp_path), workers=1)
+    restarted.start()
+    try:
+        for job in jobs:
+            await wait_for_status(restarted.get(job.id), "completed")
+    finally:
+        await restarted.stop()
+
+    assert encoder.calls == [[text] for text in TEXTS]
@@ -0,0 +1,46 @@
+import pytest
+
+from src.services.model_registry import ModelNotAllowedError, ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, name, nbytes):
+        self.name = name
+        self.nbytes = nbytes
+
+
+def make_registry(allowed, budget=100):
+    loaded = []
+
+    def loader(name):
+        loaded.append(name)
+        return FakeModel(name, 60)
+
+    return ModelRegistry(budget, set(allowed), loader), loaded
+
+
+def test_names_are_canonicalized():
+    registry, loaded = make_registry({"all-MiniLM-L6-v2"})
+
+    assert registry.is_allowed("sentence-transformers/all-MiniLM-L6-v2")
+    first = registry.get("all-MiniLM-L6-v2")
+    second = registry.get("sentence-transformers/all-MiniLM-L6-v2")
+
+    assert first is second
+    assert loaded == ["sentence-transformers/all-MiniLM-L6-v2"]
+    with pytest.raises(ModelNotAllowedError):
+        registry.get("all-mpnet-base-v2")
+
+
+def test_models_in_use_are_not_evicted():
+    registry, loaded = make_registry({"*"})
+
+    with registry.use("org/first") as model:
+        registry.get("org/second")
+        assert registry.stats()["models"]["org/first"]["in_use"] == 1
+        assert registry.get("org/first") is model
+
+    # Released, so the next load over budget evicts it
+    registry.get("org/third")
+    assert "org/first" not in registry.stats()["models"]
+    assert loaded == ["org/first", "org/second", "org/third"]
@@ -0,0 +1,95 @@
+import zlib
+import numpy as np
+import pytest
+from src.services.prompt_budget import ELISION, PromptBudgeter
+
+
+def render(fields):
+    return (
+        "Answer the question using the project context.\n\n"
+        f"Context:\n{fields.get('context', '')}\n\n"
+        f"Notes:\n{fields.get('notes', '')}\n\n"
+        "Question: how is the search index stored?"
+    )
+
+
+def bag_of_words(texts):
+    # Deterministic stand-in for an embedding model: hashed word counts
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1
+    return vectors
+
+
+def paragraphs(topic, count, words=30):
+    return "\n\n".join(
+        " ".join(f"{topic}{i}-{j}" for j in range(words)) for i in range(count)
+    )
+
+
+@pytest.fixture
+def budgeter():
+    # Without a tokenizer, whitespace-separated words are counted
+    return PromptBudgeter(chunk_tokens=40, cache_size=1000)
+
+
+@pytest.mark.parametrize("max_tokens", [40, 80, 150, 300])
+def test_fit_stays_within_budget(budgeter, max_tokens):
+    fields = {"context": paragraphs("ctx", 12), "notes": paragraphs("note", 6)}
+    result = budgeter.fit(render, fields, max_tokens)
+
+    assert result["truncated"]
+    assert result["token_count"] <= max_tokens
+    assert budgeter.count_tokens([result["prompt"]]) == [result["token_count"]]
+    assert result["fields"]["context"]["kept"] <= result["fields"]["context"]["chunks"]
+
+
+def test_fit_with_query_ranking_stays_within_budget(budgeter):
+    fields = {
+        "context": paragraphs("filler", 8)
+        + "\n\nthe search index is stored as int8 codes on disk",
+    }
+    result = budgeter.fit(
+        render, fields, 60, "how is the search index stored", bag_of_words
+    )
+
+    assert result["token_count"] <= 60
+    assert "int8 codes on disk" in result["prompt"]
+    assert ELISION in result["prompt"]
+
+
+def test_fit_keeps_prompt_that_fits(budgeter):
+    fields = {"context": "short context", "notes": ""}
+    result = budgeter.fit(render, fields, 1000)
+
+    assert not result["truncated"]
+    assert result["prompt"] == render(fields)
+    assert result["token_count"] == budgeter.count_tokens([render(fields)])[0]
+
+
+def test_fit_without_budget_does_not_count(budgeter):
+    result = budgeter.fit(render, {"context": paragraphs("ctx", 50)}, None)
+
+    assert result["token_count"] is None
+    assert not result["truncated"]
+    assert budgeter.stats()["misses"] == 0
+
+
+def test_fit_rejects_non_positive_budget(budgeter):
+    with pytest.raises(ValueError):
+        budgeter.fit(render, {"context": "text"}, 0)
+
+
+def test_fit_many_matches_fit(budgeter):
+    requests = [
+        (render, {"context": paragraphs("a", 10)}, 70, None),
+        (render, {"context": "tiny"}, 70, None),
+        (render, {"context": paragraphs("b", 10)}, None, None),
+    ]
+    results = budgeter.fit_many(requests)
+
+    for (_, fields, max_tokens, query), result in zip(requests, results):
+        assert result == PromptBudgeter(chunk_tokens=40).fit(
+            render, fields, max_tokens, query
+        )
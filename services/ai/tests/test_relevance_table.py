@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from src.services.relevance_table import (
+    DEVELOPMENTS,
+    PROJECTS,
+    RelevanceTable,
+)
+
+MAX_TOP_K = 5
+DIMENSION = 8
+
+
+def brute_force(vectors, side, item_id, top_k):
+    # Exact matches of one item, scoring it against the whole other side
+    other = PROJECTS if side == DEVELOPMENTS else DEVELOPMENTS
+    query = vectors[side][item_id]
+    query = query / np.linalg.norm(query)
+    scored = []
+    for other_id, vector in vectors[other].items():
+        scored.append((other_id, float(query @ (vector / np.linalg.norm(vector)))))
+    scored.sort(key=lambda match: -match[1])
+    return scored[:top_k]
+
+
+def assert_matches(table, vectors, top_k=MAX_TOP_K):
+    for side in (DEVELOPMENTS, PROJECTS):
+        for item_id in vectors[side]:
+            expected = brute_force(vectors, side, item_id, top_k)
+            actual = table.matches(side, item_id, top_k)
+            assert [i for i, _ in actual] == [i for i, _ in expected]
+            np.testing.assert_allclose(
+                [s for _, s in actual], [s for _, s in expected], atol=1e-5
+            )
+
+
+def test_incremental_updates_match_brute_force():
+    rng = np.random.default_rng(0)
+    table = RelevanceTable(path="", max_top_k=MAX_TOP_K)
+    vectors = {DEVELOPMENTS: {}, PROJECTS: {}}
+    next_id = 0
+
+    for step in range(200):
+        side = DEVELOPMENTS if rng.random() < 0.5 else PROJECTS
+        items = vectors[side]
+        action = rng.random()
+        if action < 0.15 and items:
+            ids = list(rng.choice(list(items), size=min(3, len(items)), replace=False))
+            table.delete(side, ids)
+            for item_id in ids:
+                del items[item_id]
+        else:
+            # Small batches are patched item by item, large ones rebuilt;
+            # both replace some existing items and add new ones
+            size = 20 if action > 0.95 else int(rng.integers(1, 4))
+            ids = []
+            for _ in range(size):
+                if items and rng.random() < 0.4:
+                    ids.append(str(rng.choice(list(items))))
+                else:
+                    ids.append(f"{side[0]}{next_id}")
+                    next_id += 1
+            batch = rng.standard_normal((len(ids), DIMENSION)).astype(np.float32)
+            table.upsert(side, ids, batch)
+            for item_id, vector in zip(ids, batch):
+                items[item_id] = vector
+        assert_matches(table, vectors)
+
+
+def test_matches_beyond_maintained_lists():
+    rng = np.random.default_rng(1)
+    table = RelevanceTable(path="", max_top_k=2)
+    vectors = {
+        DEVELOPMENTS: {f"d{i}": rng.standard_normal(DIMENSION) for i in range(4)},
+        PROJECTS: {f"p{i}": rng.standard_normal(DIMENSION) for i in range(6)},
+    }
+    for side, items in vectors.items():
+        table.upsert(side, list(items), np.stack(list(items.values())))
+    assert_matches(table, vectors, top_k=6)
+
+
+def test_snapshot_round_trip(tmp_path):
+    rng = np.random.default_rng(2)
+    path = str(tmp_path / "relevance.npz")
+    table = RelevanceTable(path=path, max_top_k=MAX_TOP_K)
+    vectors = {
+        DEVELOPMENTS: {f"d{i}": rng.standard_normal(DIMENSION) for i in range(7)},
+        PROJECTS: {f"p{i}": rng.standard_normal(DIMENSION) for i in range(9)},
+    }
+    for side, items in vectors.items():
+        table.upsert(side, list(items), np.stack(list(items.values())))
+    table.save()
+
+    restored = RelevanceTable(path=path, max_top_k=MAX_TOP_K)
+    restored.load()
+    assert restored.stats() == table.stats()
+    assert_matches(restored, vectors)
+
+
+def test_unknown_item_and_side():
+    table = RelevanceTable(path="")
+    table.upsert(DEVELOPMENTS, ["d0"], np.ones((1, 3)))
+    with pytest.raises(KeyError):
+        table.matches(PROJECTS, "p0")
+    with pytest.raises(ValueError):
+        table.upsert("ideas", ["i0"], np.ones((1, 3)))
+    with pytest.raises(ValueError):
+        table.upsert(PROJECTS, ["p0"], np.ones((1, 4)))
@@ -0,0 +1,27 @@
+import os
+import pytest
+from src.services import state_owner as state_owner_module
+from src.services.state_owner import StateOwner
+
+pytestmark = pytest.mark.skipif(
+    state_owner_module.fcntl is None, reason="needs advisory file locks"
+)
+
+
+def test_only_one_owner(tmp_path):
+    path = str(tmp_path / "state.lock")
+    first, second = StateOwner(path), StateOwner(path)
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert second.owner_pid() == os.getpid()
+
+
+def test_released_ownership_is_taken_over(tmp_path):
+    path = str(tmp_path / "state.lock")
+    first, second = StateOwner(path), StateOwner(path)
+    first.acquire()
+    first.release()
+
+    assert second.acquire()
+    assert second.stats()["owner"]